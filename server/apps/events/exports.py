@@ -0,0 +1,26 @@
+"""
+事件导出
+
+分类、人员、SLA 经 select_related 一次取出；超时判断为模型属性，按实例计算
+"""
+from utils.export import Column, ExportSpec, yes_no
+
+from .models import Incident
+
+INCIDENT_EXPORT = ExportSpec(Incident, [
+    Column("ID", 'id', width=10),
+    Column("标题", 'title', width=30),
+    Column("分类", 'category__name'),
+    Column("优先级", 'priority', display=True),
+    Column("状态", 'status', display=True),
+    Column("来源", 'source', display=True),
+    Column("上报人", 'reporter__username'),
+    Column("处理人", 'assignee__username'),
+    Column("发生时间", 'occurred_at', width=20),
+    Column("响应时间", 'responded_at', width=20),
+    Column("解决时间", 'resolved_at', width=20),
+    Column("是否响应超时", 'is_overdue_response', convert=yes_no, related=('sla',)),
+    Column("是否解决超时", 'is_overdue_resolve', convert=yes_no, related=('sla',)),
+    Column("SLA等级", 'sla__level_name'),
+    Column("创建时间", 'create_time', width=20),
+], sheet_title='故障事件列表', filename='incidents')
@@ -1,9 +1,7 @@
-
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from faker import Faker
 import random
 
 # 安全防护：仅 DEBUG 模式运行
@@ -13,13 +11,54 @@ if not settings.DEBUG:
 # 导入你的模型（根据实际路径调整）
 from apps.events.models import Category, SLAStandard, Incident, Fault
 from apps.events.constants import PRIORITY_CHOICES, SOURCE_CHOICES, FAULT_STATUS_CHOICES
+from apps.users.seeding import seed_users
+from utils.seeding import add_seed_arguments, reserve_bases, reset_sequences, seed_in_chunks
 
 User = get_user_model()
-fake = Faker('zh_CN')
+
+
+def build_incident_chunk(chunk):
+    """seed_in_chunks 的生成函数：事件，chunk.params 含 user_ids、category_ids、sla_ids（优先级 → SLA id）"""
+    rng, fake, params = chunk.rng, chunk.faker('zh_CN'), chunk.params
+    user_ids, category_ids = params['user_ids'], params['category_ids']
+    tz = timezone.get_current_timezone()
+    for index in range(chunk.start, chunk.start + chunk.count):
+        priority = rng.choice([p[0] for p in PRIORITY_CHOICES])
+        chunk.writer.add(Incident(
+            id=chunk.pk(Incident, index),
+            title=fake.sentence(nb_words=4)[:200],
+            description=fake.text(max_nb_chars=500),
+            category_id=rng.choice(category_ids) if category_ids else None,
+            priority=priority,
+            source=rng.choice([s[0] for s in SOURCE_CHOICES]),
+            reporter_id=rng.choice(user_ids) if user_ids else None,
+            assignee_id=rng.choice(user_ids) if user_ids else None,
+            status=rng.choice([s[0] for s in FAULT_STATUS_CHOICES]),
+            occurred_at=fake.date_time_between(start_date="-30d", tzinfo=tz),
+            sla_id=params['sla_ids'].get(priority),
+            is_active=True
+        ))
+
+
+def build_fault_chunk(chunk):
+    """seed_in_chunks 的生成函数：故障，随机挂到 chunk.params['incident_ids'] 中的事件"""
+    rng, fake = chunk.rng, chunk.faker('zh_CN')
+    incident_ids = chunk.params['incident_ids']
+    for _ in range(chunk.count):
+        # 一个事件可有多个故障
+        chunk.writer.add(Fault(
+            incident_id=rng.choice(incident_ids),
+            detail=fake.text(max_nb_chars=300),
+            root_cause=fake.text(max_nb_chars=200),
+            solution=fake.text(max_nb_chars=300),
+            downtime_minutes=rng.randint(0, 1440),  # 0~24小时
+            impact_scope=fake.sentence(nb_words=3)[:200],
+            status=rng.choice([s[0] for s in FAULT_STATUS_CHOICES])
+        ))
 
 
 class Command(BaseCommand):
-    help = '生成事件、故障、分类、SLA 和用户测试数据'
+    help = '生成事件、故障、分类、SLA 和用户测试数据（批量写入）'
 
     def add_arguments(self, parser):
         parser.add_argument('--users', type=int, default=10, help='生成用户数')
@@ -27,14 +66,24 @@ class Command(BaseCommand):
         parser.add_argument('--incidents', type=int, default=30, help='生成事件数')
         parser.add_argument('--faults', type=int, default=20, help='生成故障数')
         parser.add_argument('--clear', action='store_true', help='清空现有数据（保留 admin）')
+        add_seed_arguments(parser)
 
     def handle(self, *args, **options):
+        from faker import Faker
+
         users_n = options['users']
         cats_n = options['categories']
         incs_n = options['incidents']
         faults_n = options['faults']
         clear = options['clear']
 
+        if options['seed'] is None:
+            options['seed'] = random.SystemRandom().randrange(2 ** 31)
+            self.stdout.write(f"随机种子: {options['seed']}（--seed {options['seed']} 可复现本次数据）")
+        rng = random.Random(options['seed'])
+        fake = Faker('zh_CN')
+        fake.seed_instance(options['seed'])
+
         if clear:
             self.stdout.write(self.style.WARNING("⚠️ 正在清空测试数据..."))
             Fault.objects.all().delete()
@@ -46,23 +95,8 @@ class Command(BaseCommand):
         # ========================
         # 1. 创建用户
         # ========================
-        users = []
-        for _ in range(users_n):
-            try:
-                user = User.objects.create_user(
-                    username=fake.unique.user_name(),
-                    email=fake.unique.email(),
-                    password='123456',
-                    phone=fake.phone_number()[:11],
-                    department=fake.company()[:50],
-                    position=fake.job()[:50],
-                    status=True,
-                    importance=random.randint(1, 5),
-                )
-                users.append(user)
-            except Exception as e:
-                self.stdout.write(self.style.WARNING(f"⚠️ 用户创建失败: {e}"))
-        self.stdout.write(self.style.SUCCESS(f"✅ 用户: {len(users)} 个"))
+        user_ids = seed_users(users_n, options, log=self.stdout.write)['ids']
+        self.stdout.write(self.style.SUCCESS(f"✅ 用户: {len(user_ids)} 个"))
 
         # ========================
         # 2. 创建 SLA 标准 (P1-P4)
@@ -90,80 +124,50 @@ class Command(BaseCommand):
         # ========================
         # 3. 创建分类树（支持多级）
         # ========================
-        categories = []
-        # 先创建根分类
-        root_cats = []
-        for i in range(3):
-            cat = Category.objects.create(
-                name=fake.word().capitalize() + "类",
-                parent=None,
-                level=1,
-                order=i,
-                is_active=True
-            )
-            categories.append(cat)
-            root_cats.append(cat)
-
-        # 再创建子分类
-        remaining = cats_n - len(root_cats)
-        for _ in range(remaining):
-            parent = random.choice(root_cats)
-            cat = Category.objects.create(
+        # 分类名称不唯一，预分配主键以便子分类引用根分类
+        base = reserve_bases((Category,))[Category._meta.label]
+        root_cats = [
+            Category(id=base + i, name=fake.word().capitalize() + "类", parent=None, level=1, order=i, is_active=True)
+            for i in range(3)
+        ]
+        sub_cats = [
+            Category(
+                id=base + len(root_cats) + i,
                 name=fake.word().capitalize() + "子类",
-                parent=parent,
+                parent_id=rng.choice(root_cats).id,
                 level=2,
-                order=random.randint(1, 10),
+                order=rng.randint(1, 10),
                 is_active=True
             )
-            categories.append(cat)
+            for i in range(max(cats_n - len(root_cats), 0))
+        ]
+        categories = Category.objects.bulk_create(root_cats + sub_cats, batch_size=options['batch_size'])
+        reset_sequences((Category,))
         self.stdout.write(self.style.SUCCESS(f"✅ 分类: {len(categories)} 个"))
 
         # ========================
         # 4. 创建事件 (Incident)
         # ========================
-        incidents = []
-        for _ in range(incs_n):
-            reporter = random.choice(users) if users else None
-            assignee = random.choice(users) if users else None
-            category = random.choice(categories) if categories else None
-            priority = random.choice([p[0] for p in PRIORITY_CHOICES])
-            sla = SLAStandard.objects.filter(priority=priority).first()
-
-            incident = Incident.objects.create(
-                title=fake.sentence(nb_words=4)[:200],
-                description=fake.text(max_nb_chars=500),
-                category=category,
-                priority=priority,
-                source=random.choice([s[0] for s in SOURCE_CHOICES]),
-                reporter=reporter,
-                assignee=assignee,
-                status=random.choice([s[0] for s in FAULT_STATUS_CHOICES]),
-                occurred_at=fake.date_time_between(start_date="-30d", tzinfo=timezone.get_current_timezone()),
-                sla=sla,
-                is_active=True
-            )
-            incidents.append(incident)
-        self.stdout.write(self.style.SUCCESS(f"✅ 事件: {len(incidents)} 个"))
+        result = seed_in_chunks(
+            build_incident_chunk, incs_n, options, reserve=(Incident,), log=self.stdout.write,
+            params={
+                'user_ids': user_ids,
+                'category_ids': [c.id for c in categories],
+                'sla_ids': {sla.priority: sla.id for sla in slas},
+            },
+        )
+        base = result['bases'][Incident._meta.label]
+        incident_ids = list(range(base, base + incs_n))
+        self.stdout.write(self.style.SUCCESS(f"✅ 事件: {len(incident_ids)} 个"))
 
         # ========================
         # 5. 创建故障 (Fault)
         # ========================
         created_faults = 0
-        for _ in range(faults_n):
-            if not incidents:
-                break
-            incident = random.choice(incidents)
-            # 避免重复创建（一个事件可有多个故障，但这里简单处理）
-            fault = Fault.objects.create(
-                incident=incident,
-                detail=fake.text(max_nb_chars=300),
-                root_cause=fake.text(max_nb_chars=200),
-                solution=fake.text(max_nb_chars=300),
-                downtime_minutes=random.randint(0, 1440),  # 0~24小时
-                impact_scope=fake.sentence(nb_words=3)[:200],
-                status=random.choice([s[0] for s in FAULT_STATUS_CHOICES])
-            )
-            created_faults += 1
+        if incident_ids:
+            seed_in_chunks(build_fault_chunk, faults_n, options, params={'incident_ids': incident_ids},
+                           log=self.stdout.write)
+            created_faults = faults_n
         self.stdout.write(self.style.SUCCESS(f"✅ 故障: {created_faults} 个"))
 
         self.stdout.write(self.style.SUCCESS("🎉 事件系统测试数据填充完成！"))
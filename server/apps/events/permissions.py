@@ -44,6 +44,7 @@ class IncidentPermission(permissions.BasePermission):
             'mark_responded': ['respond_incident'],
             'mark_resolved': ['resolve_incident'],
             'export': ['export_incident'],
+            'export_job': ['export_incident'],
             'statistics': ['view_statistics'],
         }
         return mapping.get(view.action, ['view_incident'])  # 默认需要查看权限
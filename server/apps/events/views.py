@@ -1,8 +1,3 @@
-from collections import defaultdict
-
-import openpyxl
-from openpyxl.utils import get_column_letter
-from django.http import HttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -16,11 +11,14 @@ from .serializers import (
     IncidentDetailSerializer, IncidentCreateUpdateSerializer,
     FaultSerializer, CategoryTreeSerializer
 )
+from .exports import INCIDENT_EXPORT
 from .filters import IncidentFilter, FaultFilter, CategoryFilter
 from django.utils import timezone
 from .permissions import IncidentPermission
 from django.db.models import Count, Avg, F, ExpressionWrapper, DurationField, Q, Prefetch
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from utils.time_bucket import day_edges, bucket_counts
+from utils.export import ExportMixin
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -60,7 +58,7 @@ class SLAStandardViewSet(viewsets.ModelViewSet):
     ordering = ['priority']
 
 
-class IncidentViewSet(viewsets.ModelViewSet):
+class IncidentViewSet(ExportMixin, viewsets.ModelViewSet):
     permission_classes = [IncidentPermission]  # 添加权限控制
     queryset = Incident.objects.select_related(
         'category', 'reporter', 'assignee', 'sla'
@@ -70,6 +68,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'description']
     ordering_fields = ['create_time', 'occurred_at', 'priority', 'status']
     ordering = ['-create_time']
+    export_spec = INCIDENT_EXPORT
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -163,93 +162,31 @@ class IncidentViewSet(viewsets.ModelViewSet):
         end_date = now_local.date()  # 今天（本地）
         start_date = end_date - timedelta(days=29)  # 包含今天共30天
 
-        # 2. 计算 UTC 时间范围（用于高效数据库过滤）
-        #    避免拉取全表数据
-        utc_start = timezone.make_aware(
-            timezone.datetime.combine(start_date, timezone.datetime.min.time()),
-            timezone.get_default_timezone()
-        )
-        utc_start = utc_start.astimezone(timezone.utc)
-
-        utc_end = timezone.make_aware(
-            timezone.datetime.combine(end_date, timezone.datetime.max.time()),
-            timezone.get_default_timezone()
-        )
-        utc_end = utc_end.astimezone(timezone.utc)
-
-        # 3. 从数据库拉取可能相关的记录（带时区的 occurred_at）
-        raw_datetimes = self.queryset.filter(
-            occurred_at__isnull=False,
-            occurred_at__gte=utc_start,
-            occurred_at__lte=utc_end
-        ).values_list('occurred_at', flat=True)
-
-        # 4. 在 Python 中按本地日期分组
-        count_by_date = defaultdict(int)
-        local_tz = timezone.get_current_timezone()
-
-        for dt in raw_datetimes:
-            # 转为本地时间并提取日期
-            local_date = dt.astimezone(local_tz).date()
-            # 只统计在 [start_date, end_date] 范围内的
-            if start_date <= local_date <= end_date:
-                count_by_date[local_date] += 1
-
-        # 5. 补全缺失日期（连续30天）
-        result = []
-        current = start_date
-        while current <= end_date:
-            result.append({
-                "date": current.isoformat(),  # 转为字符串，前端友好
-                "count": count_by_date.get(current, 0)
-            })
-            current += timedelta(days=1)
-
-        return Response(result)
-
-    @action(detail=False, methods=['get'], url_path='export')
-    def export(self, request):
-        """导出事件列表为 Excel"""
-        queryset = self.filter_queryset(self.get_queryset())[:1000]  # 防止过大
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "故障事件列表"
-
-        headers = [
-            "ID", "标题", "分类", "优先级", "状态", "来源",
-            "上报人", "处理人", "发生时间", "响应时间", "解决时间",
-            "是否响应超时", "是否解决超时", "SLA等级", "创建时间"
+        # 2. 按本地自然日生成桶边界（时间戳），同时作为数据库过滤范围，避免拉取全表数据
+        bucket_days, edges = day_edges(start_date, end_date)
+        utc_start = datetime.fromtimestamp(int(edges[0]), tz=dt_timezone.utc)
+        utc_end = datetime.fromtimestamp(int(edges[-1]), tz=dt_timezone.utc)
+
+        # 3. 一次查询取出发生时间，searchsorted + bincount 分桶计数
+        timestamps = [
+            dt.timestamp() for dt in self.queryset.filter(
+                occurred_at__isnull=False,
+                occurred_at__gte=utc_start,
+                occurred_at__lt=utc_end
+            ).order_by().values_list('occurred_at', flat=True)
+        ]
+        counts = bucket_counts(timestamps, edges)
+
+        # 4. 补全缺失日期（连续30天）
+        result = [
+            {
+                "date": day.isoformat(),  # 转为字符串，前端友好
+                "count": int(count)
+            }
+            for day, count in zip(bucket_days, counts)
         ]
-        ws.append(headers)
-
-        for obj in queryset:
-            ws.append([
-                obj.id,
-                obj.title,
-                obj.category.name if obj.category else "",
-                obj.get_priority_display(),
-                obj.get_status_display(),
-                obj.get_source_display(),
-                obj.reporter.username if obj.reporter else "",
-                obj.assignee.username if obj.assignee else "",
-                obj.occurred_at.strftime("%Y-%m-%d %H:%M") if obj.occurred_at else "",
-                obj.responded_at.strftime("%Y-%m-%d %H:%M") if obj.responded_at else "",
-                obj.resolved_at.strftime("%Y-%m-%d %H:%M") if obj.resolved_at else "",
-                "是" if obj.is_overdue_response else "否",
-                "是" if obj.is_overdue_resolve else "否",
-                obj.sla.level_name if obj.sla else "",
-                obj.create_time.strftime("%Y-%m-%d %H:%M")
-            ])
-
-        # 自动列宽
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(col)].width = 15
 
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officed.com')
-        response['Content-Disposition'] = 'attachment; filename=incidents.xlsx'
-        wb.save(response)
-        return response
+        return Response(result)
 
 
 class FaultViewSet(viewsets.ModelViewSet):
@@ -1,9 +1,10 @@
 # ai_engine.py
 
 from django.db.models import Q
-from apps.faults.models import Event, EventDeviceInfo
+from apps.faults.models import Event
 import jieba
-from collections import Counter
+
+from .keyword_index import tokenize, category_key, search, corpus_stats
 
 
 def extract_keywords(text):
@@ -14,8 +15,24 @@ def extract_keywords(text):
 def find_similar_events(new_event: Event, top_k=3):
     """
     基于分类、部件、描述关键词匹配历史事件
-    返回 [(event, score), ...]
+    通过关键词倒排索引（EventKeyword）做 BM25 检索，不再逐条分词历史事件
+    返回 [(event, score), ...]，score 为 0~1 的归一化得分
     """
+    tokens = tokenize(new_event.description) + tokenize(new_event.mal_reason)
+    if not tokens:
+        return []
+
+    # 索引尚未构建（未执行 build_keyword_index）时退回逐条匹配
+    if not corpus_stats()[0]:
+        return _scan_similar_events(new_event, top_k)
+
+    hits = search(tokens, category=category_key(new_event), exclude_ids=[new_event.pk], top_k=top_k)
+    events = Event.objects.in_bulk([event_id for event_id, _ in hits])
+    return [(events[event_id], score) for event_id, score in hits if event_id in events]
+
+
+def _scan_similar_events(new_event: Event, top_k=3):
+    """逐条分词匹配（Jaccard 覆盖率），仅在倒排索引为空时使用"""
     # 构建基础查询条件：相同分类层级
     base_q = Q(
         first_level=new_event.first_level,
@@ -48,4 +65,3 @@ def find_similar_events(new_event: Event, top_k=3):
     # 按分数降序
     scored_events.sort(key=lambda x: x[1], reverse=True)
     return scored_events[:top_k]
-
@@ -0,0 +1,133 @@
+"""
+历史故障批量向量化 + FAISS 全量重建
+
+  - 按 id 升序流式读取需要向量化的故障（.iterator()），每 chunk_size 条批量编码、批量写入 EventEmbedding
+  - 每个 chunk 完成后写检查点（最后处理的 id），中断后从检查点继续
+  - workers > 1 时使用 sentence-transformers 的多进程编码池（CPU）
+  - 重建索引时一次读取全部已标注故障的向量，一次 index.add
+"""
+import os
+import json
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from ..models import Event, EventEmbedding
+from .vectors import save_embeddings, load_matrix
+
+EMBEDDING_CHECKPOINT_PATH = getattr(
+    settings, "EMBEDDING_CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(getattr(settings, "FAISS_INDEX_PATH", "data/faiss_index.bin")),
+                 "embedding_checkpoint.json")
+)
+
+
+def read_checkpoint(model_name):
+    """同一模型未完成的检查点 → 最后处理的 id，否则 0"""
+    try:
+        with open(EMBEDDING_CHECKPOINT_PATH) as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return 0
+    return checkpoint.get("last_id", 0) if checkpoint.get("model") == model_name else 0
+
+
+def write_checkpoint(model_name, last_id, processed):
+    tmp_path = f"{EMBEDDING_CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"model": model_name, "last_id": last_id, "processed": processed}, f)
+    os.replace(tmp_path, EMBEDDING_CHECKPOINT_PATH)
+
+
+def clear_checkpoint():
+    if os.path.exists(EMBEDDING_CHECKPOINT_PATH):
+        os.remove(EMBEDDING_CHECKPOINT_PATH)
+
+
+def pending_events(model_name, start_after=0, reembed=False):
+    """
+    需要向量化的故障（按 id 升序，只取文本字段）
+    :param reembed: True 时全部重新向量化，否则只处理没有向量或向量来自其他模型的故障
+    """
+    from .embedder import TEXT_FIELDS
+    queryset = Event.objects.filter(id__gt=start_after).order_by('id')
+    if not reembed:
+        queryset = queryset.exclude(
+            Exists(EventEmbedding.objects.filter(event_id=OuterRef('pk'), model_name=model_name))
+        )
+    return queryset.values('id', *TEXT_FIELDS)
+
+
+def embed_events(chunk_size=1000, batch_size=64, workers=1, reembed=False, resume=True, log=print):
+    """
+    批量向量化
+    :return: {'processed': 条数, 'seconds': 耗时, 'rate': 条/秒}
+    """
+    from .embedder import EMBEDDING_MODEL, get_embedder
+
+    start_after = read_checkpoint(EMBEDDING_MODEL) if resume else 0
+    if start_after:
+        log(f"从检查点继续：id > {start_after}")
+
+    pool = get_embedder().start_multi_process_pool(target_devices=['cpu'] * workers) if workers > 1 else None
+    processed, started = 0, time.perf_counter()
+    try:
+        rows = pending_events(EMBEDDING_MODEL, start_after, reembed).iterator(chunk_size=chunk_size)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                processed += _embed_chunk(chunk, pool, batch_size, EMBEDDING_MODEL)
+                write_checkpoint(EMBEDDING_MODEL, chunk[-1]['id'], processed)
+                elapsed = time.perf_counter() - started
+                log(f"已处理 {processed} 条（至 id={chunk[-1]['id']}），{processed / elapsed:.1f} 条/秒")
+                chunk = []
+        if chunk:
+            processed += _embed_chunk(chunk, pool, batch_size, EMBEDDING_MODEL)
+    finally:
+        if pool is not None:
+            get_embedder().stop_multi_process_pool(pool)
+
+    clear_checkpoint()
+    seconds = time.perf_counter() - started
+    rate = processed / seconds if seconds > 0 else 0
+    log(f"向量化完成：{processed} 条，耗时 {seconds:.1f}s，{rate:.1f} 条/秒")
+    return {'processed': processed, 'seconds': round(seconds, 2), 'rate': round(rate, 1)}
+
+
+def _embed_chunk(chunk, pool, batch_size, model_name):
+    from .embedder import embed_texts, event_text
+    vectors = embed_texts([event_text(row) for row in chunk], batch_size=batch_size, pool=pool)
+    return save_embeddings(zip([row['id'] for row in chunk], vectors), model_name=model_name)
+
+
+def rebuild_faiss_index(index_type="auto", log=print):
+    """
+    用已标注（有根因和处理建议）且已向量化的故障全量重建 FAISS 索引
+    :return: {'count': 条数, 'index_type': 索引类型, 'seconds': 耗时}
+    """
+    from .faiss_store import get_faiss_store
+
+    started = time.perf_counter()
+    annotated = Event.objects.filter(
+        ~Q(ai_root_cause='') & ~Q(ai_suggestion=''),
+        ai_root_cause__isnull=False, ai_suggestion__isnull=False, embedding_vector__isnull=False,
+    ).order_by('id').values_list('id', 'mal_id', 'ai_root_cause', 'ai_suggestion')
+    items = {
+        event_id: {"id": event_id, "mal_id": mal_id, "root_cause": root_cause, "suggestion": suggestion}
+        for event_id, mal_id, root_cause, suggestion in annotated.iterator()
+    }
+    # 整表流式读取后按 id 过滤，避免超长 IN 条件
+    ids, matrix = load_matrix()
+    mask = np.isin(ids, np.fromiter(items.keys(), dtype=np.int64, count=len(items)))
+    ids, matrix = ids[mask], matrix[mask]
+    if not len(ids):
+        log("没有可用于构建索引的向量")
+        return {'count': 0, 'index_type': None, 'seconds': 0}
+
+    index_type = get_faiss_store().rebuild([items[int(event_id)] for event_id in ids], matrix, index_type)
+    seconds = time.perf_counter() - started
+    log(f"FAISS 索引重建完成：{len(ids)} 条，类型 {index_type}，耗时 {seconds:.1f}s")
+    return {'count': len(ids), 'index_type': index_type, 'seconds': round(seconds, 2)}
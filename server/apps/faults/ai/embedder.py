@@ -1,27 +1,87 @@
-from sentence_transformers import SentenceTransformer
+"""
+文本向量模型
+
+  - sentence_transformers / torch 只在首次加载模型时导入，Web 进程导入本模块不会加载 torch
+  - Celery worker 启动时预加载（见 lifecycle），首个故障不再承担数秒的加载时间
+  - 推理后端 EMBEDDING_BACKEND：torch（默认）、onnx（需 optimum + onnxruntime）、
+    int8（torch 动态量化 Linear 层，CPU 推理更快、向量与 float32 略有差异）
+"""
+import threading
+import time
+
+from django.conf import settings
+
+EMBEDDING_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'int8')
+EMBEDDING_BACKEND = getattr(settings, 'EMBEDDING_BACKEND', 'torch')
 
 _model = None
+_model_lock = threading.Lock()
+load_seconds = None
+
+
+def load_model(backend=EMBEDDING_BACKEND):
+    """按后端加载模型，onnx 不可用时退回 torch"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"未知的向量模型后端: {backend}")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'onnx':
+        try:
+            return SentenceTransformer(EMBEDDING_MODEL, device='cpu', backend='onnx')
+        except Exception as e:
+            print(f"[Embedder] ONNX 后端不可用，改用 torch: {e}")
+            return SentenceTransformer(EMBEDDING_MODEL, device='cpu')
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    if backend == 'int8':
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
 
 
 def get_embedder():
-    global _model
+    global _model, load_seconds
     if _model is None:
-        _model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        with _model_lock:
+            if _model is None:
+                started = time.perf_counter()
+                _model = load_model()
+                load_seconds = time.perf_counter() - started
     return _model
 
 
+def is_loaded():
+    return _model is not None
+
+
+TEXT_FIELDS = ('first_level', 'third_level', 'mal_reason', 'description')
+
+
+def event_text(event):
+    """参与向量化的故障文本，event 可以是 Event 实例或 values() 字典"""
+    if isinstance(event, dict):
+        parts = [event.get(f) or "" for f in TEXT_FIELDS]
+    else:
+        parts = [getattr(event, f) or "" for f in TEXT_FIELDS]
+    return " ".join(parts).strip() or "无描述"
+
+
 def embed_event_text(event) -> list:
     """将故障描述文本向量化"""
-    text = " ".join([
-        event.first_level or "",
-        event.third_level or "",
-        event.mal_reason or "",
-        event.description or "",
-    ]).strip()
-    if not text:
-        text = "无描述"
     model = get_embedder()
-    vec = model.encode(text, convert_to_numpy=False)
+    vec = model.encode(event_text(event), convert_to_numpy=False)
     return vec.tolist()
 
 
+def embed_texts(texts, batch_size=64, pool=None):
+    """
+    批量向量化
+    :param pool: get_embedder().start_multi_process_pool() 返回的进程池，传入时多进程编码
+    :return: 形如 (len(texts), dim) 的 float32 数组
+    """
+    model = get_embedder()
+    if pool is not None:
+        vectors = model.encode_multi_process(texts, pool, batch_size=batch_size)
+    else:
+        vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return vectors.astype('float32')
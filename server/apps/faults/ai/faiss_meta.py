@@ -0,0 +1,82 @@
+"""
+FAISS 快照的列式元数据
+
+每条元数据为 (FAISS id = Event.pk, mal_id, 根因, 处理建议)，按列存为 .npy：
+  ids.npy      int64，升序，命中 id → 行号用二分查找
+  mal_ids.npy  定长字节串（UTF-8）
+  offsets.npy  int64，长度 2n+1：第 i 行根因为 heap[offsets[2i]:offsets[2i+1]]，
+               处理建议为 heap[offsets[2i+1]:offsets[2i+2]]
+  heap.npy     uint8，所有文本的 UTF-8 拼接
+加载时 mmap 映射，不反序列化整个列表；检索只解码命中的行。
+"""
+import os
+
+import numpy as np
+
+COLUMNS = ('ids', 'mal_ids', 'offsets', 'heap')
+
+
+def _fsync_save(path, array):
+    with open(path, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class MetaColumns:
+    def __init__(self, ids, mal_ids, offsets, heap):
+        self.ids = ids
+        self.mal_ids = mal_ids
+        self.offsets = offsets
+        self.heap = heap
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype='S1'),
+                   np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.uint8))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        :param rows: [(id, mal_id, root_cause, suggestion), ...]，按 id 排序后写入
+        """
+        rows = sorted(rows, key=lambda row: row[0])
+        if not rows:
+            return cls.empty()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        mal_ids = np.array([(row[1] or '').encode('utf-8') for row in rows])
+        texts = [(text or '').encode('utf-8') for row in rows for text in (row[2], row[3])]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        heap = np.frombuffer(b''.join(texts), dtype=np.uint8)
+        return cls(ids, mal_ids, offsets, heap)
+
+    @classmethod
+    def load(cls, directory):
+        return cls(*[np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in COLUMNS])
+
+    def save(self, directory):
+        for name in COLUMNS:
+            _fsync_save(os.path.join(directory, f'{name}.npy'), np.asarray(getattr(self, name)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, faiss_id):
+        """id → 行号，不存在时返回 -1"""
+        i = int(np.searchsorted(self.ids, faiss_id))
+        return i if i < len(self.ids) and self.ids[i] == faiss_id else -1
+
+    def _text(self, j):
+        return bytes(self.heap[self.offsets[j]:self.offsets[j + 1]]).decode('utf-8')
+
+    def row(self, i):
+        """第 i 行 → (id, mal_id, root_cause, suggestion)"""
+        return (int(self.ids[i]), self.mal_ids[i].decode('utf-8'), self._text(2 * i), self._text(2 * i + 1))
+
+    def mal_id_map(self):
+        """{mal_id: id}（加载时构建一次，成员判断 O(1)）"""
+        return dict(zip(np.char.decode(self.mal_ids, 'utf-8').tolist() if len(self) else [], self.ids.tolist()))
+
+    def rows(self):
+        return (self.row(i) for i in range(len(self)))
@@ -1,68 +1,534 @@
+"""
+故障向量库（FAISS）
 
+  - 进程内单例：get_faiss_store() 首次使用时加载，之后常驻内存
+  - 向量 id 即 Event.pk（IndexIDMap），故障删除、标注更新时按 id 移除旧向量
+  - 持久化 = 快照 + 预写日志（WAL）：
+      快照  FAISS_SNAPSHOT_DIR/snap-<序号>/：index.faiss + 列式元数据（见 faiss_meta，mmap 加载）
+            + state.json；CURRENT 文件指向当前快照，整个目录写完后原子替换 CURRENT
+      WAL   FAISS_WAL_PATH，每次新增/删除追加记录并 fsync，不再重写整个索引
+  - 内存中的元数据 = 快照列（只读 mmap）+ WAL 增量（新增行字典、已删除 id 集合），
+    mal_id → id 映射随加载、重放和写入同步维护，成员判断 O(1)
+  - 压缩：WAL 超过 COMPACT_EVERY 条时（或定时任务）写新快照并截断 WAL；
+    HNSW 残留向量超过 STALE_COMPACT_EVERY 条时也压缩，压缩时用索引自身存储的向量重建图、去掉残留
+  - 多进程（Celery worker）写入通过 RedisDistributedLock 串行化；读取前按文件状态增量同步其他进程的写入
+  - 兼容旧格式（FAISS_INDEX_PATH + pickle 元数据、不带 id 的 WAL）：首次加载时按 mal_id
+    查出 Event.pk 转换为新快照
+"""
 import os
+import json
+import pickle
+import shutil
+import struct
+import threading
+
 import faiss
 import numpy as np
-import pickle
 from django.conf import settings
 
+from utils.lock import RedisDistributedLock
+from utils.redis_client import cache
+from .faiss_meta import MetaColumns
+
 FAISS_INDEX_PATH = getattr(settings, "FAISS_INDEX_PATH", "data/faiss_index.bin")
 FAISS_META_PATH = getattr(settings, "FAISS_META_PATH", "data/faiss_meta.pkl")
-os.makedirs(os.path.dirname(FAISS_INDEX_PATH), exist_ok=True)
+FAISS_WAL_PATH = getattr(
+    settings, "FAISS_WAL_PATH", os.path.join(os.path.dirname(FAISS_INDEX_PATH), "faiss_wal.bin")
+)
+FAISS_SNAPSHOT_DIR = getattr(
+    settings, "FAISS_SNAPSHOT_DIR", os.path.join(os.path.dirname(FAISS_INDEX_PATH), "faiss_snapshots")
+)
+CURRENT_PATH = os.path.join(FAISS_SNAPSHOT_DIR, "CURRENT")
+os.makedirs(FAISS_SNAPSHOT_DIR, exist_ok=True)
+
+LOCK_KEY = "faults:faiss:lock"
+COMPACT_EVERY = 500
+# HNSW 残留（已删除 / 被更新覆盖）向量达到该数量时压缩并重建索引，检索时多取的条数不超过该值
+STALE_COMPACT_EVERY = 200
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+AUTO_IVF_THRESHOLD = 50000
+# WAL 记录头：序号、元数据长度、向量维度（删除记录维度为 0）
+WAL_HEADER = struct.Struct("<QII")
+
+
+def _fsync_write(path, data):
+    """写临时文件 → fsync → 原子替换"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+def _read_wal(data, after_seq):
+    """解析 WAL 字节串 → ([(seq, 元数据, 向量或 None), ...], 有效字节数)，跳过序号不大于 after_seq 的记录"""
+    pos, records = 0, []
+    while pos + WAL_HEADER.size <= len(data):
+        seq, meta_len, dim = WAL_HEADER.unpack_from(data, pos)
+        end = pos + WAL_HEADER.size + meta_len + dim * 4
+        if end > len(data):
+            break
+        body = pos + WAL_HEADER.size
+        if seq > after_seq:
+            item = json.loads(data[body:body + meta_len].decode("utf-8"))
+            vec = np.frombuffer(data[body + meta_len:end], dtype="<f4").reshape(1, -1) if dim else None
+            records.append((seq, item, vec))
+        pos = end
+    return records, pos
+
+
+def _truncate_wal():
+    with open(FAISS_WAL_PATH, "ab") as f:
+        f.truncate(0)
+        os.fsync(f.fileno())
 
 
 class FaissStore:
     def __init__(self):
         self.dim = 384
         self.index = None
-        self.meta = []
+        self.columns = MetaColumns.empty()  # 快照中的元数据列
+        self._added = {}           # WAL 中新增的行：id → (mal_id, root_cause, suggestion)
+        self._deleted = set()      # 快照中已被删除（或被更新覆盖）的 id
+        self._ids = {}             # mal_id → id
+        self._stale = 0            # 索引不支持删除（HNSW）时残留的向量数，检索时多取
+        self._seq = 0              # 已加载的最大序号（快照 + WAL）
+        self._snapshot_seq = 0     # 快照包含的最大序号
+        self._snapshot_state = None
+        self._wal_offset = 0       # WAL 中已读取的有效字节数
+        self._mutex = threading.RLock()
         self._load()
 
+    # ========== 加载与同步 ==========
     def _load(self):
-        if os.path.exists(FAISS_INDEX_PATH) and os.path.exists(FAISS_META_PATH):
-            self.index = faiss.read_index(FAISS_INDEX_PATH)
-            with open(FAISS_META_PATH, "rb") as f:
-                self.meta = pickle.load(f)
+        """加载快照并重放 WAL"""
+        if not os.path.exists(CURRENT_PATH) and _has_legacy_data():
+            self._migrate_legacy()
+        self._snapshot_state = _file_state(CURRENT_PATH)
+        if self._snapshot_state is not None:
+            with open(CURRENT_PATH) as f:
+                directory = os.path.join(FAISS_SNAPSHOT_DIR, f.read().strip())
+            with open(os.path.join(directory, "state.json")) as f:
+                state = json.load(f)
+            self.index = faiss.read_index(os.path.join(directory, "index.faiss"))
+            self.columns = MetaColumns.load(directory)
+            self._snapshot_seq = state["seq"]
+            self._stale = state.get("stale", 0)
         else:
-            self.index = faiss.IndexFlatIP(self.dim)
-            self.meta = []
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(self.dim))
+            self.columns = MetaColumns.empty()
+            self._snapshot_seq = 0
+            self._stale = 0
+        self._ids = self.columns.mal_id_map()
+        self._added, self._deleted = {}, set()
+        self._seq = self._snapshot_seq
+        self._wal_offset = 0
+        self._replay_wal()
 
-    def add_event(self, event):
-        if not (event.ai_root_cause and event.ai_suggestion):
+    def _replay_wal(self):
+        """从上次读取位置继续读取 WAL，末尾不完整的记录（写入中途崩溃）留待下次或截断"""
+        if not os.path.exists(FAISS_WAL_PATH):
+            self._wal_offset = 0
             return
-        from .embedder import embed_event_text
-        vec = np.array(embed_event_text(event)).astype("float32")
-        faiss.normalize_L2(vec)
-        vec = vec.reshape(1, -1)
-        self.index.add(vec)
-        self.meta.append({
-            "mal_id": event.mal_id,
-            "root_cause": event.ai_root_cause,
-            "suggestion": event.ai_suggestion,
-        })
-        self._save()
+        with open(FAISS_WAL_PATH, "rb") as f:
+            f.seek(self._wal_offset)
+            data = f.read()
+        # 已包含在快照中的记录（压缩后截断前崩溃）跳过
+        records, consumed = _read_wal(data, self._seq)
+        for seq, item, vec in records:
+            if item["op"] == "delete":
+                self._remove_ids([item["id"]])
+            else:
+                self._add_rows([item], vec)
+            self._seq = seq
+        self._wal_offset += consumed
 
-    def search_by_event(self, event, top_k=3, min_score=0.7):
-        from .embedder import embed_event_text
-        query_vec = np.array(embed_event_text(event)).astype("float32")
-        faiss.normalize_L2(query_vec)
-        query_vec = query_vec.reshape(1, -1)
-        D, I = self.index.search(query_vec, top_k)
-        results = []
-        for score, idx in zip(D[0], I[0]):
-            if idx == -1 or score < min_score:
-                continue
-            meta = self.meta[idx]
-            results.append({
-                "score": float(score),
-                "root_cause": meta["root_cause"],
-                "suggestion": meta["suggestion"],
-            })
+    def refresh(self):
+        """同步其他进程的写入：快照变化（已压缩）时重新加载，否则只读取 WAL 新增部分"""
+        with self._mutex:
+            if _file_state(CURRENT_PATH) != self._snapshot_state:
+                self._load()
+                return
+            wal_state = _file_state(FAISS_WAL_PATH)
+            wal_size = wal_state[2] if wal_state else 0
+            if wal_size < self._wal_offset:
+                self._load()
+            elif wal_size > self._wal_offset:
+                self._replay_wal()
+
+    def count(self):
+        """已收录的故障数"""
+        return len(self._ids)
+
+    def contains(self, mal_id):
+        return mal_id in self._ids
+
+    def id_of(self, mal_id):
+        """故障在索引中的 id（Event.pk），未收录时返回 None"""
+        return self._ids.get(mal_id)
+
+    def lookup(self, faiss_id):
+        """id → (mal_id, root_cause, suggestion)，只解码这一行；不存在或已删除时返回 None"""
+        if faiss_id in self._added:
+            return self._added[faiss_id]
+        if faiss_id in self._deleted:
+            return None
+        row = self.columns.find(faiss_id)
+        return self.columns.row(row)[1:] if row >= 0 else None
+
+    def _lock(self):
+        return RedisDistributedLock(cache, LOCK_KEY, expire_time=120, max_retries=50, timeout=30)
+
+    # ========== 内存中的增删（重放与写入共用） ==========
+    def _remove_ids(self, ids):
+        ids = [faiss_id for faiss_id in dict.fromkeys(ids) if self.lookup(faiss_id) is not None]
+        if not ids:
+            return
+        for faiss_id in ids:
+            self._ids.pop(self.lookup(faiss_id)[0], None)
+            if self._added.pop(faiss_id, None) is None:
+                self._deleted.add(faiss_id)
+        try:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        except RuntimeError:
+            # HNSW 不支持删除：向量留在索引中，元数据已删除，检索时跳过
+            self._stale += len(ids)
+
+    def _add_rows(self, items, vectors):
+        """items: [{'id', 'mal_id', 'root_cause', 'suggestion'}, ...]，id 或 mal_id 已存在时先移除旧向量（更新）"""
+        replaced = [item["id"] for item in items]
+        replaced += [self._ids[item["mal_id"]] for item in items if item["mal_id"] in self._ids]
+        self._remove_ids(replaced)
+        self.index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"),
+                                np.asarray([item["id"] for item in items], dtype=np.int64))
+        for item in items:
+            self._added[item["id"]] = (item["mal_id"], item["root_cause"], item["suggestion"])
+            self._ids[item["mal_id"]] = item["id"]
+
+    # ========== 写入 ==========
+    def add_event(self, event, replace=False):
+        """
+        追加一条已标注故障
+        :return: 是否写入
+        """
+        return self.add_events([event], replace=replace) == 1
+
+    def add_events(self, events, replace=False):
+        """
+        批量追加已标注故障：向量在锁外一次批量生成，锁内去重 + 一次写入 WAL
+        :param replace: 已收录的故障按新的标注和向量更新（旧向量按 id 移除），否则跳过
+        :return: 写入条数
+        """
+        events = [e for e in events
+                  if e.ai_root_cause and e.ai_suggestion and (replace or not self.contains(e.mal_id))]
+        if not events:
+            return 0
+        from .vectors import get_or_embed_many
+        vectors = get_or_embed_many(events).astype("float32").reshape(len(events), -1)
+        faiss.normalize_L2(vectors)
+
+        with self._mutex, self._lock():
+            self.refresh()
+            items, rows, seen = [], [], set()
+            for row, event in enumerate(events):
+                # 同一批内重复的故障只收录第一条
+                if (not replace and self.contains(event.mal_id)) or event.pk in seen:
+                    continue
+                seen.add(event.pk)
+                items.append({
+                    "op": "add",
+                    "id": event.pk,
+                    "mal_id": event.mal_id,
+                    "root_cause": event.ai_root_cause,
+                    "suggestion": event.ai_suggestion,
+                })
+                rows.append(row)
+            if not items:
+                return 0
+            self._append_wal(items, vectors[rows])
+            self._add_rows(items, vectors[rows])
+            self._maybe_compact()
+        return len(items)
+
+    def remove(self, ids):
+        """
+        按 id（Event.pk）移除向量和元数据（故障删除、标注清空）
+        :return: 移除条数
+        """
+        with self._mutex, self._lock():
+            self.refresh()
+            ids = [faiss_id for faiss_id in {int(i) for i in ids} if self.lookup(faiss_id) is not None]
+            if not ids:
+                return 0
+            self._append_wal([{"op": "delete", "id": faiss_id} for faiss_id in ids], [None] * len(ids))
+            self._remove_ids(ids)
+            self._maybe_compact()
+        return len(ids)
+
+    def _append_wal(self, items, vectors):
+        """追加 WAL 记录，整批一次 fsync（调用方持有跨进程锁）；删除记录的向量为 None"""
+        records = []
+        for offset, (item, vec) in enumerate(zip(items, vectors)):
+            meta_bytes = json.dumps(item, ensure_ascii=False).encode("utf-8")
+            vec_bytes = b"" if vec is None else vec.astype("<f4").tobytes()
+            records.append(
+                WAL_HEADER.pack(self._seq + offset + 1, len(meta_bytes), len(vec_bytes) // 4)
+                + meta_bytes + vec_bytes
+            )
+        data = b"".join(records)
+        with open(FAISS_WAL_PATH, "ab") as f:
+            # 截掉上次崩溃留下的不完整记录，保证新记录从边界开始
+            if f.tell() > self._wal_offset:
+                f.truncate(self._wal_offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._seq += len(records)
+        self._wal_offset += len(data)
+
+    def _maybe_compact(self):
+        if self._seq - self._snapshot_seq >= COMPACT_EVERY or self._stale >= STALE_COMPACT_EVERY:
+            self._compact()
+
+    def compact(self):
+        """把 WAL 合并进新快照（定时任务调用）"""
+        with self._mutex, self._lock():
+            self.refresh()
+            if self._seq > self._snapshot_seq or self._stale:
+                self._compact()
+            return self._seq
+
+    def _compact(self):
+        """快照列去掉已删除行、并入新增行，写新快照并截断 WAL（调用方持有跨进程锁）"""
+        if self._stale:
+            self._purge_stale()
+        rows = [row for row in self.columns.rows() if row[0] not in self._deleted]
+        rows += [(faiss_id, *meta) for faiss_id, meta in self._added.items()]
+        self._write_snapshot(MetaColumns.from_rows(rows))
+        _truncate_wal()
+        self._wal_offset = 0
+
+    def _purge_stale(self):
+        """
+        去掉 HNSW 中的残留向量：从索引自身的存储取回全部向量，同一 id 只保留最后写入的一条，
+        已删除的 id 丢弃，重建图（不需要读取 EventEmbedding）
+        """
+        base = faiss.downcast_index(self.index.index)
+        ids = faiss.vector_to_array(self.index.id_map)
+        last = {}
+        for position, faiss_id in enumerate(ids.tolist()):
+            last[faiss_id] = position
+        keep = sorted(position for faiss_id, position in last.items() if self.lookup(faiss_id) is not None)
+        vectors = base.reconstruct_n(0, base.ntotal)[keep] if keep else np.empty((0, self.index.d), dtype="float32")
+        index_type = "hnsw" if isinstance(base, faiss.IndexHNSW) else "flat"
+        self.index, _ = build_index(vectors, index_type, ids=ids[keep])
+        self._stale = 0
+
+    def _write_snapshot(self, columns):
+        """写新快照目录 → 原子替换 CURRENT → 删除旧快照（调用方持有跨进程锁）"""
+        name = f"snap-{self._seq:012d}"
+        directory = os.path.join(FAISS_SNAPSHOT_DIR, name)
+        tmp_directory = f"{directory}.tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        _fsync_write(os.path.join(tmp_directory, "index.faiss"), faiss.serialize_index(self.index).tobytes())
+        columns.save(tmp_directory)
+        _fsync_write(os.path.join(tmp_directory, "state.json"),
+                     json.dumps({"seq": self._seq, "count": len(columns), "stale": self._stale}).encode("utf-8"))
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(tmp_directory, directory)
+        _fsync_dir(FAISS_SNAPSHOT_DIR)
+        # 崩溃在此之前：CURRENT 仍指向旧快照，WAL 未截断，重启后结果不变
+        _fsync_write(CURRENT_PATH, name.encode("utf-8"))
+
+        for entry in os.listdir(FAISS_SNAPSHOT_DIR):
+            if entry.startswith("snap-") and entry != name:
+                shutil.rmtree(os.path.join(FAISS_SNAPSHOT_DIR, entry), ignore_errors=True)
+        # 切换到新快照：列数据重新 mmap，增量清空
+        self.columns = MetaColumns.load(directory)
+        self._added, self._deleted = {}, set()
+        self._snapshot_seq = self._seq
+        self._snapshot_state = _file_state(CURRENT_PATH)
+
+    def rebuild(self, items, vectors, index_type="auto"):
+        """
+        用全量数据重建索引（一次 add_with_ids），替换快照并清空 WAL
+        :param items: 与 vectors 逐行对应的元数据 [{'id', 'mal_id', 'root_cause', 'suggestion'}, ...]
+        :param vectors: 形如 (n, dim) 的向量矩阵
+        :return: 实际使用的索引类型
+        """
+        vectors = np.array(vectors, dtype="float32", copy=True)
+        faiss.normalize_L2(vectors)
+        index, index_type = build_index(vectors, index_type, ids=[item["id"] for item in items])
+        columns = MetaColumns.from_rows(
+            [(item["id"], item["mal_id"], item["root_cause"], item["suggestion"]) for item in items]
+        )
+        with self._mutex, self._lock():
+            self.refresh()
+            self.index = index
+            self._stale = 0
+            self._seq += 1
+            self._write_snapshot(columns)
+            self._ids = self.columns.mal_id_map()
+            _truncate_wal()
+            self._wal_offset = 0
+        return index_type
+
+    def _migrate_legacy(self):
+        """旧格式（pickle 元数据 + 无 id 索引 + 无 op/id 的 WAL）→ 新快照，按 mal_id 查出 Event.pk"""
+        from ..models import Event
+
+        with self._mutex, self._lock():
+            if os.path.exists(CURRENT_PATH):
+                return
+            items, vectors, seq, dim = [], [], 0, self.dim
+            if os.path.exists(FAISS_INDEX_PATH) and os.path.exists(FAISS_META_PATH):
+                index = faiss.read_index(FAISS_INDEX_PATH)
+                with open(FAISS_META_PATH, "rb") as f:
+                    snapshot = pickle.load(f)
+                if isinstance(snapshot, list):
+                    snapshot = {"seq": 0, "items": snapshot}
+                seq, dim = snapshot["seq"], index.d
+                try:
+                    if index.ntotal:
+                        vectors.append(index.reconstruct_n(0, index.ntotal))
+                    items = list(snapshot["items"])[:index.ntotal]
+                except RuntimeError as e:
+                    print(f"[FAISS] 旧索引无法导出向量，请执行 embed_events --rebuild-only: {e}")
+            if os.path.exists(FAISS_WAL_PATH):
+                with open(FAISS_WAL_PATH, "rb") as f:
+                    records, _ = _read_wal(f.read(), seq)
+                for seq, item, vec in records:
+                    items.append(item)
+                    vectors.append(vec)
+
+            pks = dict(Event.objects.filter(mal_id__in=[item["mal_id"] for item in items]).values_list("mal_id", "id"))
+            matrix = np.vstack(vectors).astype("float32") if vectors else np.empty((0, dim), dtype="float32")
+            keep = {}
+            for i, item in enumerate(items):
+                if item["mal_id"] in pks:
+                    keep[item["mal_id"]] = i  # 同一故障多次写入时保留最后一条
+            keep = sorted(keep.values())
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+            if keep:
+                self.index.add_with_ids(matrix[keep], np.asarray([pks[items[i]["mal_id"]] for i in keep]))
+            self._seq, self._stale = seq, 0
+            self._write_snapshot(MetaColumns.from_rows(
+                [(pks[items[i]["mal_id"]], items[i]["mal_id"], items[i]["root_cause"], items[i]["suggestion"])
+                 for i in keep]
+            ))
+            _truncate_wal()
+            for path in (FAISS_INDEX_PATH, FAISS_META_PATH):
+                if os.path.exists(path):
+                    os.replace(path, f"{path}.legacy")
+            print(f"[FAISS] 旧格式向量库已转换：{len(keep)} 条（丢弃 {len(items) - len(keep)} 条已删除或重复的故障）")
+
+    # ========== 检索 ==========
+    def search(self, vectors, top_k=3, min_score=0.7):
+        """
+        批量检索：一次 index.search 处理整个查询矩阵，只解码命中行的元数据
+        :param vectors: 形如 (n, dim) 的查询向量（内部归一化）
+        :return: 与查询逐行对应的 [{'score', 'root_cause', 'suggestion', 'mal_id', 'id'}, ...]
+        """
+        query = np.array(vectors, dtype="float32", copy=True).reshape(-1, self.index.d)
+        faiss.normalize_L2(query)
+        with self._mutex:
+            self.refresh()
+            # 残留向量会占用名额，按残留数多取（残留数不超过 STALE_COMPACT_EVERY）
+            D, I = self.index.search(query, top_k + self._stale)
+            results = []
+            for scores, ids in zip(D, I):
+                hits, seen = [], set()
+                for score, faiss_id in zip(scores, ids):
+                    if faiss_id == -1 or score < min_score or len(hits) == top_k or faiss_id in seen:
+                        continue
+                    # 被更新覆盖的旧向量与新向量 id 相同，同一 id 只取得分最高的一条
+                    seen.add(faiss_id)
+                    meta = self.lookup(int(faiss_id))
+                    if meta is None:
+                        continue
+                    hits.append({
+                        "score": float(score),
+                        "root_cause": meta[1],
+                        "suggestion": meta[2],
+                        "mal_id": meta[0],
+                        "id": int(faiss_id),
+                    })
+                results.append(hits)
         return results
 
-    def _save(self):
-        faiss.write_index(self.index, FAISS_INDEX_PATH)
-        with open(FAISS_META_PATH, "wb") as f:
-            pickle.dump(self.meta, f)
+    def search_by_event(self, event, top_k=3, min_score=0.7):
+        from .vectors import get_or_embed
+        return self.search(get_or_embed(event).reshape(1, -1), top_k, min_score)[0]
+
+
+def _has_legacy_data():
+    """旧格式快照，或未压缩过的旧格式 WAL（记录中没有 op 字段）"""
+    if os.path.exists(FAISS_META_PATH):
+        return True
+    if not os.path.exists(FAISS_WAL_PATH):
+        return False
+    with open(FAISS_WAL_PATH, "rb") as f:
+        records, _ = _read_wal(f.read(WAL_HEADER.size + 65536), 0)
+    return bool(records) and "op" not in records[0][1]
+
+
+def build_index(vectors, index_type="auto", ids=None):
+    """
+    构建内积索引（向量需已归一化），外层 IndexIDMap 以 Event.pk 作为向量 id
+    :param index_type: flat 精确检索；ivf 倒排（需训练，适合大语料）；hnsw 图索引（不支持删除，
+                       删除的向量在重建前留在索引中）；auto 时语料不少于 AUTO_IVF_THRESHOLD 条用 ivf，否则 flat
+    :param ids: 与 vectors 逐行对应的 id，缺省为行号
+    :return: (index, 实际类型)
+    """
+    n, dim = vectors.shape
+    if index_type == "auto":
+        index_type = "ivf" if n >= AUTO_IVF_THRESHOLD else "flat"
+    if index_type == "ivf":
+        # 每个聚类中心至少约 39 个训练样本（FAISS 建议）
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        base = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        base.train(vectors)
+        base.nprobe = min(nlist, 16)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efSearch = 64
+    elif index_type == "flat":
+        base = faiss.IndexFlatIP(dim)
+    else:
+        raise ValueError(f"未知的索引类型: {index_type}")
+    index = faiss.IndexIDMap(base)
+    index.add_with_ids(vectors, np.arange(n, dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64))
+    return index, index_type
+
 
+_store = None
+_store_lock = threading.Lock()
 
 
+def get_faiss_store():
+    """进程内共享的 FaissStore，首次调用时加载"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FaissStore()
+    return _store
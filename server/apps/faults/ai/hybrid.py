@@ -0,0 +1,208 @@
+"""
+混合根因推荐：规则 + 向量（FAISS）+ 关键词（BM25）一次打分
+
+  - 三路召回并行：向量路（编码 + FAISS 检索，释放 GIL）在线程池中执行，不访问数据库；
+    规则路和关键词路在调用线程中执行（数据库连接、事务与调用方一致）
+  - 融合：加权倒数排名融合（RRF），score = Σ weight / (RRF_K + rank)；
+    规则权重更高，命中规则时仍排在首位，与原先“规则优先”的语义一致
+  - 候选故障（FAISS 与关键词命中）一次查询取回根因/处理建议
+  - 返回 top-k 推荐及各路得分、排名，timings 为各阶段耗时（毫秒）
+  - rank_root_causes_batch：同一套召回与融合按批执行（历史故障重新分析），
+    规则一次预取设备信息，向量一次批量编码 + 一次 FAISS 检索，候选故障一次查询
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from ..models import Event
+from ..rules.engine import apply_rules_to_contexts, apply_rules_to_events
+from ..utils import build_fault_context
+from .keyword_index import tokenize, category_key, search, corpus_stats
+
+RRF_K = 60
+RRF_WEIGHTS = getattr(settings, 'HYBRID_RRF_WEIGHTS', {'rule': 3.0, 'vector': 1.0, 'keyword': 1.0})
+VECTOR_MIN_SCORE = 0.7
+KEYWORD_MIN_SCORE = 0.3
+CANDIDATES_PER_SOURCE = 10
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'HYBRID_WORKERS', 2),
+                               thread_name_prefix='hybrid-retrieval')
+
+
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _vector_stage(vector, text, top_k):
+    """向量路：缺少向量时编码，FAISS 检索 → (向量, 命中, 耗时)"""
+    from .embedder import embed_texts
+    from .faiss_store import get_faiss_store
+
+    started = time.perf_counter()
+    if vector is None:
+        vector = embed_texts([text])[0]
+    hits = get_faiss_store().search(vector.reshape(1, -1), top_k=top_k, min_score=VECTOR_MIN_SCORE)[0]
+    return vector, hits, _ms(started)
+
+
+def _rule_candidates(event):
+    result = apply_rules_to_contexts([build_fault_context(event)])[0]
+    return [result] if result else []
+
+
+def _keyword_candidates(event, top_k):
+    """关键词路：同分类组合的已结束故障，索引未构建时不召回"""
+    tokens = tokenize(event.description) + tokenize(event.mal_reason)
+    if not tokens or not corpus_stats()[0]:
+        return []
+    hits = search(tokens, category=category_key(event), exclude_ids=[event.pk], top_k=top_k)
+    return [(event_id, score) for event_id, score in hits if score >= KEYWORD_MIN_SCORE]
+
+
+def rank_root_causes(event, top_k=3, candidates_per_source=CANDIDATES_PER_SOURCE):
+    """
+    :param event: Event 实例（with_embedding() 取出时不再查询向量）
+    :return: {'suggestions': [...], 'timings': {...}}，每条推荐含
+             key、source（rule/event）、rule_id 或 mal_id、root_cause、suggestion、
+             score（融合得分）、scores / ranks（各路得分与排名）、confidence
+    """
+    from .vectors import get_embedding, save_embedding
+    from .embedder import EMBEDDING_MODEL, event_text
+
+    started = time.perf_counter()
+    timings = {}
+
+    # 1. 向量路提交到线程池，与规则、关键词路并行
+    vector = get_embedding(event)
+    future = _executor.submit(_vector_stage, vector, event_text(event), candidates_per_source)
+
+    stage = time.perf_counter()
+    rule_hits = _rule_candidates(event)
+    timings['rule'] = _ms(stage)
+
+    stage = time.perf_counter()
+    keyword_hits = _keyword_candidates(event, candidates_per_source)
+    timings['keyword'] = _ms(stage)
+
+    stage = time.perf_counter()
+    try:
+        new_vector, vector_hits, timings['vector'] = future.result()
+    except Exception as e:
+        # 向量路不可用（模型/索引加载失败）时只用规则和关键词
+        print(f"[混合推荐] 故障 {event.mal_id} 向量检索失败: {e}")
+        new_vector, vector_hits, timings['vector'] = vector, [], None
+    timings['vector_wait'] = _ms(stage)
+    if vector is None and new_vector is not None:
+        save_embedding(event, new_vector, model_name=EMBEDDING_MODEL)
+    vector_hits = [hit for hit in vector_hits if hit['mal_id'] != event.mal_id]
+
+    # 2. 候选故障一次查询
+    stage = time.perf_counter()
+    by_id, by_mal_id = _fetch_candidates([event_id for event_id, _ in keyword_hits],
+                                         [hit['mal_id'] for hit in vector_hits])
+    timings['fetch'] = _ms(stage)
+
+    # 3. 融合
+    stage = time.perf_counter()
+    suggestions = _fuse(rule_hits, vector_hits, keyword_hits, by_id, by_mal_id, top_k)
+    timings['fuse'] = _ms(stage)
+    timings['total'] = _ms(started)
+    return {'suggestions': suggestions, 'timings': timings}
+
+
+def rank_root_causes_batch(events, top_k=3, candidates_per_source=CANDIDATES_PER_SOURCE):
+    """
+    批量混合推荐，召回与融合同 rank_root_causes；关键词路仍逐条检索（每条一次倒排查询）
+    :param events: Event 实例列表（with_embedding() 取出时不再查询向量）
+    :return: 与 events 逐条对应的推荐列表（同 rank_root_causes 的 suggestions）
+    """
+    from .faiss_store import get_faiss_store
+    from .vectors import get_or_embed_many
+
+    events = list(events)
+    if not events:
+        return []
+    rule_hits = [[result] if result else [] for result in apply_rules_to_events(events)]
+    keyword_hits = [_keyword_candidates(event, candidates_per_source) for event in events]
+    try:
+        vectors = get_or_embed_many(events)
+        vector_hits = get_faiss_store().search(vectors, top_k=candidates_per_source, min_score=VECTOR_MIN_SCORE)
+    except Exception as e:
+        print(f"[混合推荐] 批量向量检索失败: {e}")
+        vector_hits = [[] for _ in events]
+    vector_hits = [[hit for hit in hits if hit['mal_id'] != event.mal_id] for event, hits in zip(events, vector_hits)]
+
+    by_id, by_mal_id = _fetch_candidates(
+        [event_id for hits in keyword_hits for event_id, _ in hits],
+        [hit['mal_id'] for hits in vector_hits for hit in hits],
+    )
+    return [
+        _fuse(rules, vectors, keywords, by_id, by_mal_id, top_k)
+        for rules, vectors, keywords in zip(rule_hits, vector_hits, keyword_hits)
+    ]
+
+
+def _fetch_candidates(keyword_ids, vector_mal_ids):
+    """关键词路（按 id）、向量路（按 mal_id）命中的故障 → (按 id 索引, 按 mal_id 索引)"""
+    rows = []
+    if keyword_ids or vector_mal_ids:
+        rows = Event.objects.filter(pk__in=keyword_ids) | Event.objects.filter(mal_id__in=vector_mal_ids)
+        rows = list(rows.values('id', 'mal_id', 'mal_reason', 'solution', 'ai_root_cause', 'ai_suggestion'))
+    return {row['id']: row for row in rows}, {row['mal_id']: row for row in rows}
+
+
+def _fuse(rule_hits, vector_hits, keyword_hits, by_id, by_mal_id, top_k):
+    """加权 RRF 融合三路召回 → 按得分排序的 top-k 推荐"""
+    candidates = {}
+
+    def add(key, channel, rank, score, **fields):
+        candidate = candidates.get(key)
+        if candidate is None:
+            candidate = candidates[key] = {'key': key, 'score': 0.0, 'scores': {}, 'ranks': {}, **fields}
+        candidate['scores'][channel] = round(float(score), 4)
+        candidate['ranks'][channel] = rank
+        candidate['score'] += RRF_WEIGHTS.get(channel, 1.0) / (RRF_K + rank)
+
+    for rank, result in enumerate(rule_hits, 1):
+        add(f"rule:{result['rule_id']}", 'rule', rank, result['confidence'], source='rule',
+            rule_id=result['rule_id'], root_cause=result['root_cause'], suggestion=result['suggestion'])
+    for rank, hit in enumerate(vector_hits, 1):
+        row = by_mal_id.get(hit['mal_id'])
+        if row is None:
+            continue
+        add(f"event:{row['mal_id']}", 'vector', rank, hit['score'], source='event', mal_id=row['mal_id'],
+            root_cause=row['ai_root_cause'] or hit['root_cause'], suggestion=row['ai_suggestion'] or hit['suggestion'])
+    for rank, (event_id, score) in enumerate(keyword_hits, 1):
+        row = by_id.get(event_id)
+        if row is None:
+            continue
+        add(f"event:{row['mal_id']}", 'keyword', rank, score, source='event', mal_id=row['mal_id'],
+            root_cause=row['ai_root_cause'] or row['mal_reason'], suggestion=row['ai_suggestion'] or row['solution'])
+
+    suggestions = sorted(candidates.values(), key=lambda c: (-c['score'], c['key']))[:top_k]
+    for candidate in suggestions:
+        candidate['score'] = round(candidate['score'], 6)
+        candidate['confidence'] = max(candidate['scores'].values())
+    return suggestions
+
+
+def to_analysis_result(suggestion):
+    """推荐 → analyze_fault_async 的分析结果（source 标明召回来源）"""
+    if suggestion['source'] == 'rule':
+        source = 'rule'
+    elif len(suggestion['scores']) > 1:
+        source = 'hybrid'
+    elif 'vector' in suggestion['scores']:
+        source = 'ai_similarity'
+    else:
+        source = 'keyword'
+    result = {
+        'source': source,
+        'root_cause': suggestion['root_cause'] or '',
+        'suggestion': suggestion['suggestion'] or '',
+        'confidence': suggestion['confidence'],
+    }
+    if suggestion['source'] == 'rule':
+        result['rule_id'] = suggestion['rule_id']
+    return result
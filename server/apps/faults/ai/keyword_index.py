@@ -0,0 +1,183 @@
+"""
+故障关键词倒排索引（EventKeyword 表）
+
+  - 建索引：description + mal_reason 经 jieba 分词后按词计数，每个 (词, 故障) 一行；
+    故障保存后增量重建该故障的行（signals），全量构建见 build_keyword_index 命令
+  - 检索：只读取查询词的倒排表（与语料总量无关，只与命中的倒排长度有关），
+    候选故障的分类/状态过滤用布尔掩码求交，BM25 打分后 argpartition 取 top-k
+"""
+import re
+import hashlib
+from collections import Counter
+
+import jieba
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from utils.redis_client import cache
+from ..models import Event, EventKeyword
+
+# 相似故障必须一致的分类字段
+CATEGORY_FIELDS = ('first_level', 'subdivision', 'third_level', 'fourth_level', 'level')
+# 影响索引内容的 Event 字段
+KEYWORD_SOURCE_FIELDS = ('description', 'mal_reason', 'mal_result') + CATEGORY_FIELDS
+# 参与相似检索的故障状态：已结束、历史
+CLOSED_RESULTS = (3, 5)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+STATS_CACHE_KEY = 'faults:keyword_index:stats'
+STATS_CACHE_TTL = 600
+
+_PUNCT = re.compile(r'^[\W_]+$')
+
+
+def tokenize(text):
+    """jieba 搜索引擎模式分词，去掉空白和纯标点"""
+    tokens = []
+    for token in jieba.cut_for_search(text or ""):
+        token = token.strip().lower()
+        if token and not _PUNCT.match(token):
+            tokens.append(token[:64])
+    return tokens
+
+
+def category_key(event):
+    """分类字段组合的摘要，event 可以是 Event 实例或 values() 字典"""
+    if isinstance(event, dict):
+        values = [event.get(f) for f in CATEGORY_FIELDS]
+    else:
+        values = [getattr(event, f) for f in CATEGORY_FIELDS]
+    return hashlib.md5('\x1f'.join('' if v is None else str(v) for v in values).encode('utf-8')).hexdigest()
+
+
+def event_keywords(event):
+    """故障的 {词: 词频}"""
+    if isinstance(event, dict):
+        description, mal_reason = event.get('description'), event.get('mal_reason')
+    else:
+        description, mal_reason = event.description, event.mal_reason
+    return Counter(tokenize(description) + tokenize(mal_reason))
+
+
+def keyword_rows(event):
+    """Event（实例或含 id 与 KEYWORD_SOURCE_FIELDS 的字典）→ 未保存的 EventKeyword 行"""
+    counts = event_keywords(event)
+    doc_len = sum(counts.values())
+    key = category_key(event)
+    event_id = event['id'] if isinstance(event, dict) else event.pk
+    mal_result = event['mal_result'] if isinstance(event, dict) else event.mal_result
+    return [
+        EventKeyword(token=token, event_id=event_id, tf=min(tf, 32767), doc_len=doc_len,
+                     category_key=key, mal_result=mal_result)
+        for token, tf in counts.items()
+    ]
+
+
+def index_event(event):
+    """重建单个故障的索引行（故障保存后调用）"""
+    rows = keyword_rows(event)
+    with transaction.atomic():
+        EventKeyword.objects.filter(event_id=event.pk).delete()
+        EventKeyword.objects.bulk_create(rows)
+    cache.delete(STATS_CACHE_KEY)
+
+
+def index_events(events):
+    """批量重建多个故障的索引行，events 为 Event 实例或含 id 与 KEYWORD_SOURCE_FIELDS 的字典"""
+    events = list(events)
+    if not events:
+        return
+    rows = [row for event in events for row in keyword_rows(event)]
+    ids = [event['id'] if isinstance(event, dict) else event.pk for event in events]
+    with transaction.atomic():
+        EventKeyword.objects.filter(event_id__in=ids).delete()
+        EventKeyword.objects.bulk_create(rows, batch_size=5000)
+    cache.delete(STATS_CACHE_KEY)
+
+
+def rebuild_index(batch_size=1000, log=print):
+    """全量重建：流式读取故障，分批写入"""
+    EventKeyword.objects.all().delete()
+    events = Event.objects.order_by('id').values('id', *KEYWORD_SOURCE_FIELDS)
+    rows, total = [], 0
+    for event in events.iterator(chunk_size=batch_size):
+        rows.extend(keyword_rows(event))
+        total += 1
+        if len(rows) >= batch_size * 20:
+            EventKeyword.objects.bulk_create(rows, batch_size=5000)
+            rows = []
+            log(f"已索引 {total} 条故障")
+    EventKeyword.objects.bulk_create(rows, batch_size=5000)
+    cache.delete(STATS_CACHE_KEY)
+    log(f"关键词索引构建完成：{total} 条故障")
+    return total
+
+
+def corpus_stats():
+    """(文档数, 平均文档长度)，缓存 STATS_CACHE_TTL 秒，BM25 对其精度不敏感"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        # 每个故障的 doc_len 等于其各行 tf 之和
+        agg = EventKeyword.objects.aggregate(n=Count('event_id', distinct=True), total=Sum('tf'))
+        n = agg['n'] or 0
+        stats = (n, (agg['total'] or 0) / n if n else 0.0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TTL)
+    return stats
+
+
+def search(tokens, category=None, results=CLOSED_RESULTS, exclude_ids=(), top_k=3):
+    """
+    BM25 检索
+    :param tokens: 查询词（去重后参与打分）
+    :param category: category_key()，只返回同一分类组合的故障
+    :return: [(event_id, 归一化得分), ...]，得分除以查询词 BM25 上界，落在 [0, 1]
+    """
+    tokens = sorted(set(tokens))
+    if not tokens:
+        return []
+    n_docs, avg_len = corpus_stats()
+    if not n_docs:
+        return []
+
+    postings = list(
+        EventKeyword.objects.filter(token__in=tokens).values_list(
+            'token', 'event_id', 'tf', 'doc_len', 'category_key', 'mal_result'
+        )
+    )
+    if not postings:
+        return []
+    token_col, event_col, tf, doc_len, key_col, result_col = zip(*postings)
+    code_of = {token: i for i, token in enumerate(tokens)}
+    token_codes = np.fromiter((code_of.get(t, code_of.get(t.lower(), 0)) for t in token_col),
+                              dtype=np.int64, count=len(token_col))
+    event_ids = np.asarray(event_col, dtype=np.int64)
+    tf = np.asarray(tf, dtype=np.float64)
+    doc_len = np.asarray(doc_len, dtype=np.float64)
+
+    # IDF 用全部倒排（过滤前）的文档频率
+    df = np.bincount(token_codes, minlength=len(tokens))
+    idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    # 分类、状态、排除条件取交集
+    mask = np.isin(np.asarray(result_col), results)
+    if category is not None:
+        mask &= np.asarray(key_col, dtype=object) == category
+    if len(exclude_ids):
+        mask &= ~np.isin(event_ids, list(exclude_ids))
+    if not mask.any():
+        return []
+
+    token_codes, event_ids, tf, doc_len = token_codes[mask], event_ids[mask], tf[mask], doc_len[mask]
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (avg_len or 1))
+    term_scores = idf[token_codes] * tf * (BM25_K1 + 1) / (tf + norm)
+
+    candidates, codes = np.unique(event_ids, return_inverse=True)
+    scores = np.bincount(codes, weights=term_scores, minlength=len(candidates))
+    upper = float((idf * (BM25_K1 + 1)).sum())
+
+    k = min(top_k, len(candidates))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.lexsort((candidates[top], -scores[top]))]
+    return [(int(candidates[i]), float(scores[i] / upper) if upper else 0.0) for i in top]
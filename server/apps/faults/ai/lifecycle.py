@@ -0,0 +1,62 @@
+"""
+AI 模型生命周期（Celery worker）
+
+  - worker_init（prefork 主进程，fork 子进程之前）：preload() 加载向量模型和 FAISS 向量库，
+    之后 gc.freeze() 把已加载对象移出分代回收，子进程 fork 后以写时复制共享模型权重
+  - worker_process_init（每个子进程）：warm_up() 执行一次推理完成首次调用的初始化；
+    solo/threads 等不 fork 的池或关闭预加载时在此完成加载
+  - 启动耗时超过 EMBEDDING_WARMUP_BUDGET 秒时告警
+Web 进程不调用这里的任何函数，不导入 torch / faiss（见 check_import_budget 命令）。
+"""
+import gc
+import time
+
+from django.conf import settings
+
+EMBEDDING_PRELOAD = getattr(settings, 'EMBEDDING_PRELOAD', True)
+EMBEDDING_WARMUP_BUDGET = getattr(settings, 'EMBEDDING_WARMUP_BUDGET', 30)
+WARMUP_TEXT = '网络 通信中断 故障预热'
+
+
+def _check_budget(stage, seconds):
+    if seconds > EMBEDDING_WARMUP_BUDGET:
+        print(f"[AI] {stage}耗时 {seconds:.1f}s，超过启动预算 {EMBEDDING_WARMUP_BUDGET}s")
+
+
+def preload():
+    """加载向量模型与 FAISS 向量库，返回耗时（秒）"""
+    if not EMBEDDING_PRELOAD:
+        return 0.0
+    from .embedder import get_embedder
+    from .faiss_store import get_faiss_store
+
+    started = time.perf_counter()
+    try:
+        get_embedder()
+        get_faiss_store()
+    except Exception as e:
+        print(f"[AI] 预加载失败，首次调用时再加载: {e}")
+        return 0.0
+    # 已加载的对象不再参与分代回收的扫描，避免子进程中 GC 触碰对象头引起页面复制
+    gc.freeze()
+    elapsed = time.perf_counter() - started
+    print(f"[AI] 预加载模型与向量库 {elapsed:.1f}s")
+    _check_budget('预加载', elapsed)
+    return elapsed
+
+
+def warm_up():
+    """子进程中执行一次推理（未预加载时同时完成加载），返回耗时（秒）"""
+    if not EMBEDDING_PRELOAD:
+        return 0.0
+    from .embedder import embed_texts
+
+    started = time.perf_counter()
+    try:
+        embed_texts([WARMUP_TEXT])
+    except Exception as e:
+        print(f"[AI] 预热失败: {e}")
+        return 0.0
+    elapsed = time.perf_counter() - started
+    _check_budget('预热', elapsed)
+    return elapsed
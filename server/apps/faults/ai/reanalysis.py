@@ -0,0 +1,68 @@
+"""
+故障批量（重新）分析
+
+与 analyze_fault_async 相同的流程：混合推荐（规则 + FAISS + 关键词，RRF 融合）→ 兜底，按批处理：
+  - 每批一次查询取出故障及向量，召回与融合见 hybrid.rank_root_causes_batch
+  - 结果 bulk_update 写回（不触发 post_save，不会把重新分析的结果自动加入 FAISS）
+  - 通知按批汇总成一条消息
+"""
+import time
+from collections import Counter
+
+from ..models import Event
+from .hybrid import rank_root_causes_batch, to_analysis_result
+
+FALLBACK_RESULT = {
+    "source": "fallback",
+    "root_cause": "未知原因",
+    "suggestion": "建议人工介入排查。",
+    "confidence": 0.5
+}
+RESULT_FIELDS = ["ai_root_cause", "ai_suggestion", "ai_confidence"]
+
+
+def analyze_batch(events):
+    """
+    分析一批故障并写回
+    :param events: Event 实例列表（with_embedding() 取出可省去向量查询）
+    :return: 与 events 逐条对应的分析结果
+    """
+    results = [
+        to_analysis_result(suggestions[0]) if suggestions else FALLBACK_RESULT
+        for suggestions in rank_root_causes_batch(events, top_k=1)
+    ]
+    for event, result in zip(events, results):
+        event.ai_root_cause = result["root_cause"]
+        event.ai_suggestion = result["suggestion"]
+        event.ai_confidence = result["confidence"]
+    Event.objects.bulk_update(events, RESULT_FIELDS, batch_size=500)
+    return results
+
+
+def analyze_events(queryset, chunk_size=500, notify=True, log=print):
+    """
+    按 id 分批重新分析 queryset 中的故障
+    :return: {'processed': 条数, 'sources': {来源: 条数}, 'seconds': 耗时}
+    """
+    from ..notify import send_fault_analysis_digest
+
+    queryset = queryset.with_embedding().order_by('id')
+    started, processed, last_id = time.perf_counter(), 0, 0
+    sources = Counter()
+    while True:
+        # 按 id 游标分页，避免 offset 越翻越慢
+        events = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not events:
+            break
+        results = analyze_batch(events)
+        batch_sources = Counter(result["source"] for result in results)
+        sources.update(batch_sources)
+        processed += len(events)
+        last_id = events[-1].id
+        if notify:
+            send_fault_analysis_digest(list(zip(events, results)))
+        elapsed = time.perf_counter() - started
+        log(f"已分析 {processed} 条（至 id={last_id}），{processed / elapsed:.1f} 条/秒，{dict(batch_sources)}")
+
+    seconds = time.perf_counter() - started
+    return {'processed': processed, 'sources': dict(sources), 'seconds': round(seconds, 2)}
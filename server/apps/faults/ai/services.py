@@ -1,6 +1,6 @@
 
-from .ai_engine import find_similar_events
-from thirds.dingtalk import ding
+from .hybrid import rank_root_causes
+from thirds.dingtalk_outbox import enqueue_text
 from apps.faults.models import Event
 
 
@@ -9,17 +9,17 @@ def analyze_and_notify(event_id):
     对新创建的 Event 进行 AI 分析，并推送钉钉消息
     """
     try:
-        event = Event.objects.get(id=event_id)
+        event = Event.objects.with_embedding().get(id=event_id)
     except Event.DoesNotExist:
         return
 
-    similar_events = find_similar_events(event, top_k=3)
-
-    if similar_events:
-        best_match = similar_events[0][0]
-        ai_root_cause = best_match.mal_reason[:256]
-        ai_suggestion = best_match.solution or "参考历史处理方案"
-        ai_confidence = round(similar_events[0][1] * 100, 2)  # 转为百分比
+    # 规则、向量、关键词三路召回一次融合，取代单独的关键词匹配
+    ranked = rank_root_causes(event, top_k=3)
+    if ranked['suggestions']:
+        best_match = ranked['suggestions'][0]
+        ai_root_cause = (best_match['root_cause'] or '')[:256]
+        ai_suggestion = best_match['suggestion'] or "参考历史处理方案"
+        ai_confidence = round(best_match['confidence'] * 100, 2)  # 转为百分比
     else:
         ai_root_cause = "未匹配到相似故障"
         ai_suggestion = "建议人工介入分析"
@@ -31,10 +31,9 @@ def analyze_and_notify(event_id):
         event.ai_suggestion = ai_suggestion
         event.ai_confidence = ai_confidence
 
-        # 可选：生成 embedding（此处留空，实际可用 sentence-transformers）
-        # event.embedding = generate_embedding(event.description or "")
+        # 可选：生成向量（apps.faults.ai.vectors.embed_and_save，存 EventEmbedding 表）
 
-        event.save(update_fields=['ai_root_cause', 'ai_suggestion', 'ai_confidence', 'embedding'])
+        event.save(update_fields=['ai_root_cause', 'ai_suggestion', 'ai_confidence'])
 
     # 推送钉钉
     message = f"""
@@ -48,5 +47,5 @@ def analyze_and_notify(event_id):
 - 📊 置信度：{ai_confidence}%
     """.strip()
 
-    ding.send_text_message(recipient_id=event.registrant, content=message)
+    enqueue_text(recipient_id=event.registrant, content=message)
 
@@ -0,0 +1,150 @@
+"""
+事件文本向量存取（EventEmbedding 表，小端 float32 二进制）
+
+FaissStore、analyze_fault_async 等统一通过这里读写向量，不再直接读写 Event.embedding
+"""
+import numpy as np
+from django.db import transaction
+
+from ..models import Event, EventEmbedding
+
+DTYPE = np.dtype('<f4')
+
+
+def to_bytes(vec):
+    return np.asarray(vec, dtype=DTYPE).tobytes()
+
+
+def from_bytes(buf, dim=None):
+    vec = np.frombuffer(bytes(buf), dtype=DTYPE)
+    if dim is not None and vec.size != dim:
+        raise ValueError(f"向量维度不一致: 期望 {dim}，实际 {vec.size}")
+    return vec
+
+
+def _event_id(event):
+    return event.pk if isinstance(event, Event) else event
+
+
+def get_embedding(event):
+    """
+    单个事件的向量，未生成时返回 None
+    :param event: Event 实例或 id；实例已通过 with_embedding() 取出向量时不再查询
+    """
+    if isinstance(event, Event):
+        try:
+            row = event.embedding_vector
+        except EventEmbedding.DoesNotExist:
+            return None
+    else:
+        row = EventEmbedding.objects.filter(event_id=event).only('dim', 'vector').first()
+        if row is None:
+            return None
+    return from_bytes(row.vector, row.dim)
+
+
+def get_embeddings(event_ids):
+    """批量读取向量，一次查询 → {event_id: np.ndarray}"""
+    rows = EventEmbedding.objects.filter(event_id__in=list(event_ids)).values_list('event_id', 'dim', 'vector')
+    return {event_id: from_bytes(vector, dim) for event_id, dim, vector in rows}
+
+
+def load_matrix(event_ids=None, batch_size=2000):
+    """
+    读取向量矩阵（构建 FAISS 索引用），流式读取
+    :return: (ids, matrix)，ids 为 int64 数组，matrix 形如 (n, dim) 的 float32
+    """
+    queryset = EventEmbedding.objects.order_by('event_id')
+    if event_ids is not None:
+        queryset = queryset.filter(event_id__in=list(event_ids))
+    ids, buffers, dim = [], [], None
+    for event_id, row_dim, vector in queryset.values_list('event_id', 'dim', 'vector').iterator(chunk_size=batch_size):
+        if dim is None:
+            dim = row_dim
+        elif row_dim != dim:
+            raise ValueError(f"事件 {event_id} 向量维度 {row_dim} 与其他向量 {dim} 不一致")
+        ids.append(event_id)
+        buffers.append(bytes(vector))
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=DTYPE)
+    matrix = np.frombuffer(b''.join(buffers), dtype=DTYPE).reshape(len(ids), dim)
+    return np.asarray(ids, dtype=np.int64), matrix
+
+
+def save_embedding(event, vec, model_name=''):
+    """写入（覆盖）单个事件的向量"""
+    vec = np.asarray(vec, dtype=DTYPE).ravel()
+    row, _ = EventEmbedding.objects.update_or_create(
+        event_id=_event_id(event),
+        defaults={'dim': vec.size, 'vector': vec.tobytes(), 'model_name': model_name},
+    )
+    if isinstance(event, Event):
+        # 刷新实例上的关联缓存，后续 get_embedding(event) 不再查询
+        event.embedding_vector = row
+    return vec
+
+
+def save_embeddings(items, model_name='', batch_size=1000):
+    """
+    批量写入向量：已有的行 bulk_update，没有的 bulk_create
+    :param items: [(event_id, vec), ...]
+    :return: 写入条数
+    """
+    vectors = {}
+    for event_id, vec in items:
+        vectors[event_id] = np.asarray(vec, dtype=DTYPE).ravel()
+    if not vectors:
+        return 0
+    with transaction.atomic():
+        existing = EventEmbedding.objects.in_bulk(list(vectors))
+        for event_id, row in existing.items():
+            vec = vectors[event_id]
+            row.dim, row.vector, row.model_name = vec.size, vec.tobytes(), model_name
+        EventEmbedding.objects.bulk_update(
+            existing.values(), ['dim', 'vector', 'model_name', 'update_time'], batch_size=batch_size
+        )
+        EventEmbedding.objects.bulk_create([
+            EventEmbedding(event_id=event_id, dim=vec.size, vector=vec.tobytes(), model_name=model_name)
+            for event_id, vec in vectors.items() if event_id not in existing
+        ], batch_size=batch_size)
+    return len(vectors)
+
+
+def embed_and_save(event):
+    """生成并保存事件向量（sentence-transformers），返回 np.float32 数组"""
+    from .embedder import EMBEDDING_MODEL, embed_event_text
+    return save_embedding(event, embed_event_text(event), model_name=EMBEDDING_MODEL)
+
+
+def get_or_embed(event):
+    """优先读取已保存的向量，没有时现算并保存"""
+    vec = get_embedding(event)
+    if vec is None:
+        vec = embed_and_save(event)
+    return vec
+
+
+def get_or_embed_many(events, batch_size=64):
+    """
+    批量取向量，缺失的一次批量编码并写入
+    :param events: Event 实例列表（建议 with_embedding() 取出）
+    :return: 形如 (len(events), dim) 的 float32 矩阵
+    """
+    vectors = {}
+    # 未通过 with_embedding() 取出的一次查询补齐
+    unloaded = [e.pk for e in events if 'embedding_vector' not in e._state.fields_cache]
+    if unloaded:
+        vectors.update(get_embeddings(unloaded))
+    for event in events:
+        if event.pk not in vectors and 'embedding_vector' in event._state.fields_cache:
+            vec = get_embedding(event)
+            if vec is not None:
+                vectors[event.pk] = vec
+
+    missing = [e for e in events if e.pk not in vectors]
+    if missing:
+        from .embedder import EMBEDDING_MODEL, embed_texts, event_text
+        encoded = embed_texts([event_text(e) for e in missing], batch_size=batch_size)
+        save_embeddings(zip([e.pk for e in missing], encoded), model_name=EMBEDDING_MODEL)
+        vectors.update(zip([e.pk for e in missing], encoded))
+    return np.vstack([vectors[e.pk] for e in events]).astype(DTYPE) if events else np.empty((0, 0), dtype=DTYPE)
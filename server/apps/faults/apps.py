@@ -6,7 +6,7 @@ class FaultsConfig(AppConfig):
     name = 'apps.faults'
 
     def ready(self):
-        import faults.signals  # noqa
+        from . import signals  # noqa
 
 
 
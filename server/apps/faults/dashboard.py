@@ -0,0 +1,580 @@
+"""
+故障统计看板
+
+各统计组件的计算逻辑都是作用于行字典（queryset.values）的纯函数，单个统计接口和
+/faults/dashboard/ 复用同一套实现：
+  - 单个接口：按各自的过滤条件查询后调用对应函数
+  - 看板接口：FaultDashboard 只解析一次公共过滤条件、只加载一次事件窗口（事件 + 设备信息两次查询），
+    各组件共享内存中的数据计算
+"""
+import time
+import json
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+from django.db.models import Q, Count, Sum, Max, Min, Avg
+from django.utils.functional import cached_property
+
+from utils.time_bucket import align_day, day_edges, day_start_ts, bucket_counts, today
+from .constants import LEVEL_MAP
+from .intervals import to_arrays, union_length, union_length_by_group
+from .models import Event, EventDeviceInfo
+from .rollup import accumulate, day_of, query_daily_stats, merge_daily_stats
+from .utils import get_last_time
+
+# 看板一次性加载的事件字段（不含 description/embedding 等大字段）
+EVENT_FIELDS = (
+    'id', 'category', 'first_level', 'subdivision', 'third_level', 'level', 'mal_result',
+    'start_time', 'end_time', 'duration', 'is_overtime', 'mal_id', 'child_event', 'related_event',
+    'impact_pro', 'solution_type', 'maintenance', 'score', 'maintenance_duration',
+    'maintenance_status', 'maintenance_remarks',
+)
+DEVICE_FIELDS = ('event_id', 'brand', 'device_model', 'component_name')
+IMPACT_PROJECT_FIELDS = ('id', 'impact_pro', 'level', 'mal_result', 'is_overtime', 'mal_id', 'duration')
+MAINTENANCE_FIELDS = (
+    'maintenance', 'maintenance_duration', 'score', 'maintenance_status', 'maintenance_remarks', 'is_overtime'
+)
+
+# 故障等级堆叠柱状图的系列顺序
+LEVEL_SERIES = {5: "无影响", 1: "轻微", 2: "一般", 3: "严重", 4: "灾难"}
+
+
+def parse_time_range(value, default_days=7, divisor=1):
+    """解析 'start,end' 时间范围，缺省或非法时取最近 default_days 天"""
+    if value:
+        try:
+            start_ts, end_ts = [int(ts) // divisor for ts in value.split(',')]
+            return start_ts, end_ts
+        except (ValueError, TypeError):
+            pass
+    now = int(time.time())
+    return now - 86400 * default_days, now
+
+
+# ========== 故障事件统计 ==========
+def error_intervals(events):
+    """参与故障时长计算的区间：已结束且非“无影响”的故障"""
+    return [e for e in events if e['mal_result'] == 3 and e['level'] != 5]
+
+
+def aggregate_events(events):
+    """内存中的事件 → 与 query_daily_stats 同结构的日汇总行"""
+    buckets = {}
+    for event in events:
+        accumulate(buckets, event, day_of(event['start_time']))
+    return list(buckets.values())
+
+
+def period_metrics(rows, intervals, start_ts, end_ts):
+    """
+    单个周期的卡片指标
+    :param rows: 日汇总行
+    :param intervals: 参与故障时长计算的 {'start_time', 'end_time', 'third_level'} 列表
+    """
+    all_count = sum(r['count'] for r in rows)
+    finished_count = sum(r['count'] for r in rows if r['mal_result'] == 3)
+    starts, ends, third_levels = to_arrays(intervals, group_key='third_level')
+    # 与日汇总一致，三级分类为空记为 ''
+    third_levels = np.asarray(['' if g is None else g for g in third_levels], dtype=object)
+    all_error_time = union_length(starts, ends)
+    no_error_rate = 1 - all_error_time / (end_ts - start_ts) if (end_ts - start_ts) > 0 else 0
+    first_deal = sum(r['first_deal_count'] for r in rows)
+    return {
+        'all_count': all_count,
+        'finished_count': finished_count,
+        'unfinished_count': all_count - finished_count,
+        'all_error_time': all_error_time,
+        'no_error_rate': no_error_rate,
+        'first_deal_per': round((first_deal / all_count) * 100, 2) if all_count else 0,
+        'error_time_by_third_level': union_length_by_group(starts, ends, third_levels),
+    }
+
+
+def statistics_widget(current_rows, current, last, this_month_count):
+    """故障事件统计：卡片、饼图、分类表格（时长单位：秒）"""
+    by_third_level = merge_daily_stats(current_rows, 'third_level')
+    by_first_level = merge_daily_stats(current_rows, 'first_level')
+    by_level = merge_daily_stats(current_rows, 'level')
+    pie_option_subdivision = [{'name': k, 'value': v['count']} for k, v in by_third_level.items()]
+    pie_option_first_level = [{'name': k, 'value': v['count']} for k, v in by_first_level.items()]
+    pie_option_level = [{'name': LEVEL_MAP.get(lv, f"未知({lv})"), 'value': v['count']} for lv, v in by_level.items()]
+
+    by_status = merge_daily_stats(current_rows, 'third_level', 'mal_result')
+    by_third_level_level = merge_daily_stats(current_rows, 'third_level', 'level')
+    table_data = []
+    for third_level in sorted(by_third_level):
+        stat = by_third_level[third_level]
+        sum_duration = stat['duration_sum'] * 60
+        item = {
+            'subdivision': third_level,
+            'sum_duration': sum_duration,
+            'avg_duration': int(sum_duration / stat['count']) if stat['count'] else 0,
+            'unfinished_count': sum(by_status.get((third_level, r), {}).get('count', 0) for r in (1, 2)),
+            'finished_count': by_status.get((third_level, 3), {}).get('count', 0),
+            'all_count': stat['count'],
+            'overtime_count': stat['overtime_count'],
+            'max_duration': stat['duration_max'] * 60,
+            'max_mal_id': stat['max_mal_id'],
+            'error_time': current['error_time_by_third_level'].get(third_level, 0),
+        }
+        # 只添加非零的级别字段
+        for lv in [1, 2, 3, 4, 5]:
+            count = by_third_level_level.get((third_level, lv), {}).get('count', 0)
+            if count > 0:
+                item[LEVEL_MAP[lv]] = count
+        # 计算占比
+        item['max_duration_per'] = round(
+            (item['max_duration'] / item['sum_duration']) * 100, 2
+        ) if item['sum_duration'] > 0 else 0
+        table_data.append(item)
+
+    return {
+        'all_count': current['all_count'],
+        'last_all_count': last['all_count'],
+        'finished_count': current['finished_count'],
+        'last_finished_count': last['finished_count'],
+        'unfinished_count': current['unfinished_count'],
+        'last_unfinished_count': last['unfinished_count'],
+        'all_error_time': current['all_error_time'],
+        'last_all_error_time': last['all_error_time'],
+        'no_error_rate': current['no_error_rate'],
+        'last_no_error_rate': last['no_error_rate'],
+        'this_month_count': this_month_count,
+        'pie_option_subdivision': pie_option_subdivision,
+        'pie_option_first_level': pie_option_first_level,
+        'pie_option_level': pie_option_level,
+        'table_data': table_data,
+        'first_deal_per': current['first_deal_per'],
+        'last_first_deal_per': last['first_deal_per'],
+    }
+
+
+def this_month_count():
+    """本月故障总数（不含废弃）"""
+    month_start_ts = day_start_ts(today().replace(day=1))
+    return sum(r['count'] for r in query_daily_stats(month_start_ts, int(time.time()), ~Q(mal_result=4)))
+
+
+def device_widget(devices):
+    """设备品牌、型号饼图，空值记为“无”"""
+    brands = Counter(d['brand'] or '无' for d in devices)
+    device_models = Counter(d['device_model'] or '无' for d in devices)
+    return {
+        'brands': [{'name': k, 'value': v} for k, v in brands.items()],
+        'device_models': [{'name': k, 'value': v} for k, v in device_models.items()],
+    }
+
+
+def maintenance_widget(events):
+    """维保商饼图（仅服务商处理的故障）"""
+    counts = Counter(e['maintenance'] for e in events if e['solution_type'] == 2 and e['maintenance'])
+    return [{"name": k, "value": v} for k, v in counts.items()]
+
+
+def level_widget(events, start_ts, end_ts):
+    """按故障等级统计故障数量（堆叠柱状图），桶宽随时间跨度变化"""
+    duration = end_ts - start_ts
+    if duration <= 86400 * 10:
+        interval_days = 1
+    elif duration <= 86400 * 33:
+        interval_days = 3
+    elif duration <= 86400 * 99:
+        interval_days = 7
+    else:
+        interval_days = 30
+
+    rows = np.asarray([(e['start_time'], e['level']) for e in events], dtype=np.int64).reshape(-1, 2)
+
+    # 生成所有时间桶（按北京时间 00:00 对齐，起点按 interval_days 对齐）
+    min_date = day_of(start_ts)
+    max_date = day_of(end_ts)
+    bucket_dates, edges = day_edges(align_day(min_date, interval_days), max_date, interval_days)
+    day_list = [date.strftime('%m-%d') for date in bucket_dates]
+
+    # counts[i, level]：第 i 个桶内该等级的故障数
+    counts = bucket_counts(rows[:, 0], edges, labels=rows[:, 1], n_labels=max(LEVEL_SERIES) + 1)
+    series = [
+        {
+            'name': label,
+            'type': 'bar',
+            'stack': '总量',
+            'label': {'show': True, 'position': 'insideRight'},
+            'data': [int(c) or None for c in counts[:, level]],
+        }
+        for level, label in LEVEL_SERIES.items()
+    ]
+    return {'day_list': day_list, 'series': series}
+
+
+def primary_project(impact_pro):
+    """影响项目取第一个，impact_pro 不是非空列表时返回 None"""
+    if isinstance(impact_pro, (list, tuple)) and impact_pro:
+        return impact_pro[0]
+    return None
+
+
+def impact_project_widget(events):
+    """
+    影响项目表格：按首个影响项目分组统计
+    一次 groupby 聚合 + 一次 idxmax 取最长故障，不逐组循环
+    """
+    df = pd.DataFrame(list(events), columns=list(IMPACT_PROJECT_FIELDS))
+    df['project'] = df['impact_pro'].map(primary_project)
+    df = df[df['project'].notna()]
+    if df.empty:
+        return []
+
+    # 去重：同一项目 + 同一故障只保留一条
+    df = df.drop_duplicates(subset=['project', 'id'], keep='first')
+    df = df.assign(
+        duration=pd.to_numeric(df['duration'], errors='coerce'),
+        finished=(df['mal_result'] == 3).astype(int),
+        unfinished=df['mal_result'].isin([1, 2]).astype(int),
+        overtime=(df['is_overtime'] == 1).astype(int),
+    )
+
+    grouped = df.groupby('project', sort=True)
+    stats = grouped.agg(
+        all_count=('id', 'size'),
+        finished_count=('finished', 'sum'),
+        unfinished_count=('unfinished', 'sum'),
+        overtime_count=('overtime', 'sum'),
+        total_duration=('duration', 'sum'),
+        avg_duration=('duration', 'mean'),
+    )
+    # 每个项目持续时间最长的故障（并列取第一条）
+    max_idx = df['duration'].fillna(-np.inf).groupby(df['project']).idxmax()
+    max_rows = df.loc[max_idx.values, ['project', 'duration', 'mal_id']].set_index('project')
+    stats['max_duration'] = max_rows['duration'].fillna(0)
+    stats['max_mal_id'] = max_rows['mal_id'].fillna('').astype(str)
+
+    levels = df.groupby(['project', 'level']).size().unstack(fill_value=0)
+    for level, name in LEVEL_MAP.items():
+        stats[name] = levels[level] if level in levels.columns else 0
+
+    # 持续时间（单位：小时 → 输出为分钟）
+    total = stats['total_duration']
+    stats['max_duration_per'] = (stats['max_duration'] / total.where(total > 0) * 100).round(2).fillna(0.0)
+    stats['sum_duration'] = (total * 60).round(2)
+    stats['avg_duration'] = (stats['avg_duration'].fillna(0.0) * 60).round(2)
+    stats['max_duration'] = (stats['max_duration'] * 60).round(2)
+
+    columns = [
+        'all_count', 'finished_count', 'unfinished_count', 'sum_duration', 'avg_duration',
+        'overtime_count', 'max_mal_id', 'max_duration', 'max_duration_per', *LEVEL_MAP.values(),
+    ]
+    result = stats[columns].reset_index()
+    int_columns = ['all_count', 'finished_count', 'unfinished_count', 'overtime_count', *LEVEL_MAP.values()]
+    result[int_columns] = result[int_columns].astype(int)
+    return [
+        {k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+        for row in result.to_dict('records')
+    ]
+
+
+def device_unit_widget(devices):
+    """故障部件占比饼图"""
+    total = len(devices)
+    if total == 0:
+        return []
+    counts = Counter(d['component_name'] for d in devices)
+    return [{'name': k, 'value': v, 'per': round(v / total, 10)} for k, v in counts.items()]
+
+
+def annual_widget(first_level=None):
+    """
+    年度故障次数统计：年度故障次数大于等于2次的设备，机房使用设备名称，主机使用设备型号
+    统计窗口固定为今年，不受看板时间范围影响
+    """
+    if first_level and first_level != '主机存储组':
+        return []
+
+    start_timestamp = day_start_ts(today().replace(month=1, day=1))
+    end_timestamp = int(time.time())
+
+    base = EventDeviceInfo.objects.filter(
+        Q(event__category=1) &
+        Q(event__first_level="主机存储组") &
+        Q(event__start_time__range=(start_timestamp, end_timestamp)) &
+        ~Q(event__mal_result__in=[4, 5])
+    )
+    data_center = base.filter(event__subdivision="机房").values('device_name').annotate(
+        count=Count('id')
+    ).filter(count__gt=1)
+    host = base.filter(event__subdivision="主机").values('device_model').annotate(
+        count=Count('id')
+    ).filter(count__gt=1)
+
+    result = [{'name': item['device_name'], 'value': item['count']} for item in data_center]
+    result.extend({'name': item['device_model'], 'value': item['count']} for item in host)
+    return result
+
+
+# ========== 服务商统计 ==========
+# 服务商统计口径：服务商处理且填写了维保商的故障
+MAINTENANCE_Q = Q(solution_type=2, maintenance__isnull=False)
+
+
+def maintenance_events(events):
+    """MAINTENANCE_Q 的内存版本"""
+    return [e for e in events if e['solution_type'] == 2 and e['maintenance'] is not None]
+
+
+def final_avg_score(min_score, avg_score):
+    """评分规则：最低分 >= 80 取平均分，否则取最低分"""
+    min_score = min_score or 0
+    return round((avg_score or 0) if min_score >= 80 else min_score, 2)
+
+
+def maintenance_statistics_widget(events, last_count, last_duration):
+    """服务商统计基本数据，时长单位：小时"""
+    total_duration = sum(e['maintenance_duration'] or 0 for e in events)
+    counts = Counter(e['maintenance'] for e in events)
+    fail_counts = Counter(e['maintenance'] for e in events if e['score'] is not None and e['score'] < 60)
+    return {
+        'count': len(events),
+        'last_count': last_count,
+        'total_duration': total_duration / 60 if total_duration else 0,
+        'last_total_duration': last_duration / 60 if last_duration else 0,
+        'maintaince_count_pie': [{"name": k, "value": v} for k, v in counts.items()],
+        'fail_counts': [{"label": k, "value": v} for k, v in fail_counts.items()],
+    }
+
+
+def maintenance_score_widget(events):
+    """服务商评分柱状图：fail_sum = 低于 60 分次数，avg_score 按评分规则计算"""
+    scores = defaultdict(list)
+    for e in events:
+        scores[e['maintenance']].append(e['score'])
+    avg_list, fail_list = [], []
+    for maint, values in scores.items():
+        valid = [s for s in values if s is not None]
+        min_score = min(valid) if valid else None
+        avg_score = sum(valid) / len(valid) if valid else None
+        avg_list.append({'label': maint, 'value': final_avg_score(min_score, avg_score)})
+        fail_list.append({'label': maint, 'value': sum(1 for s in valid if s < 60)})
+    return {"avg_score_stack": avg_list, "fail_score_stack": fail_list}
+
+
+def score_further_deal(remarks):
+    """从评分备注中提取 score_further_deal（JSONField 或 JSON 字符串），失败返回 None"""
+    if isinstance(remarks, str):
+        try:
+            remarks = json.loads(remarks)
+        except ValueError:
+            return None
+    if isinstance(remarks, dict):
+        return remarks.get('score_further_deal')
+    return None
+
+
+def maintenance_score_table_widget(events):
+    """服务商评分表格，单次遍历完成分组聚合"""
+    groups = {}
+    for e in events:
+        stats = groups.get(e['maintenance'])
+        if stats is None:
+            stats = groups[e['maintenance']] = {
+                'maintenance': e['maintenance'], 'count': 0, 'max_duration': 0, 'total': 0,
+                '_scores': [], '已处理': 0, '处理中': 0, '未处理': 0, '无需处理': 0, '超时次数': 0,
+            }
+        duration = e['maintenance_duration'] or 0
+        stats['count'] += 1
+        stats['max_duration'] = max(stats['max_duration'], duration)
+        stats['total'] += duration
+        if e['score'] is not None:
+            stats['_scores'].append(e['score'])
+        status = {2: '已处理', 1: '处理中', 0: '未处理'}.get(e['maintenance_status'])
+        if status:
+            stats[status] += 1
+        # 无需处理：score_further_deal == False（注意：None 或 True 不算）
+        if score_further_deal(e['maintenance_remarks']) is False:
+            stats['无需处理'] += 1
+        if e['is_overtime'] == 1:
+            stats['超时次数'] += 1
+
+    result = []
+    for stats in groups.values():
+        scores = stats.pop('_scores')
+        stats['max_duration'] = stats['max_duration'] / 60
+        stats['total'] = stats['total'] / 60
+        stats['avg_score'] = final_avg_score(min(scores), sum(scores) / len(scores)) if scores else 0
+        result.append(stats)
+    return result
+
+
+# 服务商评分表格的状态分桶：(输出列, 过滤条件)
+SCORE_TABLE_BUCKETS = (
+    ('已处理', Q(maintenance_status=2)),
+    ('处理中', Q(maintenance_status=1)),
+    ('未处理', Q(maintenance_status=0)),
+    ('超时次数', Q(is_overtime=1)),
+)
+
+
+def no_further_deal_counts(queryset):
+    """
+    各服务商“无需处理”（score_further_deal == False，None 或 True 不算）的故障数
+    存量备注多为 JSON 字符串，JSON 路径查询取不到，只取含该键的备注在内存中解析
+    """
+    counts = Counter()
+    rows = queryset.filter(maintenance_remarks__icontains='score_further_deal').values_list(
+        'maintenance', 'maintenance_remarks'
+    )
+    for maintenance, remarks in rows.iterator():
+        if score_further_deal(remarks) is False:
+            counts[maintenance] += 1
+    return counts
+
+
+def maintenance_score_table_query(queryset):
+    """
+    服务商评分表格：状态、时长、评分按服务商一次聚合查询完成，“无需处理”见 no_further_deal_counts
+    """
+    queryset = queryset.order_by()
+    buckets = {label: Count('id', filter=q) for label, q in SCORE_TABLE_BUCKETS}
+    rows = queryset.values('maintenance').annotate(
+        count=Count('id'),
+        max_duration=Max('maintenance_duration'),
+        total=Sum('maintenance_duration'),
+        min_score=Min('score'),
+        avg_score_raw=Avg('score'),
+        **buckets
+    ).order_by('maintenance')
+    no_further_deal = no_further_deal_counts(queryset)
+
+    result = []
+    for row in rows:
+        stats = {
+            'maintenance': row['maintenance'],
+            'count': row['count'],
+            'max_duration': (row['max_duration'] or 0) / 60,
+            'total': (row['total'] or 0) / 60,
+        }
+        stats.update((label, row[label]) for label, _ in SCORE_TABLE_BUCKETS)
+        stats['无需处理'] = no_further_deal[row['maintenance']]
+        stats['avg_score'] = (
+            final_avg_score(row['min_score'], row['avg_score_raw']) if row['min_score'] is not None else 0
+        )
+        result.append(stats)
+    return result
+
+
+class FaultDashboard:
+    """
+    故障统计看板：公共过滤条件只解析一次，事件窗口只加载一次，各组件按对应单个接口的口径（默认类别、时间边界）筛选
+    """
+    WIDGETS = (
+        'statistics', 'device', 'maintenance', 'level', 'impact_project', 'device_unit', 'annual',
+        'maintenance_statistics', 'maintenance_score', 'maintenance_score_table',
+    )
+
+    def __init__(self, params):
+        self.category = params.get('category')
+        self.first_level = params.get('first_level')
+        self.query_type = params.get('query_type', 'week')
+        self.start_ts, self.end_ts = parse_time_range(params.get('time_range'))
+        if self.end_ts <= self.start_ts:
+            self.end_ts = self.start_ts + 86400
+
+    def scope_q(self, prefix='', default_category=None):
+        """
+        公共过滤条件（不含时间），prefix='event__' 时用于 EventDeviceInfo
+        :param default_category: 未指定 category 时使用的类别，与对应的单个统计接口一致
+        """
+        q = ~Q(**{f'{prefix}mal_result__in': [4, 5]})
+        category = self.category or default_category
+        if category:
+            q &= Q(**{f'{prefix}category': category})
+        if self.first_level:
+            q &= Q(**{f'{prefix}first_level': self.first_level})
+        return q
+
+    def event_q(self, prefix='', default_category=None, inclusive=False, time_range=None):
+        """
+        公共过滤条件 + 时间窗口
+        :param inclusive: 包含结束时刻（与使用 start_time__range 的单个接口一致）
+        :param time_range: 缺省为当前窗口 [start_ts, end_ts)
+        """
+        start_ts, end_ts = time_range or (self.start_ts, self.end_ts)
+        end_lookup = 'lte' if inclusive else 'lt'
+        return Q(**{f'{prefix}start_time__gte': start_ts, f'{prefix}start_time__{end_lookup}': end_ts}) \
+            & self.scope_q(prefix, default_category)
+
+    @cached_property
+    def window(self):
+        """一次加载的事件窗口：包含结束时刻，未指定 category 时不按类别过滤，各组件再按自己的口径筛选"""
+        return list(Event.objects.filter(self.event_q(inclusive=True)).order_by().values(*EVENT_FIELDS))
+
+    def select(self, default_category=None, inclusive=False):
+        """按单个统计接口的口径（默认类别、是否包含结束时刻）从事件窗口中筛选"""
+        category = None if self.category else default_category
+        return [
+            e for e in self.window
+            if (inclusive or e['start_time'] < self.end_ts) and (category is None or e['category'] == category)
+        ]
+
+    @cached_property
+    def events(self):
+        return self.select()
+
+    @cached_property
+    def devices(self):
+        return list(EventDeviceInfo.objects.filter(self.event_q('event__', default_category=1)).values(*DEVICE_FIELDS))
+
+    @cached_property
+    def maintenance_events(self):
+        return maintenance_events(self.select(inclusive=True))
+
+    def last_time_range(self):
+        last_start, last_end = get_last_time(self.query_type, [self.start_ts, self.end_ts])
+        return int(last_start), int(last_end)
+
+    def widget_statistics(self):
+        if not self.events:
+            return {}
+        last_start, last_end = self.last_time_range()
+        stat_q = self.scope_q()
+
+        current_rows = aggregate_events(self.events)
+        current = period_metrics(current_rows, error_intervals(self.events), self.start_ts, self.end_ts)
+        last_intervals = Event.objects.filter(
+            stat_q, start_time__gte=last_start, start_time__lt=last_end, mal_result=3
+        ).exclude(level=5).order_by().values('start_time', 'end_time', 'third_level')
+        last = period_metrics(query_daily_stats(last_start, last_end, stat_q), last_intervals, last_start, last_end)
+        return statistics_widget(current_rows, current, last, this_month_count())
+
+    def widget_device(self):
+        return device_widget(self.devices)
+
+    def widget_maintenance(self):
+        return maintenance_widget(self.events)
+
+    def widget_level(self):
+        return level_widget(self.select(default_category=1, inclusive=True), self.start_ts, self.end_ts)
+
+    def widget_impact_project(self):
+        return impact_project_widget(self.select(default_category=1, inclusive=True))
+
+    def widget_device_unit(self):
+        return device_unit_widget(self.devices)
+
+    def widget_annual(self):
+        return annual_widget(self.first_level)
+
+    def widget_maintenance_statistics(self):
+        last_q = self.event_q(inclusive=True, time_range=self.last_time_range()) & MAINTENANCE_Q
+        last = Event.objects.filter(last_q).aggregate(count=Count('id'), duration=Sum('maintenance_duration'))
+        return maintenance_statistics_widget(self.maintenance_events, last['count'], last['duration'])
+
+    def widget_maintenance_score(self):
+        return maintenance_score_widget(self.maintenance_events)
+
+    def widget_maintenance_score_table(self):
+        return maintenance_score_table_widget(self.maintenance_events)
+
+    def build(self, widgets=None):
+        """计算指定组件（默认全部），未知组件名忽略"""
+        names = [w for w in (widgets or self.WIDGETS) if w in self.WIDGETS]
+        return {name: getattr(self, f'widget_{name}')() for name in names}
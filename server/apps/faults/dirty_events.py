@@ -0,0 +1,181 @@
+"""
+故障保存信号的合并层
+
+Event / EventDeviceInfo 的信号只登记“哪些故障需要做什么”，同一事务内多次保存去重，
+事务提交后（不在事务中时即保存后）统一处理一次：
+  - 日汇总刷新、统计缓存失效：在当前进程按受影响自然日合并执行
+  - AI 分析（新建）、FAISS 收录/更新/移除（标注变化、删除）、关键词索引（描述/分类变化）：
+    合并为一个 process_dirty_events Celery 任务
+是否需要处理按实际变化的字段判断：旧值取自实例从数据库加载时的值（Event.from_db），
+与保存的值比较，只改了 ai_confidence、update_time 等非语义字段的保存不产生任何后续工作；
+只有加载时缺少的字段（延迟加载、自行构造的实例）才在 pre_save 查询一次。
+每次登记都注册提交回调，回调幂等（首个执行的处理整批），保存点回滚丢弃部分回调时批次仍会处理；
+事务回滚时回调全部丢弃：不在事务中时下次登记新建批次；紧接着开始的事务会沿用该批次，
+回滚部分登记的工作随之执行，各部分按当前数据库状态处理，只是多做一次无效工作。
+"""
+from django.db import transaction
+
+from .models import Event
+from .rollup import ROLLUP_SOURCE_FIELDS, day_of, refresh_daily_stats
+from .stats_cache import IGNORED_FIELDS, invalidate_timestamps
+from .ai.keyword_index import KEYWORD_SOURCE_FIELDS
+
+# 标注变化时才需要同步 FAISS
+ANNOTATION_FIELDS = ('ai_root_cause', 'ai_suggestion')
+# 不参与变化比较的字段：自动更新时间、已废弃的向量列
+UNTRACKED_FIELDS = ('id', 'create_time', 'update_time', 'embedding')
+
+_ATTR = '_faults_dirty_events'
+
+
+def tracked_fields(update_fields=None):
+    """需要比较新旧值的字段（attname），update_fields 给出时只比较其中的字段"""
+    fields = [f for f in Event._meta.concrete_fields if f.attname not in UNTRACKED_FIELDS]
+    if update_fields is not None:
+        fields = [f for f in fields if f.name in update_fields or f.attname in update_fields]
+    return [f.attname for f in fields]
+
+
+def changed_fields(instance, created, update_fields=None):
+    """本次保存实际变化的字段；新建时视为全部变化"""
+    fields = tracked_fields(update_fields)
+    if created:
+        return set(fields)
+    old = getattr(instance, '_dirty_old_values', None)
+    if old is None:
+        # 保存前未能读取旧值（如行已被删除），按全部变化处理
+        return set(fields)
+    return {f for f in fields if f in old and old[f] != getattr(instance, f)}
+
+
+class DirtyEvents:
+    """一个事务内登记的待处理故障"""
+
+    def __init__(self, using):
+        self.using = using
+        self.analyze = set()           # 待 AI 分析的 mal_id
+        self.faiss = set()             # 待同步到 FAISS 的故障 id（按当前标注收录、更新或移除）
+        self.keywords = set()          # 待重建关键词索引的故障 id
+        self.rollup_days = set()       # 待刷新日汇总的自然日
+        self.stats_timestamps = set()  # 待失效统计缓存的 start_time
+        self.device_events = set()     # 设备信息变化的故障 id（提交时一次查询取 start_time）
+        self.flushed = False
+
+    def is_pending(self, connection):
+        """
+        批次仍可登记：未处理且仍在事务中
+        （不在事务中时提交回调立即执行，未处理的批次只能是所在事务已回滚）
+        """
+        return not self.flushed and connection.in_atomic_block
+
+    def schedule(self):
+        transaction.on_commit(self.flush, using=self.using)
+
+    def flush(self):
+        if self.flushed:
+            return
+        self.flushed = True
+        if self.device_events:
+            self.stats_timestamps.update(
+                Event.objects.using(self.using).filter(pk__in=self.device_events).values_list('start_time', flat=True)
+            )
+        # 先刷新汇总再失效缓存，避免缓存重新填入旧的汇总结果
+        if self.rollup_days:
+            refresh_daily_stats(self.rollup_days)
+        if self.stats_timestamps:
+            invalidate_timestamps(self.stats_timestamps)
+        if self.analyze or self.faiss or self.keywords:
+            from .tasks import process_dirty_events
+            try:
+                process_dirty_events.delay(
+                    analyze=sorted(self.analyze), faiss=sorted(self.faiss), keywords=sorted(self.keywords)
+                )
+            except Exception as e:
+                print(f"[故障信号] 提交后续任务失败: {e}")
+
+
+def current_batch(using=None):
+    """当前连接上未提交的批次，没有时新建"""
+    connection = transaction.get_connection(using)
+    batch = getattr(connection, _ATTR, None)
+    if batch is None or not batch.is_pending(connection):
+        batch = DirtyEvents(using)
+        setattr(connection, _ATTR, batch)
+    return batch
+
+
+def compared_fields(update_fields=None):
+    fields = tracked_fields(update_fields)
+    if 'start_time' not in fields:
+        # 统计缓存失效需要旧的 start_time
+        fields.append('start_time')
+    return fields
+
+
+def remember_old_values(instance, update_fields=None):
+    """pre_save：待比较字段的旧值，优先取加载时的值，缺少的字段一次查询补齐"""
+    if not instance.pk:
+        return
+    fields = compared_fields(update_fields)
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    old = {f: loaded[f] for f in fields if f in loaded}
+    missing = [f for f in fields if f not in old]
+    if missing:
+        row = Event.objects.filter(pk=instance.pk).values(*missing).first()
+        old = None if row is None else {**old, **row}
+    instance._dirty_old_values = old
+
+
+def remember_saved_values(instance, update_fields=None):
+    """保存后把保存的值作为新的旧值，同一实例再次保存时不必查询"""
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    deferred = instance.get_deferred_fields()
+    loaded.update((f, getattr(instance, f)) for f in compared_fields(update_fields) if f not in deferred)
+    instance._loaded_values = loaded
+
+
+def record_save(instance, created, update_fields=None, using=None):
+    """post_save：按变化的字段登记后续工作"""
+    changed = changed_fields(instance, created, update_fields)
+    remember_saved_values(instance, update_fields)
+    if not changed:
+        return
+    old = getattr(instance, '_dirty_old_values', None) or {}
+    # 未加载的 start_time 本次没有保存，与旧值相同，不必再查询
+    start_time = old.get('start_time') if 'start_time' in instance.get_deferred_fields() else instance.start_time
+    batch = current_batch(using)
+
+    if created:
+        batch.analyze.add(instance.mal_id)
+    if changed & set(ANNOTATION_FIELDS) and (not created or (instance.ai_root_cause and instance.ai_suggestion)):
+        # 标注新增或修改时更新向量，清空时移除
+        batch.faiss.add(instance.pk)
+    if changed & set(KEYWORD_SOURCE_FIELDS):
+        batch.keywords.add(instance.pk)
+    if changed & set(ROLLUP_SOURCE_FIELDS):
+        # 故障被改到另一天时两天都需要刷新
+        batch.rollup_days.add(day_of(start_time))
+        if old.get('start_time') is not None:
+            batch.rollup_days.add(day_of(old['start_time']))
+    if changed - set(IGNORED_FIELDS):
+        batch.stats_timestamps.update(ts for ts in (start_time, old.get('start_time')) if ts is not None)
+    batch.schedule()
+
+
+def record_delete(instance, using=None):
+    """post_delete：刷新汇总、失效缓存、移除 FAISS 向量（关键词索引由外键级联删除）"""
+    batch = current_batch(using)
+    batch.faiss.add(instance.pk)
+    batch.rollup_days.add(day_of(instance.start_time))
+    batch.stats_timestamps.add(instance.start_time)
+    batch.schedule()
+
+
+def record_device_change(instance, using=None):
+    """设备信息增删改：设备型号、部件等统计依赖设备信息；故障已加载时直接取 start_time，否则提交时批量查询"""
+    batch = current_batch(using)
+    if type(instance).event.is_cached(instance):
+        batch.stats_timestamps.add(instance.event.start_time)
+    else:
+        batch.device_events.add(instance.event_id)
+    batch.schedule()
@@ -0,0 +1,88 @@
+"""
+故障区间合并（interval union）
+
+排序 + 扫描求区间并集，复杂度 O(n log n)，全部用 NumPy 向量化实现：
+  - merge_intervals      合并后的不重叠区间
+  - union_length         区间并集总长度（总故障时长，秒）
+  - union_length_by_group 按分组（一级/三级分类等）分别求并集长度
+"""
+import numpy as np
+
+
+def to_arrays(intervals, group_key=None):
+    """
+    [(start, end), ...] 或 [{'start_time':..., 'end_time':...}, ...] → (starts, ends)
+    指定 group_key 时（仅字典输入）额外返回分组数组 → (starts, ends, groups)
+    缺少结束时间或结束早于开始的区间会被丢弃
+    """
+    rows = [
+        (i['start_time'], i['end_time'], i[group_key] if group_key else None) if isinstance(i, dict)
+        else (i[0], i[1], None)
+        for i in intervals
+    ]
+    rows = [r for r in rows if r[0] is not None and r[1] is not None and r[1] >= r[0]]
+    if rows:
+        arr = np.asarray([r[:2] for r in rows], dtype=np.int64)
+        starts, ends = arr[:, 0], arr[:, 1]
+    else:
+        starts, ends = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if group_key:
+        return starts, ends, np.asarray([r[2] for r in rows], dtype=object)
+    return starts, ends
+
+
+def _block_bounds(starts, ends):
+    """
+    已按开始时间排序的区间 → 每个合并块的 (起始下标, 块开始, 块结束)
+    """
+    running_end = np.maximum.accumulate(ends)
+    new_block = np.empty(len(starts), dtype=bool)
+    new_block[0] = True
+    # 开始时间大于之前所有区间的最大结束时间 → 新的合并块
+    new_block[1:] = starts[1:] > running_end[:-1]
+    idx = np.flatnonzero(new_block)
+    return idx, starts[idx], np.maximum.reduceat(ends, idx)
+
+
+def merge_intervals(starts, ends):
+    """
+    合并重叠区间
+    :return: (merged_starts, merged_ends)，按开始时间升序
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if starts.size == 0:
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    _, block_starts, block_ends = _block_bounds(starts[order], ends[order])
+    return block_starts, block_ends
+
+
+def union_length(starts, ends):
+    """区间并集总长度"""
+    block_starts, block_ends = merge_intervals(starts, ends)
+    return int((block_ends - block_starts).sum())
+
+
+def union_length_by_group(starts, ends, groups):
+    """
+    按分组求区间并集长度，组内重叠合并、组间互不影响
+    :return: {group: 并集长度}
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if starts.size == 0:
+        return {}
+    # 按原始值编码分组（字符串化会把 1 与 '1' 合成一组）
+    labels = {}
+    codes = np.fromiter((labels.setdefault(g, len(labels)) for g in groups), dtype=np.int64, count=starts.size)
+    # 每个分组平移到互不重叠的时间段上，一次扫描即可完成组内合并
+    base = starts.min()
+    span = int(ends.max() - base) + 1
+    starts = starts - base + codes * span
+    ends = ends - base + codes * span
+    order = np.argsort(starts, kind='stable')
+    starts, ends, codes = starts[order], ends[order], codes[order]
+    idx, block_starts, block_ends = _block_bounds(starts, ends)
+    totals = np.bincount(codes[idx], weights=block_ends - block_starts, minlength=len(labels))
+    return {group: int(totals[code]) for group, code in labels.items()}
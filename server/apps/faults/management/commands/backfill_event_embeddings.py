@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from apps.faults.models import Event
+from apps.faults.ai.vectors import save_embeddings
+
+
+class Command(BaseCommand):
+    help = 'Backfill EventEmbedding (binary float32) from the deprecated Event.embedding JSON column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--model-name', type=str, default='paraphrase-multilingual-MiniLM-L12-v2',
+                            help='记录到 EventEmbedding.model_name 的模型名')
+        parser.add_argument('--clear-json', action='store_true',
+                            help='迁移后把 Event.embedding 置空，释放事件表空间')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rows = Event.objects.order_by('id').filter(embedding__isnull=False).values_list('id', 'embedding')
+
+        total = skipped = 0
+        batch = []
+        for event_id, embedding in rows.iterator(chunk_size=batch_size):
+            if not isinstance(embedding, list) or not embedding:
+                skipped += 1
+                continue
+            batch.append((event_id, embedding))
+            if len(batch) >= batch_size:
+                total += self._flush(batch, options)
+                batch = []
+        if batch:
+            total += self._flush(batch, options)
+
+        self.stdout.write(self.style.SUCCESS(f'迁移向量 {total} 条，跳过无效数据 {skipped} 条'))
+
+    def _flush(self, batch, options):
+        count = save_embeddings(batch, model_name=options['model_name'], batch_size=options['batch_size'])
+        if options['clear_json']:
+            # update() 不触发 Event 信号，不会引起统计刷新/AI 分析
+            Event.objects.filter(id__in=[event_id for event_id, _ in batch]).update(embedding=None)
+        self.stdout.write(f'  已迁移 {count} 条（至 id={batch[-1][0]}）')
+        return count
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from thirds import dingtalk_outbox
+from thirds.dingtalk import ding
+from thirds.dingtalk_stub import DingTalkStubServer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the DingTalk outbox (enqueue + batched flush) against a local stub server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='消息条数')
+        parser.add_argument('--recipients', type=int, default=20, help='接收人数量（一半群机器人，一半工作通知）')
+        parser.add_argument('--latency', type=float, default=0.005, help='桩接口每次请求的延迟（秒）')
+        parser.add_argument('--rate-limit-every', type=int, default=0, help='每 N 次请求返回一次限流错误码')
+        parser.add_argument('--direct', action='store_true', help='额外对比不入队、逐条同步发送')
+
+    def handle(self, *args, **options):
+        server = DingTalkStubServer(latency=options['latency'],
+                                    rate_limit_every=options['rate_limit_every']).start()
+        original_url = settings.DING_URL
+        settings.DING_URL = server.url
+        ding.access_token, ding.token_expiry = None, 0
+        try:
+            messages = self.build_messages(server, options['messages'], options['recipients'])
+
+            t0 = time.perf_counter()
+            for message in messages:
+                dingtalk_outbox.enqueue(**message)
+            t_enqueue = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            stats = dingtalk_outbox.flush_outbox()
+            t_flush = time.perf_counter() - t0
+            self.stdout.write(
+                f"outbox  messages={stats['messages']}  requests={stats['requests']}  failed={stats['failed']}  "
+                f"enqueue={t_enqueue * 1000:8.1f}ms ({len(messages) / t_enqueue:8.0f} msg/s)  "
+                f"flush={t_flush * 1000:8.1f}ms ({stats['messages'] / t_flush:8.0f} msg/s)  "
+                f"stub={server.counts}  connections={len(server.connections)}"
+            )
+
+            if options['direct']:
+                before = dict(server.counts)
+                t0 = time.perf_counter()
+                for message in messages:
+                    dingtalk_outbox.send_one({**message, 'recipient_type': message.get('recipient_type', 'user')})
+                t_direct = time.perf_counter() - t0
+                sent = {k: server.counts[k] - before[k] for k in before}
+                self.stdout.write(
+                    f"direct  messages={len(messages)}  "
+                    f"time={t_direct * 1000:8.1f}ms ({len(messages) / t_direct:8.0f} msg/s)  stub={sent}"
+                )
+        finally:
+            settings.DING_URL = original_url
+            server.stop()
+
+    @staticmethod
+    def build_messages(server, count, recipients):
+        messages = []
+        for i in range(count):
+            r = i % recipients
+            if r % 2 == 0:
+                messages.append({'channel': 'webhook', 'recipient': f'{server.url}/robot/send?access_token=r{r}',
+                                 'title': '压测', 'text': f'消息 {i}', 'recipient_type': 'group'})
+            else:
+                messages.append({'channel': 'corp', 'recipient': f'user{r}', 'title': '',
+                                 'text': f'消息 {i}', 'recipient_type': 'user'})
+        return messages
@@ -0,0 +1,59 @@
+import time
+import random
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.faults.intervals import union_length, union_length_by_group
+
+
+def legacy_get_error_time(error_time_list):
+    """重写前的 get_error_time（两两比较，O(n²)），仅用于对比"""
+    for i in error_time_list:
+        for j in error_time_list:
+            if i['start_time'] < j['start_time'] < i['end_time']:
+                i['end_time'] = j['end_time']
+                j['start_time'], j['end_time'] = 0, 0
+    all_start_time = sum([i['start_time'] for i in error_time_list])
+    all_end_time = sum([i['end_time'] for i in error_time_list])
+    return all_end_time - all_start_time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the interval-union outage engine against the legacy get_error_time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='10000,100000,1000000', help='逗号分隔的区间数量')
+        parser.add_argument('--legacy-max', type=int, default=10000,
+                            help='旧实现是 O(n²)，超过该数量不再运行')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        sizes = [int(s) for s in options['sizes'].split(',') if s]
+
+        for n in sizes:
+            # 一年内随机开始，持续 1 分钟 ~ 12 小时
+            starts = rng.integers(0, 86400 * 365, size=n, dtype=np.int64)
+            ends = starts + rng.integers(60, 86400 // 2, size=n, dtype=np.int64)
+            groups = rng.choice(np.array(['网络', '主机存储组', '机房', '应用'], dtype=object), size=n)
+
+            t0 = time.perf_counter()
+            total = union_length(starts, ends)
+            t_union = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            union_length_by_group(starts, ends, groups)
+            t_group = time.perf_counter() - t0
+
+            line = f"n={n:>8}  union={t_union * 1000:9.2f}ms  by_group={t_group * 1000:9.2f}ms"
+            if n <= options['legacy_max']:
+                rows = [{'start_time': int(s), 'end_time': int(e)} for s, e in zip(starts, ends)]
+                random.shuffle(rows)
+                t0 = time.perf_counter()
+                legacy_total = legacy_get_error_time(rows)
+                t_legacy = time.perf_counter() - t0
+                line += f"  legacy={t_legacy * 1000:9.2f}ms  total={total}  legacy_total={legacy_total}"
+            else:
+                line += f"  legacy=skipped  total={total}"
+            self.stdout.write(line)
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import random
+import datetime
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, reset_queries
+from django.db.models import Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, \
+    teardown_test_environment
+
+from apps.faults.models import Event, EventCategory
+from apps.faults.rollup import day_of, rebuild_daily_stats
+from apps.faults.seeding import seed_reference_data, seed_events
+from apps.faults.stats_cache import cache_bypassed
+from utils.seeding import add_seed_arguments
+from utils.time_bucket import today
+
+URL_PREFIX = '/api/dev/faults/'
+ENDPOINTS = (
+    'fault_statistics_data',
+    'fault_statistics_device_data',
+    'fault_statistics_maintenance_data',
+    'fault_statistics_level_data',
+    'fault_statistics_impact_project_data',
+    'fault_statistics_category_trend_data',
+    'fault_statistics_device_unit_data',
+    'fault_statistics_annual_data',
+    'dashboard',
+    'maintenance_statistics_data',
+    'maintenance_statistics_score_data',
+    'maintenance_statistics_score_table_data',
+)
+AI_BENCHMARKS = ('find_similar_events', 'apply_rules_to_event', 'faiss_search_by_event')
+
+
+def measure(func, repeat, connection):
+    """
+    先在 tracemalloc 下执行一次记录内存峰值（同时预热；tracemalloc 会拖慢执行，不计入耗时），
+    再执行 repeat 次计时，最后一次记录 SQL 条数
+    """
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings = []
+    for _ in range(repeat):
+        # DEBUG 下查询日志已满（生成数据时写满）时新查询不增加长度，先清空
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            t0 = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - t0) * 1000)
+    return result, {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': len(queries.captured_queries),
+        'peak_mb': round(peak / 1024 / 1024, 3),
+    }
+
+
+@contextlib.contextmanager
+def isolated_faiss_store(directory):
+    """FAISS 快照、WAL 指向临时目录，基准测试不读写线上向量库"""
+    from apps.faults.ai import faiss_store
+
+    names = ('FAISS_INDEX_PATH', 'FAISS_META_PATH', 'FAISS_WAL_PATH', 'FAISS_SNAPSHOT_DIR', 'CURRENT_PATH', '_store')
+    saved = {name: getattr(faiss_store, name) for name in names}
+    snapshot_dir = os.path.join(directory, 'faiss_snapshots')
+    os.makedirs(snapshot_dir, exist_ok=True)
+    faiss_store.FAISS_INDEX_PATH = os.path.join(directory, 'faiss_index.bin')
+    faiss_store.FAISS_META_PATH = os.path.join(directory, 'faiss_meta.pkl')
+    faiss_store.FAISS_WAL_PATH = os.path.join(directory, 'faiss_wal.bin')
+    faiss_store.FAISS_SNAPSHOT_DIR = snapshot_dir
+    faiss_store.CURRENT_PATH = os.path.join(snapshot_dir, 'CURRENT')
+    faiss_store._store = None
+    try:
+        yield faiss_store
+    finally:
+        for name, value in saved.items():
+            setattr(faiss_store, name, value)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the faults statistics endpoints and AI paths on seeded datasets of increasing size '
+            '(runs in a throwaway test database, writes JSON results for cross-commit comparison)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='1000,10000,100000,1000000', help='逗号分隔的事件数量')
+        parser.add_argument('--repeat', type=int, default=5, help='每个接口计时次数（取中位数）')
+        parser.add_argument('--samples', type=int, default=20, help='AI 路径每轮使用的样本故障数')
+        parser.add_argument('--annotated-ratio', type=float, default=0.2,
+                            help='收录到 FAISS 的已标注故障比例（向量随机生成，不加载模型）')
+        add_seed_arguments(parser, batch_size=5000, chunk_size=50000, seed=42)
+        parser.add_argument('--only', type=str, default='', help='只运行这些基准（逗号分隔的接口名或 AI 路径名）')
+        parser.add_argument('--skip-ai', action='store_true', help='跳过 AI 路径（不构建关键词索引和 FAISS 索引）')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='数据库别名（SQLite 或 MySQL）')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='保留测试库及已生成的数据，下次运行只补齐差额（SQLite 需配置 TEST.NAME 为文件）')
+        parser.add_argument('--url-prefix', type=str, default=URL_PREFIX, help='故障接口的路由前缀')
+        parser.add_argument('--output', type=str, default=None,
+                            help='结果 JSON 路径，默认 benchmark_faults_<提交>_<时间>.json')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.only = {name for name in options['only'].split(',') if name}
+        sizes = sorted(int(s) for s in options['sizes'].split(',') if s)
+
+        connection = connections[options['database']]
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        report = {
+            'commit': git_revision(),
+            'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'options': {k: options[k] for k in ('sizes', 'repeat', 'samples', 'annotated_ratio', 'seed', 'only')},
+            'runs': [],
+        }
+        try:
+            # Silk 会把每个请求写入数据库，不计入被测接口
+            middleware = [m for m in settings.MIDDLEWARE if not m.startswith('silk.')]
+            with override_settings(MIDDLEWARE=middleware), cache_bypassed(), \
+                    tempfile.TemporaryDirectory() as faiss_dir, isolated_faiss_store(faiss_dir) as faiss_store:
+                for size in sizes:
+                    report['runs'].append(self.run_size(size, connection, faiss_store))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = options['output'] or (
+            f"benchmark_faults_{report['commit'] or 'nogit'}_{datetime.datetime.now():%Y%m%d%H%M%S}.json"
+        )
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"结果已写入 {output}"))
+
+    def selected(self, name):
+        return not self.only or name in self.only
+
+    # ========== 数据准备 ==========
+    def seed_to(self, size):
+        """补齐到 size 个事件，重建受影响的日汇总；返回 (新故障 id, 耗时秒)"""
+        existing = Event.objects.count()
+        if existing >= size:
+            return [], 0.0
+        t0 = time.perf_counter()
+        if not EventCategory.objects.exists():
+            seed_reference_data(self.rng, log=lambda msg: None)
+        root_names = list(EventCategory.objects.filter(depth=1).values_list('name', flat=True))
+        sub_names = list(EventCategory.objects.filter(depth=2).values_list('name', flat=True))
+        result = seed_events(size - existing, self.options, root_names, sub_names, start=existing,
+                             log=lambda msg: None)
+        first_ts = Event.objects.aggregate(first=Min('start_time'))['first']
+        rebuild_daily_stats(day_of(first_ts), today())
+        return result['ids'], time.perf_counter() - t0
+
+    def index_keywords(self, ids):
+        from apps.faults.ai.keyword_index import KEYWORD_SOURCE_FIELDS, index_events
+        batch_size = self.options['batch_size']
+        for offset in range(0, len(ids), batch_size):
+            chunk = ids[offset:offset + batch_size]
+            index_events(Event.objects.filter(pk__in=chunk).values('id', *KEYWORD_SOURCE_FIELDS))
+
+    def build_faiss(self, faiss_store):
+        """随机向量 + 已标注比例的故障全量重建（每个规模一次 rebuild）"""
+        ratio = self.options['annotated_ratio']
+        dim = faiss_store.get_faiss_store().dim
+        rows = Event.objects.order_by('id').values_list('id', 'mal_id', 'mal_reason', 'solution')
+        rows = [row for row in rows.iterator(chunk_size=self.options['batch_size']) if self.rng.random() < ratio]
+        if not rows:
+            return None
+        vectors = np.random.default_rng(self.options['seed']).standard_normal((len(rows), dim), dtype=np.float32)
+        items = [{'id': i, 'mal_id': m, 'root_cause': r, 'suggestion': s} for i, m, r, s in rows]
+        return faiss_store.get_faiss_store().rebuild(items, vectors)
+
+    def save_sample_embeddings(self, samples, dim):
+        """样本故障写入随机向量，search_by_event 不调用模型"""
+        from apps.faults.ai.vectors import save_embeddings
+        rng = np.random.default_rng(self.options['seed'])
+        save_embeddings([(event.pk, rng.standard_normal(dim, dtype=np.float32)) for event in samples])
+
+    # ========== 单个规模 ==========
+    def run_size(self, size, connection, faiss_store):
+        new_ids, seed_seconds = self.seed_to(size)
+        run = {'size': size, 'events': Event.objects.count(), 'seed_seconds': round(seed_seconds, 2),
+               'benchmarks': {}}
+        if run['events'] != size:
+            self.stdout.write(self.style.WARNING(f"测试库已有 {run['events']} 个事件，多于 {size}"))
+        self.stdout.write(f"== size={size}  events={run['events']}  seed={seed_seconds:.1f}s")
+
+        now = int(time.time())
+        # 结束时间为当前时刻（非整天），即使未旁路缓存也不会命中
+        params = {'time_range': f"{now - 86400 * 31},{now}", 'query_type': 'month'}
+        client = Client()
+        for name in ENDPOINTS:
+            if not self.selected(name):
+                continue
+            response, stats = measure(lambda: client.get(f"{self.options['url_prefix']}{name}/", params),
+                                      self.options['repeat'], connection)
+            stats['status'] = response.status_code
+            self.record(run, name, stats)
+
+        if not self.options['skip_ai'] and any(self.selected(name) for name in AI_BENCHMARKS):
+            self.run_ai(run, new_ids, connection, faiss_store)
+        return run
+
+    def run_ai(self, run, new_ids, connection, faiss_store):
+        from apps.faults.ai.ai_engine import find_similar_events
+        from apps.faults.rules.engine import apply_rules_to_event
+
+        t0 = time.perf_counter()
+        self.index_keywords(new_ids)
+        index_type = self.build_faiss(faiss_store) if self.selected('faiss_search_by_event') else None
+        run['ai_setup_seconds'] = round(time.perf_counter() - t0, 2)
+        run['faiss_index_type'] = index_type
+
+        sample_ids = self.rng.sample(list(Event.objects.values_list('id', flat=True)),
+                                     min(self.options['samples'], run['events']))
+        samples = list(Event.objects.filter(pk__in=sample_ids))
+        store = faiss_store.get_faiss_store()
+        self.save_sample_embeddings(samples, store.dim)
+
+        def per_call(func):
+            # 每个样本重新取出实例，避免关联缓存让后几次不再查询
+            def run_samples():
+                return [func(event) for event in Event.objects.filter(pk__in=sample_ids)]
+            return run_samples
+
+        benchmarks = {
+            'find_similar_events': find_similar_events,
+            'apply_rules_to_event': apply_rules_to_event,
+            'faiss_search_by_event': lambda event: store.search_by_event(event, top_k=3, min_score=0),
+        }
+        for name, func in benchmarks.items():
+            if not self.selected(name) or (name == 'faiss_search_by_event' and index_type is None):
+                continue
+            _, stats = measure(per_call(func), self.options['repeat'], connection)
+            # 折算为单个样本（SQL 条数不计取出样本的 1 条查询）
+            for key in ('median_ms', 'min_ms', 'max_ms'):
+                stats[key] = round(stats[key] / len(samples), 3)
+            stats['queries'] = round((stats['queries'] - 1) / len(samples), 2)
+            stats['samples'] = len(samples)
+            self.record(run, name, stats)
+
+    def record(self, run, name, stats):
+        run['benchmarks'][name] = stats
+        status = f"  status={stats['status']}" if 'status' in stats else ''
+        self.stdout.write(
+            f"{name:<42} median={stats['median_ms']:10.2f}ms  min={stats['min_ms']:10.2f}ms  "
+            f"queries={stats['queries']:>6}  peak={stats['peak_mb']:8.2f}MB{status}"
+        )
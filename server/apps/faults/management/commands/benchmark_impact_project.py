@@ -0,0 +1,110 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from apps.faults.constants import LEVEL_MAP
+from apps.faults.dashboard import IMPACT_PROJECT_FIELDS, impact_project_widget
+from apps.faults.models import Event
+
+
+def legacy_impact_project(events):
+    """重写前的影响项目统计（逐组循环），仅用于对比"""
+    data = []
+    for event in events:
+        impact_pro = event['impact_pro']
+        if not isinstance(impact_pro, (list, tuple)) or len(impact_pro) == 0:
+            continue
+        data.append({
+            'project': impact_pro[0], 'malfunction_id': event['id'], 'level': event['level'],
+            'mal_result': event['mal_result'], 'is_overtime': event['is_overtime'],
+            'mal_id': event['mal_id'], 'duration': event['duration'],
+        })
+    if not data:
+        return []
+    df = pd.DataFrame(data)
+    df.drop_duplicates(subset=['project', 'malfunction_id'], keep='first', inplace=True)
+    result = []
+    for project, group in df.groupby('project'):
+        total_duration_h = float(group['duration'].sum())
+        avg_duration_h = float(group['duration'].mean()) if not pd.isna(group['duration'].mean()) else 0.0
+        max_row = group.loc[group['duration'].idxmax()]
+        max_duration_h = float(max_row['duration'])
+        level_counts = group['level'].value_counts().to_dict()
+        result.append({
+            'project': project,
+            'all_count': len(group),
+            'finished_count': int((group['mal_result'] == 3).sum()),
+            'unfinished_count': int(group['mal_result'].isin([1, 2]).sum()),
+            'sum_duration': round(total_duration_h * 60, 2),
+            'avg_duration': round(avg_duration_h * 60, 2),
+            'overtime_count': int((group['is_overtime'] == 1).sum()),
+            'max_mal_id': str(max_row['mal_id']) if pd.notna(max_row['mal_id']) else "",
+            'max_duration': round(max_duration_h * 60, 2),
+            'max_duration_per': round((max_duration_h / total_duration_h * 100), 2) if total_duration_h > 0 else 0.0,
+            **{LEVEL_MAP[level]: int(level_counts.get(level, 0)) for level in LEVEL_MAP},
+        })
+    return result
+
+
+def measure(func, *args):
+    """返回 (结果, 耗时 ms, 内存峰值 MB)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    elapsed = (time.perf_counter() - t0) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized impact-project statistics against the legacy per-group loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=200000, help='合成事件数量')
+        parser.add_argument('--projects', type=int, default=500, help='合成影响项目数量')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--db', action='store_true',
+                            help='额外对比数据库读取：完整模型实例 vs values() 投影（取表中前 --size 条）')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n = options['size']
+        projects = [f'项目{i}' for i in range(options['projects'])]
+        events = [
+            {
+                'id': i,
+                'impact_pro': [projects[p], projects[(p + 1) % len(projects)]] if p >= 0 else [],
+                'level': int(level), 'mal_result': int(mal_result), 'is_overtime': int(overtime),
+                'mal_id': f'MAL{i:08d}', 'duration': int(duration),
+            }
+            for i, p, level, mal_result, overtime, duration in zip(
+                range(n),
+                rng.integers(-1, len(projects), size=n),
+                rng.integers(1, 6, size=n),
+                rng.integers(1, 4, size=n),
+                rng.integers(0, 2, size=n),
+                rng.integers(0, 600, size=n),
+            )
+        ]
+
+        new, t_new, m_new = measure(impact_project_widget, events)
+        old, t_old, m_old = measure(legacy_impact_project, events)
+        self.stdout.write(
+            f"widget  n={n}  projects={len(new)}  "
+            f"vectorized={t_new:9.2f}ms / {m_new:7.1f}MB  legacy={t_old:9.2f}ms / {m_old:7.1f}MB  "
+            f"same={new == old}"
+        )
+
+        if options['db']:
+            queryset = Event.objects.order_by()
+            _, t_model, m_model = measure(lambda: list(queryset[:n]))
+            rows, t_values, m_values = measure(lambda: list(queryset.values(*IMPACT_PROJECT_FIELDS)[:n]))
+            self.stdout.write(
+                f"db      rows={len(rows)}  "
+                f"values()={t_values:9.2f}ms / {m_values:7.1f}MB  "
+                f"model instances={t_model:9.2f}ms / {m_model:7.1f}MB"
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.faults.ai.keyword_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the EventKeyword inverted index used by find_similar_events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_index(batch_size=options['batch_size'], log=self.stdout.write)
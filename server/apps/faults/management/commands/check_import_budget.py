@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 在全新解释器中模拟 Web 进程启动：加载 WSGI 应用、路由，并像提交任务时一样导入所有 tasks 模块
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from server.wsgi import application
+import server.urls
+from server.celery import app
+app.loader.import_default_modules()
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(m for m in sys.modules if "." not in m)}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Check that web-process startup stays within its time budget and never imports heavy ML modules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=getattr(settings, 'WEB_STARTUP_BUDGET', 10),
+                            help='启动耗时上限（秒）')
+        parser.add_argument('--forbid', default='torch,sentence_transformers,faiss,onnxruntime',
+                            help='Web 进程不允许导入的模块，逗号分隔')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'server.settings'))
+        proc = subprocess.run([sys.executable, '-c', PROBE], cwd=settings.BASE_DIR, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise CommandError(f"启动探测失败:\n{proc.stderr}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        forbidden = [m for m in options['forbid'].split(',') if m and m in result['modules']]
+        self.stdout.write(f"startup={result['seconds']:.2f}s  budget={options['budget']:.2f}s  "
+                          f"forbidden imported={forbidden or 'none'}")
+        if forbidden:
+            raise CommandError(f"Web 进程启动时导入了 {', '.join(forbidden)}")
+        if result['seconds'] > options['budget']:
+            raise CommandError(f"Web 进程启动耗时 {result['seconds']:.2f}s 超过预算 {options['budget']:.2f}s")
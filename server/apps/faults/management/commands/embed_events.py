@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.faults.ai.batch import embed_events, rebuild_faiss_index
+from apps.faults.ai.faiss_store import INDEX_TYPES
+
+
+class Command(BaseCommand):
+    help = 'Batch-embed historical events into EventEmbedding and optionally rebuild the FAISS index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批读取/写入的故障数，也是检查点间隔')
+        parser.add_argument('--batch-size', type=int, default=64, help='模型编码的 batch 大小')
+        parser.add_argument('--workers', type=int, default=1, help='CPU 编码进程数，大于 1 时启用多进程池')
+        parser.add_argument('--all', action='store_true', dest='reembed',
+                            help='全部重新向量化（更换模型后使用），默认只处理缺失或来自其他模型的向量')
+        parser.add_argument('--reset', action='store_true', help='忽略检查点，从头开始')
+        parser.add_argument('--rebuild-index', action='store_true', help='完成后用全部已标注故障重建 FAISS 索引')
+        parser.add_argument('--rebuild-only', action='store_true', help='跳过向量化，只重建索引')
+        parser.add_argument('--index-type', choices=INDEX_TYPES, default='auto',
+                            help='flat 精确检索；ivf/hnsw 适合大语料；auto 按语料规模选择')
+
+    def handle(self, *args, **options):
+        if not options['rebuild_only']:
+            embed_events(
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                reembed=options['reembed'],
+                resume=not options['reset'],
+                log=self.stdout.write,
+            )
+        if options['rebuild_index'] or options['rebuild_only']:
+            rebuild_faiss_index(options['index_type'], log=self.stdout.write)
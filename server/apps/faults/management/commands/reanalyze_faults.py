@@ -0,0 +1,37 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from apps.faults.models import Event
+from apps.faults.ai.reanalysis import analyze_events
+
+
+class Command(BaseCommand):
+    help = 'Re-run rule/FAISS analysis over historical events in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='开始日期 YYYY-MM-DD（按 start_time）')
+        parser.add_argument('--end', type=str, help='结束日期 YYYY-MM-DD（含）')
+        parser.add_argument('--first-level', type=str)
+        parser.add_argument('--mal-id', action='append', dest='mal_ids', help='可重复指定')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--notify', action='store_true', help='按批发送汇总通知（默认不通知）')
+
+    def handle(self, *args, **options):
+        queryset = Event.objects.all()
+        if options['start']:
+            start = datetime.datetime.strptime(options['start'], '%Y-%m-%d')
+            queryset = queryset.filter(start_time__gte=int(start.timestamp()))
+        if options['end']:
+            end = datetime.datetime.strptime(options['end'], '%Y-%m-%d') + datetime.timedelta(days=1)
+            queryset = queryset.filter(start_time__lt=int(end.timestamp()))
+        if options['first_level']:
+            queryset = queryset.filter(first_level=options['first_level'])
+        if options['mal_ids']:
+            queryset = queryset.filter(mal_id__in=options['mal_ids'])
+
+        result = analyze_events(queryset, chunk_size=options['chunk_size'], notify=options['notify'],
+                                log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"重新分析完成：{result['processed']} 条，耗时 {result['seconds']}s，来源 {result['sources']}"
+        ))
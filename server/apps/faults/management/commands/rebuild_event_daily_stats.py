@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+
+from apps.faults.models import Event
+from apps.faults.rollup import day_of, rebuild_daily_stats
+from utils.time_bucket import today
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the faults daily statistics rollup (event_daily_stat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='起始日期 YYYY-MM-DD，默认最早的故障日期')
+        parser.add_argument('--end', type=str, help='结束日期 YYYY-MM-DD，默认今天')
+        parser.add_argument('--chunk-days', type=int, default=30, help='每批重算的天数')
+
+    def handle(self, *args, **options):
+        if options['start']:
+            start = datetime.datetime.strptime(options['start'], '%Y-%m-%d').date()
+        else:
+            first_ts = Event.objects.aggregate(first=Min('start_time'))['first']
+            if first_ts is None:
+                self.stdout.write("没有故障数据，无需重建")
+                return
+            start = day_of(first_ts)
+        if options['end']:
+            end = datetime.datetime.strptime(options['end'], '%Y-%m-%d').date()
+        else:
+            end = today()
+
+        chunk = datetime.timedelta(days=max(options['chunk_days'], 1))
+        total = 0
+        current = start
+        while current <= end:
+            chunk_end = min(current + chunk - datetime.timedelta(days=1), end)
+            count = rebuild_daily_stats(current, chunk_end)
+            total += count
+            self.stdout.write(f"{current} ~ {chunk_end}: {count} 行")
+            current = chunk_end + datetime.timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'🎉 故障日汇总重建完成，共 {total} 行'))
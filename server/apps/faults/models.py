@@ -1,6 +1,6 @@
 from django.db import models
 from decimal import Decimal
-from django.db.models import JSONField
+from django.db.models import DEFERRED, JSONField
 
 
 class CbaseModel(models.Model):
@@ -49,6 +49,20 @@ class EventComponentInfo(CbaseModel):
         ordering = ('-update_time',)
 
 
+class EventQuerySet(models.QuerySet):
+
+    def with_embedding(self):
+        """同时取出向量（event.embedding_vector），按需显式调用"""
+        return self.select_related('embedding_vector')
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    """默认不加载已废弃的 embedding JSON 列"""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('embedding')
+
+
 class Event(CbaseModel):
     """事件管理 事件表"""
     EVENT_CHOICE = ((1, "故障单"), (2, "事故单"), (3, "其他"))
@@ -96,7 +110,10 @@ class Event(CbaseModel):
     ai_root_cause = models.CharField("AI 初步根因", max_length=256, null=True, blank=True)
     ai_suggestion = models.TextField("AI 处理建议", null=True, blank=True)
     ai_confidence = models.FloatField("AI 置信度", null=True, blank=True)
-    embedding = JSONField("文本向量", null=True, blank=True)  # 用于 FAISS 构建
+    # 已废弃：向量改存 EventEmbedding（float32 二进制），backfill_event_embeddings 迁移后删除该列
+    embedding = JSONField("文本向量", null=True, blank=True)
+
+    objects = EventManager()
 
     class Meta:
         db_table = "event"
@@ -104,6 +121,78 @@ class Event(CbaseModel):
         verbose_name_plural = verbose_name
         ordering = ('-update_time',)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 加载时的值：保存时据此判断实际变化的字段，不必再查询旧值（见 dirty_events）
+        instance._loaded_values = dict(zip(field_names, (value for value in values if value is not DEFERRED)))
+        return instance
+
+    def get_embedding(self):
+        """事件的文本向量（np.float32 数组），未生成时返回 None"""
+        from .ai.vectors import get_embedding
+        return get_embedding(self)
+
+
+class EventEmbedding(models.Model):
+    """事件管理 事件文本向量（与事件表分离，避免大字段拖慢事件查询）"""
+
+    event = models.OneToOneField(to=Event, verbose_name="故障记录", related_name='embedding_vector',
+                                 on_delete=models.CASCADE, primary_key=True)
+    dim = models.SmallIntegerField("向量维度")
+    # 小端 float32 连续存储，长度 dim * 4 字节
+    vector = models.BinaryField("文本向量")
+    model_name = models.CharField("向量模型", max_length=128, default="", blank=True)
+    update_time = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        db_table = "event_embedding"
+        verbose_name = "事件文本向量"
+        verbose_name_plural = verbose_name
+
+
+class EventKeyword(models.Model):
+    """事件管理 故障关键词倒排索引（一行 = 一个词在一条故障中的出现次数）"""
+
+    token = models.CharField("关键词", max_length=64)
+    event = models.ForeignKey(to=Event, verbose_name="故障记录", related_name='keywords', on_delete=models.CASCADE)
+    tf = models.SmallIntegerField("词频", default=1)
+    # 以下为冗余字段，检索时不回表即可完成 BM25 打分和分类过滤
+    doc_len = models.IntegerField("文档词数", default=0)
+    category_key = models.CharField("分类键", max_length=32, db_index=True)
+    mal_result = models.SmallIntegerField("当前状态", choices=Event.EVENT_STATUS_CHOICE, default=1)
+
+    class Meta:
+        db_table = "event_keyword"
+        verbose_name = "故障关键词索引"
+        verbose_name_plural = verbose_name
+        unique_together = (("token", "event"),)
+
+
+class EventDailyStat(models.Model):
+    """事件管理 故障日汇总（统计看板预聚合，按自然日 + 分类维度）"""
+
+    day = models.DateField("日期", db_index=True)
+    category = models.SmallIntegerField(choices=Event.EVENT_CHOICE, default=1, verbose_name="类别")
+    # 参与唯一约束的分类不允许 NULL（NULL 在唯一索引中互不冲突），故障分类为空时记为 ''
+    first_level = models.CharField("一级分类", max_length=128, default="", blank=True)
+    third_level = models.CharField("三级分类", max_length=128, default="", blank=True)
+    level = models.SmallIntegerField("故障等级", choices=Event.EVENT_LEVEL_CHOICE, default=2)
+    mal_result = models.SmallIntegerField("当前状态", choices=Event.EVENT_STATUS_CHOICE, default=1)
+    count = models.IntegerField("故障数", default=0)
+    first_deal_count = models.IntegerField("一次解决数", default=0)
+    overtime_count = models.IntegerField("超时数", default=0)
+    # 与 Event.duration 一致，单位为分钟
+    duration_sum = models.BigIntegerField("处理时间合计", default=0)
+    duration_max = models.IntegerField("最长处理时间", default=0)
+    max_mal_id = models.CharField("最长处理故障id", max_length=32, default="", blank=True)
+
+    class Meta:
+        db_table = "event_daily_stat"
+        verbose_name = "故障日汇总"
+        verbose_name_plural = verbose_name
+        unique_together = (("day", "category", "first_level", "third_level", "level", "mal_result"),)
+
 
 class EventDeviceInfo(models.Model):
     """事件管理 设备信息"""
@@ -1,14 +1,15 @@
 
-import requests
 from django.conf import settings
 
+from thirds.dingtalk_outbox import enqueue_webhook_markdown
+
 
 def send_dingtalk_message(title: str, text: str):
+    """入队后立即返回，由 flush_dingtalk_outbox 合并发送"""
     webhook = getattr(settings, "DINGTALK_WEBHOOK", None)
     if not webhook:
         return
-    msg = {"msgtype": "markdown", "markdown": {"title": title, "text": text}}
-    requests.post(webhook, json=msg, timeout=5)
+    enqueue_webhook_markdown(webhook, title, text)
 
 
 def send_fault_analysis_notification(event, analysis_result):
@@ -23,3 +24,26 @@ def send_fault_analysis_notification(event, analysis_result):
     """.strip()
     send_dingtalk_message("【星辰】故障智能分析提醒", text)
 
+
+
+def send_fault_analysis_digest(items, max_lines=20):
+    """
+    批量分析结果汇总成一条消息
+    :param items: [(event, analysis_result), ...]
+    """
+    if not items:
+        return
+    sources = {}
+    for _, result in items:
+        sources[result['source']] = sources.get(result['source'], 0) + 1
+    lines = [f"- **{event.mal_id}** {event.first_level} / {event.third_level}："
+             f"{result['root_cause']}（{result['confidence']:.0%}，{result['source']}）"
+             for event, result in items[:max_lines]]
+    if len(items) > max_lines:
+        lines.append(f"- …… 其余 {len(items) - max_lines} 条略")
+    text = "\n".join([
+        f"### 批量分析 {len(items)} 条故障",
+        "- **来源分布**: " + "，".join(f"{k} {v}" for k, v in sources.items()),
+        *lines,
+    ])
+    send_dingtalk_message("【星辰】故障批量分析汇总", text)
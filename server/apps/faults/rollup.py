@@ -0,0 +1,188 @@
+"""
+故障日汇总（EventDailyStat）的维护与查询
+
+统计看板按 (自然日, category, first_level, third_level, level, mal_result) 读取预聚合结果，
+窗口两端不足一天的部分直接从 Event 表补齐，保证与按时间戳过滤的结果一致。
+汇总键中为空（NULL）的分类一律记为 ''（NULLABLE_KEYS），Event 表的过滤条件同样按 '' 匹配 NULL。
+"""
+import datetime
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from utils.time_bucket import day_of, day_start_ts
+from .models import Event, EventDailyStat
+
+ROLLUP_KEYS = ('category', 'first_level', 'third_level', 'level', 'mal_result')
+# Event 中可为 NULL 的汇总键
+NULLABLE_KEYS = ('first_level', 'third_level')
+ROLLUP_METRICS = ('count', 'first_deal_count', 'overtime_count', 'duration_sum', 'duration_max', 'max_mal_id')
+# 影响汇总结果的 Event 字段，仅修改其他字段（如 ai_*）时无需刷新
+ROLLUP_SOURCE_FIELDS = ROLLUP_KEYS + (
+    'start_time', 'duration', 'is_overtime', 'mal_id', 'child_event', 'related_event'
+)
+
+
+def is_first_deal(event):
+    """没有子事件、关联事件的故障视为一次解决"""
+    return not (event['child_event'] or '').strip() and not (event['related_event'] or '').strip()
+
+
+def accumulate(buckets, event, day):
+    """把一条 Event（values 字典）累加到 {(day, *ROLLUP_KEYS): 汇总行} 中，为空的分类记为 ''"""
+    key = (day,) + tuple('' if event[k] is None and k in NULLABLE_KEYS else event[k] for k in ROLLUP_KEYS)
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = dict(zip(('day',) + ROLLUP_KEYS, key))
+        bucket.update(count=0, first_deal_count=0, overtime_count=0,
+                      duration_sum=0, duration_max=0, max_mal_id='')
+        buckets[key] = bucket
+
+    duration = event['duration'] or 0
+    if bucket['count'] == 0 or duration > bucket['duration_max']:
+        bucket['duration_max'] = duration
+        bucket['max_mal_id'] = event['mal_id']
+    bucket['count'] += 1
+    bucket['duration_sum'] += duration
+    if event['is_overtime'] == 1:
+        bucket['overtime_count'] += 1
+    if is_first_deal(event):
+        bucket['first_deal_count'] += 1
+
+
+def rebuild_daily_stats(start_day, end_day):
+    """
+    重算 [start_day, end_day] 内每一天的汇总行
+    先锁定这几天已有的汇总行，再读取故障（同一事务），并发刷新同一天时后执行的一次读到的是最新数据
+    :return: 写入的汇总行数
+    """
+    start_ts = day_start_ts(start_day)
+    end_ts = day_start_ts(end_day + datetime.timedelta(days=1))
+
+    with transaction.atomic():
+        existing = lock_daily_stats(start_day, end_day)
+        buckets = {}
+        events = Event.objects.filter(
+            start_time__gte=start_ts, start_time__lt=end_ts
+        ).order_by().values(*ROLLUP_SOURCE_FIELDS).iterator()
+        for event in events:
+            accumulate(buckets, event, day_of(event['start_time']))
+        save_daily_stats(buckets, existing)
+    return len(buckets)
+
+
+def lock_daily_stats(start_day, end_day):
+    """
+    锁定 [start_day, end_day] 的汇总行（需在事务中调用；MySQL 同时锁定范围内的间隙，同一天的刷新串行执行）
+    :return: {(day, *ROLLUP_KEYS): 汇总行 id}
+    """
+    rows = EventDailyStat.objects.select_for_update().filter(day__gte=start_day, day__lte=end_day)
+    return {
+        (row['day'],) + tuple(row[k] for k in ROLLUP_KEYS): row['id']
+        for row in rows.values('id', 'day', *ROLLUP_KEYS)
+    }
+
+
+def save_daily_stats(buckets, existing):
+    """
+    用 buckets 覆盖 lock_daily_stats 锁定范围内的汇总行（需在同一事务中调用）
+    已有行按 id 更新，多余的删除；新行 upsert，并发刷新同一天时不会因唯一约束失败
+    """
+    stale = [pk for key, pk in existing.items() if key not in buckets]
+    if stale:
+        EventDailyStat.objects.filter(pk__in=stale).delete()
+    updated = [EventDailyStat(id=existing[key], **bucket) for key, bucket in buckets.items() if key in existing]
+    EventDailyStat.objects.bulk_update(updated, ROLLUP_METRICS, batch_size=1000)
+
+    created = [EventDailyStat(**bucket) for key, bucket in buckets.items() if key not in existing]
+    options = {}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ('day',) + ROLLUP_KEYS
+    EventDailyStat.objects.bulk_create(created, batch_size=1000, update_conflicts=True,
+                                       update_fields=ROLLUP_METRICS, **options)
+
+
+def refresh_daily_stats(days):
+    """增量刷新若干天的汇总（Event 保存/删除后调用）"""
+    for day in sorted(set(days)):
+        rebuild_daily_stats(day, day)
+
+
+def query_daily_stats(start_ts, end_ts, q=None):
+    """
+    获取 [start_ts, end_ts) 窗口内的汇总行（字典列表，字段同 EventDailyStat）
+    完整的自然日读汇总表，两端不足一天的部分从 Event 表实时聚合
+    :param q: 仅作用于 ROLLUP_KEYS 字段的过滤条件，同时用于汇总表和 Event 表
+    """
+    q = q if q is not None else Q()
+    if end_ts <= start_ts:
+        return []
+
+    first_full_day = day_of(start_ts)
+    if day_start_ts(first_full_day) < start_ts:
+        first_full_day += datetime.timedelta(days=1)
+    end_day = day_of(end_ts)
+    full_start_ts, full_end_ts = day_start_ts(first_full_day), day_start_ts(end_day)
+
+    event_q = coalesce_q(q)
+    rows = []
+    if full_start_ts < full_end_ts:
+        rows.extend(
+            EventDailyStat.objects.filter(q, day__gte=first_full_day, day__lt=end_day)
+            .values('day', *ROLLUP_KEYS, *ROLLUP_METRICS)
+        )
+        partials = [(start_ts, full_start_ts), (full_end_ts, end_ts)]
+    else:
+        partials = [(start_ts, end_ts)]
+
+    buckets = {}
+    for lo, hi in partials:
+        if lo >= hi:
+            continue
+        events = Event.objects.filter(event_q, start_time__gte=lo, start_time__lt=hi).order_by().values(
+            *ROLLUP_SOURCE_FIELDS
+        )
+        for event in events:
+            accumulate(buckets, event, day_of(event['start_time']))
+    rows.extend(buckets.values())
+    return rows
+
+
+def coalesce_q(q):
+    """
+    汇总表上的过滤条件 → Event 表上的等价条件：NULLABLE_KEYS 按 '' 匹配的条件同时匹配 NULL
+    （支持精确匹配和 __in）
+    """
+    children = []
+    for child in q.children:
+        if isinstance(child, Q):
+            child = coalesce_q(child)
+        else:
+            lookup, value = child
+            field, _, op = lookup.partition('__')
+            if field in NULLABLE_KEYS and (
+                (op in ('', 'exact') and value == '') or (op == 'in' and '' in value)
+            ):
+                child = Q(child) | Q(**{f'{field}__isnull': True})
+        children.append(child)
+    return Q(*children, _connector=q.connector, _negated=q.negated)
+
+
+def merge_daily_stats(rows, *keys):
+    """
+    按 keys 合并汇总行，返回 {key: 合并后的汇总行}（单个 key 时字典键为字段值本身）
+    """
+    merged = {}
+    for row in rows:
+        key = row[keys[0]] if len(keys) == 1 else tuple(row[k] for k in keys)
+        item = merged.get(key)
+        if item is None:
+            item = merged[key] = {k: row[k] for k in keys}
+            item.update(count=0, first_deal_count=0, overtime_count=0,
+                        duration_sum=0, duration_max=0, max_mal_id='')
+        if row['count'] and (item['count'] == 0 or row['duration_max'] > item['duration_max']):
+            item['duration_max'] = row['duration_max']
+            item['max_mal_id'] = row['max_mal_id']
+        for field in ('count', 'first_deal_count', 'overtime_count', 'duration_sum'):
+            item[field] += row[field]
+    return merged
@@ -1,11 +1,18 @@
 
 import yaml
 import os
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, List, Callable
+
+from django.db.models import prefetch_related_objects
+
 from apps.faults.utils import build_fault_context
 
 RULES_FILE = os.path.join(os.path.dirname(__file__), "rules.yaml")
 
+# 按这些字段的等值条件给规则分桶，只评估可能命中的规则
+BUCKET_FIELDS = ("first_level", "third_level", "category")
+
 
 def load_rules():
     with open(RULES_FILE, encoding="utf-8") as f:
@@ -13,39 +20,129 @@ def load_rules():
 
 
 def match_condition(data: Dict[str, Any], cond: Dict[str, Any]) -> bool:
-    for key, expected in cond.items():
-        if "__" in key:
-            field, op = key.split("__", 1)
-            value = data.get(field)
-            if value is None:
-                return False
-            if op == "gt" and not (isinstance(value, (int, float)) and value > expected):
-                return False
-            elif op == "lt" and not (isinstance(value, (int, float)) and value < expected):
-                return False
-            elif op == "contains" and not (isinstance(value, str) and expected in value):
-                return False
-            elif op == "in" and not (value in expected):
-                return False
-        else:
-            if data.get(key) != expected:
-                return False
+    """逐条解释执行条件（编译后的规则集与之语义一致）"""
+    return all(predicate(data) for predicate in compile_condition(cond))
+
+
+def _compile_clause(key: str, expected: Any) -> Callable[[Dict[str, Any]], bool]:
+    """把一个 "field" / "field__op" 条件编译成闭包"""
+    if "__" not in key:
+        return lambda data: data.get(key) == expected
+
+    field, op = key.split("__", 1)
+    if op == "gt":
+        return lambda data: isinstance(data.get(field), (int, float)) and data[field] > expected
+    if op == "lt":
+        return lambda data: isinstance(data.get(field), (int, float)) and data[field] < expected
+    if op == "contains":
+        return lambda data: isinstance(data.get(field), str) and expected in data[field]
+    if op == "in":
+        expected_set = frozenset(expected) if all(isinstance(v, (str, int, float)) for v in expected) else None
+        if expected_set is not None:
+            return lambda data: data.get(field) is not None and data[field] in expected_set
+        return lambda data: data.get(field) is not None and data[field] in expected
+    # 未知操作符：只要求字段存在
+    return lambda data: data.get(field) is not None
+
+
+def compile_condition(cond: Dict[str, Any]) -> List[Callable[[Dict[str, Any]], bool]]:
+    return [_compile_clause(key, expected) for key, expected in cond.items()]
+
+
+def _hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
     return True
 
 
+class CompiledRuleSet:
+    """
+    编译后的规则集
+      - 每条规则的条件编译为闭包列表
+      - 规则按其在 BUCKET_FIELDS 上的等值条件分桶：签名（约束了哪些字段）→ {字段值元组: [规则下标]}
+        评估时每个签名查一次字典得到候选规则，按文件顺序评估，第一条命中的生效
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        self.predicates = []
+        self.buckets = {}
+        for i, rule in enumerate(rules):
+            cond = rule["condition"] or {}
+            # 分桶字段的等值条件已由查桶保证，不再重复评估
+            signature = tuple(f for f in BUCKET_FIELDS if f in cond and _hashable(cond[f]))
+            self.predicates.append(compile_condition({k: v for k, v in cond.items() if k not in signature}))
+            values = tuple(cond[f] for f in signature)
+            self.buckets.setdefault(signature, {}).setdefault(values, []).append(i)
+
+    def candidates(self, data: Dict[str, Any]) -> List[int]:
+        found = []
+        for signature, index in self.buckets.items():
+            found.extend(index.get(tuple(data.get(f) for f in signature), ()))
+        if len(self.buckets) > 1:
+            found.sort()
+        return found
+
+    def match(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """第一条命中的规则，没有命中时返回 None"""
+        for i in self.candidates(data):
+            if all(predicate(data) for predicate in self.predicates[i]):
+                return self.rules[i]
+        return None
+
+
+_rule_set = None
+_rule_set_mtime = None
+_rule_set_lock = threading.Lock()
+
+
+def get_rule_set() -> CompiledRuleSet:
+    """编译后的规则集，rules.yaml 修改时间变化时重新加载"""
+    global _rule_set, _rule_set_mtime
+    stat = os.stat(RULES_FILE)
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    if _rule_set is None or mtime != _rule_set_mtime:
+        with _rule_set_lock:
+            if _rule_set is None or mtime != _rule_set_mtime:
+                _rule_set = CompiledRuleSet(load_rules())
+                _rule_set_mtime = mtime
+    return _rule_set
+
+
+def _rule_result(rule: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if rule is None:
+        return None
+    action = rule["action"]
+    return {
+        "source": "rule",
+        "rule_id": rule["id"],
+        "root_cause": action["root_cause"],
+        "suggestion": action["suggestion"],
+        "confidence": action["confidence"]
+    }
+
+
 def apply_rules_to_event(event) -> Optional[Dict[str, Any]]:
 
     fault_data = build_fault_context(event)
-    rules = load_rules()
-    for rule in rules:
-        if match_condition(fault_data, rule["condition"]):
-            action = rule["action"]
-            return {
-                "source": "rule",
-                "rule_id": rule["id"],
-                "root_cause": action["root_cause"],
-                "suggestion": action["suggestion"],
-                "confidence": action["confidence"]
-            }
-    return None
+    return _rule_result(get_rule_set().match(fault_data))
+
+
+def apply_rules_to_events(events) -> List[Optional[Dict[str, Any]]]:
+    """
+    批量规则匹配（历史故障重新分析）：设备信息一次预取，规则集只检查一次是否需要重新加载
+    :param events: Event 实例列表或 queryset
+    :return: 与 events 逐条对应的匹配结果（未命中为 None）
+    """
+    events = list(events)
+    prefetch_related_objects(events, "device_info")
+    rule_set = get_rule_set()
+    return [_rule_result(rule_set.match(build_fault_context(event))) for event in events]
+
 
+def apply_rules_to_contexts(contexts) -> List[Optional[Dict[str, Any]]]:
+    """对已构建好的故障上下文字典批量匹配"""
+    rule_set = get_rule_set()
+    return [_rule_result(rule_set.match(data)) for data in contexts]
@@ -0,0 +1,199 @@
+"""
+故障测试数据生成（generate_event_data、benchmark_faults 共用）
+
+  - 故障按 utils.seeding 分块批量写入（bulk_create 或 LOAD DATA / COPY，可多进程），主键预分配；
+    不触发保存信号，写入后按需重建日汇总（rebuild_daily_stats）和关键词索引（index_events）
+  - 所有随机值来自 random.Random，时间相对固定的参考时间（seed_events 的 now）生成，
+    同一 seed、同一参考时间生成的数据相同
+"""
+import string
+from decimal import Decimal
+from datetime import timedelta
+
+from django.utils import timezone
+
+from utils.seeding import seed_in_chunks
+
+from .models import (
+    EventCategory,
+    EventComponentInfo,
+    Event,
+    EventDeviceInfo,
+    EventHandleProcess,
+    EventTimeEffective,
+    EventTimeSpecial
+)
+
+BRANDS = ["华为", "戴尔", "联想", "HPE", "IBM"]
+MODELS = ["Model-X", "ServerPro", "RackMate", "ThinkSystem"]
+REGISTRANTS = ["张三", "李四", "王五", "赵六"]
+HANDLERS = ["运维A", "运维B", "厂商工程师"]
+HANDLE_STEPS = [
+    "1. 接收告警\n2. 远程登录检查",
+    "1. 现场排查\n2. 更换故障硬盘\n3. 验证服务恢复",
+    "1. 联系厂商\n2. 升级固件\n3. 监控24小时"
+]
+
+
+def random_string(rng, length=8):
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=length))
+
+
+def random_ip(rng):
+    return ".".join(str(rng.randint(0, 255)) for _ in range(4))
+
+
+def seed_reference_data(rng, log=print):
+    """
+    分类、部件、标准时效、特殊时效
+    :return: (一级分类, 二级分类)
+    """
+    root_cats = EventCategory.objects.bulk_create([
+        EventCategory(name=f"一级分类-{i+1}", active=1, parent=None, depth=1) for i in range(3)
+    ])
+    # bulk_create 不一定回填主键（MySQL），按名称取回
+    root_cats = list(EventCategory.objects.filter(name__in=[c.name for c in root_cats], depth=1))
+    sub_cats = EventCategory.objects.bulk_create([
+        EventCategory(name=f"{parent.name}-子类{j+1}", active=1, parent=parent, depth=2)
+        for parent in root_cats for j in range(2)
+    ])
+    sub_cats = list(EventCategory.objects.filter(name__in=[c.name for c in sub_cats], depth=2))
+    all_categories = root_cats + sub_cats
+    log(f"✅ 创建 {len(all_categories)} 个事件分类")
+
+    components = EventComponentInfo.objects.bulk_create([
+        EventComponentInfo(
+            event_sub=rng.choice(all_categories),
+            component_sn=f"SN-COMP-{random_string(rng, 6)}",
+            component_name=f"部件-{i+1}",
+            component_brand=rng.choice(BRANDS),
+            component_model=rng.choice(MODELS),
+            component_specification=f"Spec-{rng.randint(1, 10)}",
+            slot=f"Slot-{rng.randint(1, 8)}",
+            component_info={
+                "warranty": f"{rng.randint(1,5)}年",
+                "vendor_code": random_string(rng, 10)
+            }
+        )
+        for i in range(10)
+    ])
+    log(f"✅ 创建 {len(components)} 个部件信息")
+
+    for cat in [1, 2]:
+        for lvl in [1, 2, 3]:
+            EventTimeEffective.objects.get_or_create(
+                category=cat,
+                first_level="默认",
+                second_level="默认二级",
+                third_level="",
+                fourth_level="",
+                level=lvl,
+                standard=Decimal(str(round(rng.uniform(30, 720), 2)))
+            )
+    log("✅ 创建标准时效规则")
+
+    EventTimeSpecial.objects.bulk_create([
+        EventTimeSpecial(
+            component_name=comp.component_name,
+            component_brand=comp.component_brand,
+            component_model=comp.component_model,
+            standard=Decimal(str(round(rng.uniform(60, 1440), 2)))
+        )
+        for comp in rng.sample(components, min(5, len(components)))
+    ])
+    log("✅ 创建特殊时效规则")
+    return root_cats, sub_cats
+
+
+def build_event(rng, number, root_names, sub_names, now, days=30):
+    """第 number 个故障（mal_id 按参考时间 now 的日期 + 序号生成）"""
+    start_ts = int((now - timedelta(days=rng.randint(1, days))).timestamp())
+    end_ts = start_ts + rng.randint(600, 86400)  # 10分钟 ~ 24小时
+    duration = (end_ts - start_ts) // 60  # 转为分钟
+    return Event(
+        category=rng.choice([1, 2, 3]),
+        level=rng.choice([1, 2, 3, 4]),
+        registrant=rng.choice(REGISTRANTS),
+        handler=rng.choice(HANDLERS),
+        mal_id=f"MAL-{timezone.localtime(now).strftime('%Y%m%d')}-{str(number).zfill(4)}",
+        start_time=start_ts,
+        end_time=end_ts,
+        duration=duration,
+        mal_reason="硬件故障" if rng.random() > 0.5 else "软件异常",
+        cause_department={"dept": rng.choice(["网络部", "服务器组", "DBA团队"])},
+        solution="更换部件" if rng.random() > 0.5 else "重启服务",
+        description=f"服务器 {random_ip(rng)} 出现异常，表现为...",
+        mal_result=rng.choice([1, 2, 3]),
+        reason="电源模块老化",
+        key_endpoint="核心交换机-端口48",
+        maintenance="ABC维保公司",
+        maintenance_type=rng.choice([1, 2]),
+        impact_pro={"projects": ["项目A", "项目B"]},
+        maintenance_remarks={"score": rng.randint(1, 5), "comment": "响应及时"},
+        first_level=rng.choice(root_names),
+        subdivision=rng.choice(sub_names),
+        third_level="三级默认",
+        fourth_level="四级默认",
+        is_overtime=rng.choice([0, 1, 2]),
+        score=rng.randint(0, 100),
+        maintenance_duration=rng.randint(30, 720),  # 30分钟 ~ 12小时
+        maintenance_status=rng.choice([0, 1, 2]),
+        solution_type=rng.choice([0, 1, 2]),
+        document_id=f"DOC-{random_string(rng, 8)}"
+    )
+
+
+def build_devices(rng, event_id):
+    """每个事件关联 1~3 台设备"""
+    return [
+        EventDeviceInfo(
+            event_id=event_id,
+            equipment_ip=random_ip(rng),
+            equipment_sn=f"SN-EQ-{random_string(rng, 8)}",
+            machine_info=f"Server-Type-{rng.choice(['物理机', '虚拟机'])}",
+            rack_location=f"机房{rng.randint(1,5)}-机柜{rng.randint(1,20)}",
+            brand=rng.choice(BRANDS),
+            device_model=rng.choice(MODELS),
+            device_location=f"IDC-{rng.choice(['北京', '上海', '深圳'])}",
+            device_name=f"DB-Primary-{j+1}",
+            component_name=f"CPU-{rng.randint(1,4)}",
+            component_brand="Intel",
+            component_specification="Xeon Gold 6330",
+            slot=f"CPU{j+1}"
+        )
+        for j in range(rng.randint(1, 3))
+    ]
+
+
+def build_event_chunk(chunk):
+    """
+    seed_in_chunks 的生成函数：故障及其设备信息、处理过程
+    chunk.params 含 root_names、sub_names、days、now（参考时间，各块相同）
+    """
+    params = chunk.params
+    for index in range(chunk.start, chunk.start + chunk.count):
+        event = build_event(chunk.rng, index + 1, params['root_names'], params['sub_names'], params['now'],
+                            params['days'])
+        event.pk = chunk.pk(Event, index)
+        chunk.writer.add(event)
+        chunk.writer.add_many(build_devices(chunk.rng, event.pk))
+        chunk.writer.add(EventHandleProcess(event_id=event.pk, handle_process=chunk.rng.choice(HANDLE_STEPS)))
+
+
+def seed_events(count, options, root_names, sub_names, start=0, days=30, now=None, log=print):
+    """
+    批量生成故障（见 utils.seeding.seed_in_chunks）
+    :param options: 命令参数（batch_size、chunk_size、workers、seed、method）
+    :param start: 起始序号（已有数据时从已有条数开始，避免 mal_id 冲突）
+    :param days: 故障开始时间分布在 now 之前多少天内
+    :param now: 参考时间，默认当前时间（只取一次，所有块、所有进程相同）
+    :return: seed_in_chunks 的结果，另含 ids（新故障 id）
+    """
+    if now is None:
+        now = timezone.now()
+    result = seed_in_chunks(build_event_chunk, count, options, reserve=(Event,), start=start, log=log,
+                            params={'root_names': list(root_names), 'sub_names': list(sub_names), 'days': days,
+                                    'now': now})
+    base = result['bases'][Event._meta.label]
+    result['ids'] = list(range(base, base + count))
+    return result
@@ -50,7 +50,8 @@ class EventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Event
-        fields = '__all__'
+        # embedding 已迁移至 EventEmbedding，且默认不加载，序列化时排除避免逐行补查
+        exclude = ('embedding',)
 
     def create(self, validated_data):
         device_data = validated_data.pop('device_info_create', [])
@@ -1,43 +1,40 @@
-
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Event
-from .tasks import analyze_fault_async
-from .ai.faiss_store import FaissStore
+from .models import Event, EventDeviceInfo
+from .dirty_events import remember_old_values, record_save, record_delete, record_device_change
 
 
-# ========== 1. 新建故障 → 触发 AI 分析 ==========
-@receiver(post_save, sender=Event)
-def trigger_ai_analysis_on_new_event(sender, instance: Event, created: bool, **kwargs):
+# 信号只登记变化，事务提交后合并处理，见 dirty_events：
+#   1. 新建故障 → 异步 AI 根因分析
+#   2. 故障被标注（根因+建议变化）→ 加入 FAISS 向量库
+#   3. 故障增删改 → 刷新故障日汇总
+#   4. 故障/设备信息增删改 → 失效统计接口缓存
+#   5. 描述、原因、分类或状态变化 → 增量更新关键词倒排索引
+
+@receiver(pre_save, sender=Event)
+def remember_event_old_values(sender, instance: Event, update_fields=None, **kwargs):
     """
-    当新故障被创建时，异步触发 AI 根因分析。
+    读取修改前的值，post_save 时据此判断哪些字段实际变化
+    （故障被改到另一天时两天的汇总、统计缓存都需要刷新）
     """
-    if created:
-        # 异步分析（非阻塞）
-        analyze_fault_async.delay(instance.mal_id)
+    remember_old_values(instance, update_fields)
 
 
-# ========== 2. 故障被标注（含根因+建议）→ 加入 FAISS ==========
 @receiver(post_save, sender=Event)
-def add_annotated_event_to_faiss(sender, instance: Event, created: bool, **kwargs):
+def record_event_save(sender, instance: Event, created: bool, update_fields=None, using=None, **kwargs):
     """
-    当故障被人工或 AI 标注了根因和处理建议后，加入 FAISS 向量库。
-    注意：此逻辑在 analyze_fault_async 执行完保存 ai_* 字段时也会触发。
+    只修改 ai_confidence 等非语义字段时不产生后续工作；
+    注意：analyze_fault_async 保存 ai_* 字段时也会触发，此时只登记 FAISS 收录
     """
-    # 只收录明确标注的样本
-    if not (instance.ai_root_cause and instance.ai_suggestion):
-        return
+    record_save(instance, created, update_fields, using)
 
-    # 防止在 analyze_fault_async 内部保存时反复调用（非必须，但安全）
-    # 此处不做 created 判断，因为标注可能发生在创建之后（如人工修正）
 
-    try:
-        store = FaissStore()
-        # 【可选】简单去重：检查是否已存在（基于 mal_id）
-        existing_ids = {item["mal_id"] for item in store.meta}
-        if instance.mal_id not in existing_ids:
-            store.add_event(instance)
-    except Exception as e:
-        print(f"[FAISS] 添加故障 {instance.mal_id} 失败: {e}")
+@receiver(post_delete, sender=Event)
+def record_event_delete(sender, instance: Event, using=None, **kwargs):
+    record_delete(instance, using)
 
 
+@receiver(post_save, sender=EventDeviceInfo)
+@receiver(post_delete, sender=EventDeviceInfo)
+def record_device_info_change(sender, instance: EventDeviceInfo, using=None, **kwargs):
+    record_device_change(instance, using)
@@ -0,0 +1,262 @@
+"""
+故障统计接口结果缓存（django_redis default 缓存）
+
+  - 缓存键：接口名 + 规范化参数（category、first_level 等）+ 按自然日对齐的时间窗口
+    时间窗口不是整天（如缺省的“最近 7 天”截止到当前时刻）时不走缓存
+  - 过期时间：依赖的区间都已结束的用 CLOSED_TTL，任一区间包含今天（或截至今天）的用 OPEN_TTL
+  - “本月至今”“年初至今”的区间结束日登记为 OPEN_END，之后任何一天的变更都会失效该条目；
+    缓存键里带上当前月份/年份，跨月/跨年后不会命中旧条目
+  - 失效：每个缓存条目按其依赖的自然日区间登记到有序集合索引（score 为区间结束日），
+    Event 增删改后只删除覆盖了受影响自然日的条目
+  - 命中/未命中/跳过次数按接口记录在哈希表中，见 cache_counters()
+"""
+import hashlib
+import datetime
+import functools
+import contextlib
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django_redis import get_redis_connection
+
+from utils.time_bucket import day_of, day_start_ts, today
+from .utils import get_last_time
+
+CACHE_ALIAS = 'default'
+KEY_PREFIX = 'faults:stats'
+INDEX_KEY = f'{KEY_PREFIX}:index'
+COUNTER_KEY = f'{KEY_PREFIX}:counters'
+
+CLOSED_TTL = 7 * 86400   # 已结束的窗口：数据只会因 Event 变更而改变，依赖精确失效
+OPEN_TTL = 60            # 包含今天的窗口：兜底 queryset.update() 等不触发信号的修改
+OPEN_END = datetime.date.max  # “至今”区间的结束日：随时间延伸，不会结束
+
+# 为 True 时统计接口直接执行视图，不读写缓存、不计数（基准测试，见 cache_bypassed）
+_bypass = False
+
+# 只修改这些字段时统计结果不变，无需失效
+IGNORED_FIELDS = ('ai_root_cause', 'ai_suggestion', 'ai_confidence', 'embedding', 'update_time')
+
+
+def touches_stats(update_fields):
+    return not update_fields or bool(set(update_fields) - set(IGNORED_FIELDS))
+
+
+def _redis():
+    return get_redis_connection(CACHE_ALIAS)
+
+
+def _raw_key(key):
+    """与 django cache 相同的前缀/版本规则，保证索引、计数器与缓存条目在同一命名空间"""
+    return caches[CACHE_ALIAS].make_key(key)
+
+
+# ========== 时间窗口规范化 ==========
+def day_window(start_ts, end_ts):
+    """
+    时间戳窗口 → (start_day, end_day, closed)，不是整天对齐时返回 None
+    结束时间为某日 00:00 时 closed=False（左闭右开），为某日 23:59:59 时 closed=True（两端闭区间）
+    """
+    if end_ts <= start_ts or day_start_ts(day_of(start_ts)) != start_ts:
+        return None
+    if day_start_ts(day_of(end_ts)) == end_ts:
+        return day_of(start_ts), day_of(end_ts) - datetime.timedelta(days=1), False
+    if day_start_ts(day_of(end_ts + 1)) == end_ts + 1:
+        return day_of(start_ts), day_of(end_ts), True
+    return None
+
+
+def time_range_window(param='time_range', divisor=1, with_last_period=False, with_this_month=False,
+                      with_year_to_date=False):
+    """
+    由请求中的时间范围参数生成窗口函数，供 cached_stats 使用
+    :param param: 时间范围参数名，多个时取第一个有值的
+    :param with_last_period: 结果还依赖 get_last_time 计算的上一周期
+    :param with_this_month: 结果还依赖本月故障数
+    :param with_year_to_date: 结果还依赖年初至今的数据（年度统计）
+    :return: fn(params) → (窗口标识, [(依赖的起始日, 结束日), ...]) 或 None
+    """
+    params_names = (param,) if isinstance(param, str) else tuple(param)
+
+    def window(params):
+        value = next((params.get(p) for p in params_names if params.get(p)), None)
+        if not value:
+            return None
+        try:
+            start_ts, end_ts = [int(ts) // divisor for ts in value.split(',')]
+        except (ValueError, TypeError):
+            return None
+        days = day_window(start_ts, end_ts)
+        if days is None:
+            return None
+
+        start_day, end_day, closed = days
+        token = f"{start_day.isoformat()}~{end_day.isoformat()}{']' if closed else ')'}"
+        ranges = [(start_day, end_day)]
+        if with_last_period:
+            query_type = params.get('query_type', 'week')
+            last_start, _ = get_last_time(query_type, [start_ts, end_ts]) or (None, None)
+            if last_start is None:
+                return None
+            ranges.append((day_of(int(last_start)), start_day))
+            # 按月/年对比时上一周期的起点依赖当前月份
+            if query_type in ('month', 'year'):
+                token += f"@{today():%Y-%m}"
+        if with_this_month:
+            current = today()
+            token += f"#{current:%Y-%m}"
+            ranges.append((current.replace(day=1), OPEN_END))
+        if with_year_to_date:
+            year_token, year_ranges = year_to_date_window(params)
+            token += f"#{year_token}"
+            ranges.extend(year_ranges)
+        return token, ranges
+    return window
+
+
+def year_to_date_window(params):
+    """年初至今的窗口（年度统计）"""
+    current = today()
+    return f"{current.year}", [(current.replace(month=1, day=1), OPEN_END)]
+
+
+# ========== 缓存读写与失效 ==========
+def make_cache_key(endpoint, token, params, fields):
+    canonical = '&'.join(f"{f}={(params.get(f) or '').strip()}" for f in fields)
+    digest = hashlib.sha1(f"{token}|{canonical}".encode('utf-8')).hexdigest()[:16]
+    return f"{KEY_PREFIX}:{endpoint}:{digest}"
+
+
+def _count(endpoint, outcome):
+    try:
+        _redis().hincrby(_raw_key(COUNTER_KEY), f"{endpoint}:{outcome}", 1)
+    except Exception as e:
+        print(f"[统计缓存] 计数失败: {e}")
+
+
+def _store(key, content, ranges):
+    current = today()
+    timeout = OPEN_TTL if any(end_day >= current for _, end_day in ranges) else CLOSED_TTL
+    caches[CACHE_ALIAS].set(key, content, timeout)
+
+    # 登记项按起始日区分，起始日相同的区间取最晚的结束日
+    spans = {}
+    for start_day, end_day in ranges:
+        spans[start_day] = max(end_day, spans.get(start_day, end_day))
+    index_key = _raw_key(INDEX_KEY)
+    pipe = _redis().pipeline()
+    for start_day, end_day in spans.items():
+        pipe.zadd(index_key, {f"{key}|{start_day.toordinal()}": end_day.toordinal()})
+    pipe.expire(index_key, CLOSED_TTL)
+    pipe.execute()
+
+
+def invalidate_days(days):
+    """
+    删除覆盖了 days 中任一自然日的缓存条目
+    :return: 删除的条目数
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    conn = _redis()
+    index_key = _raw_key(INDEX_KEY)
+    # 结束日 >= 最早受影响日的登记项才可能覆盖受影响日，再按起始日过滤
+    candidates = conn.zrangebyscore(index_key, days[0].toordinal(), '+inf', withscores=True)
+    stale_members, stale_keys = [], set()
+    ordinals = [d.toordinal() for d in days]
+    for member, end_ordinal in candidates:
+        member = member.decode('utf-8') if isinstance(member, bytes) else member
+        key, start_ordinal = member.rsplit('|', 1)
+        start_ordinal = int(start_ordinal)
+        if any(start_ordinal <= o <= end_ordinal for o in ordinals):
+            stale_members.append(member)
+            stale_keys.add(key)
+    if stale_keys:
+        caches[CACHE_ALIAS].delete_many(list(stale_keys))
+        conn.zrem(index_key, *stale_members)
+    return len(stale_keys)
+
+
+def invalidate_timestamps(timestamps):
+    """Event 变更后调用：按 start_time 所在自然日失效，缓存不可用时只打印错误"""
+    try:
+        return invalidate_days(day_of(ts) for ts in timestamps if ts is not None)
+    except Exception as e:
+        print(f"[统计缓存] 失效失败: {e}")
+        return 0
+
+
+def cached_stats(endpoint, fields=('category', 'first_level'), window=None):
+    """
+    统计接口缓存装饰器，只缓存 200 响应
+    :param endpoint: 接口名，用于缓存键和命中计数
+    :param fields: 参与缓存键的查询参数（时间参数之外）
+    :param window: fn(request.GET) → (窗口标识, 依赖的自然日区间列表)，返回 None 表示不缓存
+    """
+    window = window or time_range_window()
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if _bypass:
+                return view(request, *args, **kwargs)
+            resolved = window(request.GET) if request.method == 'GET' else None
+            if resolved is None:
+                _count(endpoint, 'bypass')
+                return view(request, *args, **kwargs)
+
+            token, ranges = resolved
+            key = make_cache_key(endpoint, token, request.GET, fields)
+            try:
+                content = caches[CACHE_ALIAS].get(key)
+            except Exception as e:
+                print(f"[统计缓存] 读取 {key} 失败: {e}")
+                return view(request, *args, **kwargs)
+            if content is not None:
+                _count(endpoint, 'hit')
+                return HttpResponse(content, content_type='application/json')
+
+            _count(endpoint, 'miss')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                try:
+                    _store(key, response.content, ranges)
+                except Exception as e:
+                    print(f"[统计缓存] 写入 {key} 失败: {e}")
+            return response
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def cache_bypassed():
+    """块内统计接口不读写缓存（基准测试测量实际计算耗时，也不污染线上缓存）"""
+    global _bypass
+    previous, _bypass = _bypass, True
+    try:
+        yield
+    finally:
+        _bypass = previous
+
+
+def cache_counters(reset=False):
+    """
+    各接口的命中/未命中/跳过次数及命中率
+    :return: {endpoint: {'hit': n, 'miss': n, 'bypass': n, 'hit_rate': float}}
+    """
+    conn = _redis()
+    counter_key = _raw_key(COUNTER_KEY)
+    raw = conn.hgetall(counter_key)
+    if reset:
+        conn.delete(counter_key)
+
+    result = {}
+    for field, value in raw.items():
+        field = field.decode('utf-8') if isinstance(field, bytes) else field
+        endpoint, outcome = field.rsplit(':', 1)
+        result.setdefault(endpoint, {'hit': 0, 'miss': 0, 'bypass': 0})[outcome] = int(value)
+    for item in result.values():
+        lookups = item['hit'] + item['miss']
+        item['hit_rate'] = round(item['hit'] / lookups, 4) if lookups else 0
+    return result
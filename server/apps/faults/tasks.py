@@ -1,56 +1,135 @@
 
+import datetime
 from celery import shared_task
-from .rules.engine import apply_rules_to_event
-from .ai.faiss_store import FaissStore
-from .notify import send_fault_analysis_notification
+from .notify import send_fault_analysis_digest, send_fault_analysis_notification
 from .models import Event
+from .rollup import rebuild_daily_stats
+from utils.time_bucket import today
 
 
 @shared_task
 def analyze_fault_async(mal_id: str):
+    # 混合推荐在函数内导入：Web 进程提交任务时不加载 faiss
+    from .ai.hybrid import rank_root_causes, to_analysis_result
+    from .ai.reanalysis import FALLBACK_RESULT
     try:
-        event = Event.objects.get(mal_id=mal_id)
+        event = Event.objects.with_embedding().get(mal_id=mal_id)
 
-        # 1. 规则匹配
-        result = apply_rules_to_event(event)
-
-        # 2. FAISS 相似检索（若规则未命中）
-        if result is None:
-            store = FaissStore()
-            similar = store.search_by_event(event, top_k=1)
-            if similar:
-                best = similar[0]
-                result = {
-                    "source": "ai_similarity",
-                    "root_cause": best["root_cause"],
-                    "suggestion": best["suggestion"],
-                    "confidence": best["score"]
-                }
+        # 1~2. 规则、FAISS 相似检索、关键词检索并行召回，RRF 融合（命中规则时规则排在首位）
+        ranked = rank_root_causes(event, top_k=1)
+        print(f"[混合推荐] 故障 {mal_id} 各阶段耗时(ms): {ranked['timings']}")
+        result = to_analysis_result(ranked['suggestions'][0]) if ranked['suggestions'] else None
 
         # 3. 兜底
         if result is None:
-            result = {
-                "source": "fallback",
-                "root_cause": "未知原因",
-                "suggestion": "建议人工介入排查。",
-                "confidence": 0.5
-            }
-
-        # 4. 保存结果 & 向量
-        from .ai.embedder import embed_event_text
+            result = FALLBACK_RESULT
+
+        # 4. 保存结果 & 向量（向量存 EventEmbedding，FAISS 检索时已生成则直接复用）
+        from .ai.vectors import get_or_embed
         event.ai_root_cause = result["root_cause"]
         event.ai_suggestion = result["suggestion"]
         event.ai_confidence = result["confidence"]
-        event.embedding = embed_event_text(event)
-        event.save(update_fields=["ai_root_cause", "ai_suggestion", "ai_confidence", "embedding"])
+        event.save(update_fields=["ai_root_cause", "ai_suggestion", "ai_confidence"])
+        get_or_embed(event)
 
         # 5. 推送通知
         send_fault_analysis_notification(event, result)
 
         # 6. 更新 FAISS（如果是高质量样本，可选）
         # 此处暂不自动加入，需人工确认后才加入（避免噪声）
-        # 若需自动加入，可调用 store.add_event(event)
+        # 若需自动加入，可调用 get_faiss_store().add_event(event)
 
     except Exception as e:
         print(f"AI 分析故障 {mal_id} 失败: {e}")
 
+
+@shared_task
+def process_dirty_events(analyze=(), faiss=(), keywords=()):
+    """
+    一次事务提交登记的后续工作（见 dirty_events），各部分按当前数据库状态执行
+    :param analyze: 新建、待 AI 分析的 mal_id（同 analyze_fault_async，按批执行）
+    :param faiss: 标注变化或已删除、待同步到 FAISS 的故障 id：有标注的收录（已收录的按新标注更新），
+                  标注被清空或故障已删除的移除
+    :param keywords: 待重建关键词索引的故障 id
+    """
+    if keywords:
+        from .ai.keyword_index import KEYWORD_SOURCE_FIELDS, index_events
+        try:
+            index_events(Event.objects.filter(pk__in=keywords).values('id', *KEYWORD_SOURCE_FIELDS))
+        except Exception as e:
+            print(f"[关键词索引] 更新故障 {list(keywords)} 失败: {e}")
+
+    if analyze:
+        # 新建故障按批分析（bulk_update 写回不触发信号，有结果的一并同步到 FAISS）
+        from .ai.reanalysis import analyze_batch
+        try:
+            events = list(Event.objects.with_embedding().filter(mal_id__in=analyze))
+            results = analyze_batch(events)
+            faiss = set(faiss) | {event.pk for event in events}
+            if len(events) == 1:
+                send_fault_analysis_notification(events[0], results[0])
+            else:
+                send_fault_analysis_digest(list(zip(events, results)))
+        except Exception as e:
+            print(f"AI 分析故障 {list(analyze)} 失败: {e}")
+
+    if faiss:
+        from .ai.faiss_store import get_faiss_store
+        try:
+            store = get_faiss_store()
+            events = [
+                event for event in Event.objects.with_embedding().filter(pk__in=faiss)
+                if event.ai_root_cause and event.ai_suggestion
+            ]
+            store.add_events(events, replace=True)
+            store.remove(set(faiss) - {event.pk for event in events})
+        except Exception as e:
+            print(f"[FAISS] 同步故障 {list(faiss)} 失败: {e}")
+
+
+@shared_task
+def reanalyze_faults_async(mal_ids=None, filters=None, chunk_size=500, notify=True):
+    """
+    批量重新分析（如规则变更后重算历史故障）
+    :param mal_ids: 故障编号列表
+    :param filters: Event.objects.filter 的关键字参数（需可 JSON 序列化），与 mal_ids 同时给出时取交集
+    """
+    from .ai.reanalysis import analyze_events
+    queryset = Event.objects.all()
+    if mal_ids is not None:
+        queryset = queryset.filter(mal_id__in=mal_ids)
+    if filters:
+        queryset = queryset.filter(**filters)
+    return analyze_events(queryset, chunk_size=chunk_size, notify=notify)
+
+
+@shared_task
+def reconcile_event_daily_stats(days: int = 7):
+    """
+    定期对账：重算最近 days 天的故障日汇总
+    兜底 queryset.update()/bulk_create 等不触发信号的写入
+    """
+    end = today()
+    count = rebuild_daily_stats(end - datetime.timedelta(days=days - 1), end)
+    print(f"[Rollup] 重算最近 {days} 天故障日汇总，共 {count} 行")
+    return count
+
+
+@shared_task
+def compact_faiss_store():
+    """定期把 FAISS 预写日志合并进快照，缩短 worker 启动时的重放时间"""
+    from .ai.faiss_store import get_faiss_store
+    seq = get_faiss_store().compact()
+    print(f"[FAISS] 快照已压缩至序号 {seq}")
+    return seq
+
+
+@shared_task
+def embed_events_task(chunk_size=1000, batch_size=64, workers=1, reembed=False, rebuild_index=True,
+                      index_type='auto'):
+    """批量向量化历史故障（可断点续跑），完成后按需重建 FAISS 索引"""
+    from .ai.batch import embed_events, rebuild_faiss_index
+    result = embed_events(chunk_size=chunk_size, batch_size=batch_size, workers=workers, reembed=reembed)
+    if rebuild_index:
+        result['index'] = rebuild_faiss_index(index_type)
+    return result
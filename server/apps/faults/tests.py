@@ -1,3 +1,855 @@
-from django.test import TestCase
+import os
+import json
+import random
+import datetime
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django_redis import get_redis_connection
+
+from . import dirty_events, rollup, stats_cache, views
+from .ai import faiss_store, keyword_index
+from .ai.hybrid import rank_root_causes, rank_root_causes_batch
+from .ai.reanalysis import analyze_batch
+from .ai.vectors import save_embeddings
+from .dashboard import FaultDashboard
+from .intervals import merge_intervals, to_arrays, union_length, union_length_by_group
+from .models import Event, EventDailyStat, EventDeviceInfo
+from .rollup import coalesce_q, merge_daily_stats, query_daily_stats, rebuild_daily_stats
+from .rules.engine import CompiledRuleSet, apply_rules_to_event, apply_rules_to_events, load_rules
+from .seeding import seed_events
+from .stats_cache import cache_bypassed, CLOSED_TTL, OPEN_END, OPEN_TTL, invalidate_days, time_range_window
+from .tasks import process_dirty_events
+from utils import time_bucket
+from utils.time_bucket import day_of, day_start_ts
+
+KEY = f"{stats_cache.KEY_PREFIX}:test:"
+
+
+class RedisTestMixin:
+    """统计缓存依赖 django_redis；连不上 Redis 时跳过。只清理统计缓存命名空间（faults:stats:*）"""
+
+    def setUp(self):
+        super().setUp()
+        try:
+            get_redis_connection(stats_cache.CACHE_ALIAS).ping()
+        except Exception as e:
+            self.skipTest(f"Redis 不可用: {e}")
+        self.addCleanup(self.clear_stats_cache)
+        self.clear_stats_cache()
+
+    @staticmethod
+    def clear_stats_cache():
+        caches[stats_cache.CACHE_ALIAS].delete_pattern(f"{stats_cache.KEY_PREFIX}:*")
+
+
+class StatsCacheTests(RedisTestMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = caches[stats_cache.CACHE_ALIAS]
+        self.today = datetime.date.today()
+
+    def days_ago(self, n):
+        return self.today - datetime.timedelta(days=n)
+
+    def test_invalidate_days_evicts_only_overlapping_entries(self):
+        stats_cache._store(KEY + 'k1', b'1', [(self.days_ago(30), self.days_ago(20))])
+        stats_cache._store(KEY + 'k2', b'2', [(self.days_ago(10), self.days_ago(5))])
+        stats_cache._store(KEY + 'k3', b'3', [(self.days_ago(40), self.days_ago(35)), (self.days_ago(8), self.days_ago(8))])
+
+        self.assertEqual(invalidate_days([self.days_ago(25)]), 1)
+        self.assertIsNone(self.cache.get(KEY + 'k1'))
+        self.assertEqual(self.cache.get(KEY + 'k2'), b'2')
+
+        # 第二个区间命中也要失效
+        self.assertEqual(invalidate_days([self.days_ago(8)]), 2)
+        self.assertIsNone(self.cache.get(KEY + 'k2'))
+        self.assertIsNone(self.cache.get(KEY + 'k3'))
+        self.assertEqual(invalidate_days([self.days_ago(8)]), 0)
+
+    def test_to_date_ranges_are_invalidated_by_later_days(self):
+        stats_cache._store(KEY + 'closed', b'c', [(self.days_ago(60), self.days_ago(50))])
+        stats_cache._store(KEY + 'ytd', b'y', [(self.days_ago(60), self.days_ago(50)), (self.days_ago(60), OPEN_END)])
+
+        self.assertEqual(invalidate_days([self.today + datetime.timedelta(days=3)]), 1)
+        self.assertIsNone(self.cache.get(KEY + 'ytd'))
+        self.assertEqual(self.cache.get(KEY + 'closed'), b'c')
+
+    def test_ttl_is_open_when_any_range_reaches_today(self):
+        stats_cache._store(KEY + 'closed', b'c', [(self.days_ago(60), self.days_ago(50))])
+        stats_cache._store(KEY + 'month', b'm', [(self.days_ago(60), self.days_ago(50)), (self.today.replace(day=1), OPEN_END)])
+        self.assertGreater(self.cache.ttl(KEY + 'closed'), OPEN_TTL)
+        self.assertLessEqual(self.cache.ttl(KEY + 'closed'), CLOSED_TTL)
+        self.assertLessEqual(self.cache.ttl(KEY + 'month'), OPEN_TTL)
+
+    def test_this_month_window_token_contains_current_month(self):
+        start = day_start_ts(self.days_ago(40))
+        end = day_start_ts(self.days_ago(33))
+        params = {'time_range': f"{start},{end}"}
+
+        plain_token, plain_ranges = time_range_window()(params)
+        token, ranges = time_range_window(with_this_month=True, with_year_to_date=True)(params)
+        self.assertEqual(plain_ranges, [(self.days_ago(40), self.days_ago(34))])
+        self.assertIn(f"{self.today:%Y-%m}", token)
+        self.assertIn(f"{self.today.year}", token.replace(plain_token, ''))
+        self.assertIn((self.today.replace(day=1), OPEN_END), ranges)
+        self.assertIn((self.today.replace(month=1, day=1), OPEN_END), ranges)
+
+
+def brute_force_union(intervals):
+    """逐秒覆盖求并集长度（仅用于小范围随机数据）"""
+    covered = set()
+    for start, end in intervals:
+        covered.update(range(start, end))
+    return len(covered)
+
+
+class IntervalUnionTests(SimpleTestCase):
+    """区间并集与逐秒覆盖的暴力解对比"""
+
+    def random_intervals(self, rng, n, horizon=500):
+        intervals = []
+        for _ in range(n):
+            start = rng.randrange(horizon)
+            intervals.append((start, start + rng.choice([0, 1, rng.randrange(60), rng.randrange(200)])))
+        return intervals
+
+    def test_edge_cases(self):
+        self.assertEqual(union_length([], []), 0)
+        self.assertEqual(union_length_by_group([], [], []), {})
+        # 嵌套、首尾相接、零长度
+        starts, ends = to_arrays([(0, 100), (10, 20), (100, 150), (150, 150), (200, 210)])
+        merged_starts, merged_ends = merge_intervals(starts, ends)
+        self.assertEqual(list(zip(merged_starts.tolist(), merged_ends.tolist())), [(0, 150), (200, 210)])
+        self.assertEqual(union_length(starts, ends), 160)
+        # 缺少结束时间、结束早于开始的区间被丢弃
+        starts, ends = to_arrays([(0, None), (50, 10), (5, 15)])
+        self.assertEqual(union_length(starts, ends), 10)
+
+    def test_union_length_matches_brute_force(self):
+        rng = random.Random(2)
+        for n in (1, 2, 5, 30, 200):
+            intervals = self.random_intervals(rng, n)
+            starts, ends = to_arrays(intervals)
+            self.assertEqual(union_length(starts, ends), brute_force_union(intervals), intervals)
+            merged_starts, merged_ends = merge_intervals(starts, ends)
+            self.assertTrue((merged_starts[1:] > merged_ends[:-1]).all())
+            self.assertEqual(int((merged_ends - merged_starts).sum()), brute_force_union(intervals))
+
+    def test_union_length_by_group_matches_brute_force(self):
+        rng = random.Random(3)
+        # 分组值混合 None、整数和字符串（整数 1 与字符串 '1' 是不同分组）
+        choices = [None, 1, '1', '网络', '服务器', 2]
+        for n in (1, 10, 100, 300):
+            rows = [
+                {'start_time': start, 'end_time': end, 'group': rng.choice(choices)}
+                for start, end in self.random_intervals(rng, n)
+            ]
+            expected = {}
+            for group in {row['group'] for row in rows}:
+                expected[group] = brute_force_union(
+                    [(row['start_time'], row['end_time']) for row in rows if row['group'] == group]
+                )
+            self.assertEqual(union_length_by_group(*to_arrays(rows, group_key='group')), expected)
+
+
+class DailyStatsTests(TestCase):
+    """日汇总 + 两端补齐的结果与直接按时间戳聚合 Event 一致"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1)
+        cls.first_day = datetime.date(2024, 3, 1)
+        cls.days = [cls.first_day + datetime.timedelta(days=i) for i in range(10)]
+        events = []
+        for i in range(400):
+            day = rng.choice(cls.days)
+            events.append(Event(
+                mal_id=f"T{i:05d}",
+                category=rng.choice([1, 2]),
+                level=rng.choice([1, 2, 3]),
+                mal_result=rng.choice([1, 3]),
+                first_level=rng.choice(['网络', '服务器', None]),
+                third_level=rng.choice(['交换机', '硬盘']),
+                start_time=day_start_ts(day) + rng.randrange(86400),
+                duration=rng.randrange(600),
+                is_overtime=rng.choice([0, 1, 2]),
+                child_event=rng.choice(['', '', 'T99999']),
+                related_event=rng.choice([None, None, 'T88888']),
+            ))
+        Event.objects.bulk_create(events)
+        rebuild_daily_stats(cls.days[0], cls.days[-1])
+
+    def direct(self, start_ts, end_ts, q=Q()):
+        first_deal = Q(child_event='') & (Q(related_event__isnull=True) | Q(related_event=''))
+        # 汇总中为空的分类记为 ''
+        rows = Event.objects.filter(q, start_time__gte=start_ts, start_time__lt=end_ts).values(
+            'category', first_level_key=Coalesce('first_level', Value(''))
+        ).annotate(
+            count=Count('id'),
+            first_deal_count=Count('id', filter=first_deal),
+            overtime_count=Count('id', filter=Q(is_overtime=1)),
+            duration_sum=Sum('duration'),
+            duration_max=Max('duration'),
+        )
+        return {(row.pop('category'), row.pop('first_level_key')): row for row in rows}
+
+    def assertMatchesDirect(self, start_ts, end_ts, q=None):
+        merged = merge_daily_stats(query_daily_stats(start_ts, end_ts, q), 'category', 'first_level')
+        expected = self.direct(start_ts, end_ts, q if q is not None else Q())
+        self.assertEqual(set(merged), set(expected))
+        for key, row in expected.items():
+            item = merged[key]
+            for field, value in row.items():
+                self.assertEqual(item[field], value, (key, field))
+            # 最长处理时间对应的故障确实属于该分组
+            longest = Event.objects.get(mal_id=item['max_mal_id'])
+            self.assertEqual((longest.category, longest.first_level or '', longest.duration), key + (item['duration_max'],))
+
+    def test_rebuild_writes_one_row_per_key_and_day(self):
+        keys = {
+            (day_of(start_time), *rest) for start_time, *rest in Event.objects.values_list(
+                'start_time', 'category', 'first_level', 'third_level', 'level', 'mal_result'
+            )
+        }
+        self.assertEqual(EventDailyStat.objects.count(), len(keys))
+        self.assertEqual(sum(EventDailyStat.objects.values_list('count', flat=True)), Event.objects.count())
+
+    def test_full_days(self):
+        self.assertMatchesDirect(day_start_ts(self.days[2]), day_start_ts(self.days[7]))
+
+    def test_partial_days_at_both_ends(self):
+        start = day_start_ts(self.days[1]) + 3600 * 5 + 17
+        end = day_start_ts(self.days[8]) + 3600 * 20
+        self.assertMatchesDirect(start, end)
+        self.assertMatchesDirect(start, end, Q(category=2, level__in=[1, 3]))
+
+    def test_window_inside_one_day(self):
+        start = day_start_ts(self.days[4]) + 3600
+        self.assertMatchesDirect(start, start + 3600 * 6)
+        self.assertEqual(query_daily_stats(start, start), [])
+
+    def test_rebuild_is_repeatable(self):
+        Event.objects.filter(mal_id='T00000').delete()
+        rebuild_daily_stats(self.days[0], self.days[-1])
+        rebuild_daily_stats(self.days[0], self.days[-1])
+        self.assertEqual(sum(EventDailyStat.objects.values_list('count', flat=True)), Event.objects.count())
+        self.assertMatchesDirect(day_start_ts(self.days[0]), day_start_ts(self.days[-1]) + 86400)
+
+    def test_empty_category_matches_null(self):
+        self.assertFalse(EventDailyStat.objects.filter(first_level__isnull=True).exists())
+        start = day_start_ts(self.days[1]) + 3600
+        end = day_start_ts(self.days[8]) + 3600
+        for q in (Q(first_level=''), Q(first_level__in=['', '网络']), ~Q(first_level='')):
+            rows = query_daily_stats(start, end, q)
+            expected = Event.objects.filter(coalesce_q(q), start_time__gte=start, start_time__lt=end).count()
+            self.assertEqual(sum(row['count'] for row in rows), expected, q)
+        self.assertEqual(Event.objects.filter(coalesce_q(Q(first_level='')), start_time__gte=start,
+                                              start_time__lt=end).count(),
+                         Event.objects.filter(first_level__isnull=True, start_time__gte=start,
+                                              start_time__lt=end).count())
+
+    def test_rebuild_updates_rows_in_place(self):
+        before = dict(EventDailyStat.objects.values_list('id', 'count'))
+        rebuild_daily_stats(self.days[0], self.days[-1])
+        # 已有行（含 first_level 为空的）按 id 更新，不删除重建
+        self.assertEqual(dict(EventDailyStat.objects.values_list('id', 'count')), before)
+
+    def test_rebuild_reads_events_after_locking(self):
+        day = self.days[5]
+        lock = rollup.lock_daily_stats
+
+        def commit_meanwhile(*args):
+            # 另一事务在本次刷新等待锁期间提交了新故障
+            existing = lock(*args)
+            Event.objects.create(mal_id="T-LATE", start_time=day_start_ts(day) + 60, duration=1)
+            return existing
+
+        with mock.patch.object(rollup, 'lock_daily_stats', side_effect=commit_meanwhile):
+            rebuild_daily_stats(day, day)
+        self.assertEqual(sum(EventDailyStat.objects.filter(day=day).values_list('count', flat=True)),
+                         Event.objects.filter(start_time__gte=day_start_ts(day),
+                                              start_time__lt=day_start_ts(day) + 86400).count())
+
+    def test_rebuild_tolerates_concurrent_insert(self):
+        day = self.days[3]
+        existing = EventDailyStat.objects.filter(day=day, first_level='网络').first()
+        key = {k: getattr(existing, k) for k in ('day', 'category', 'first_level', 'third_level', 'level', 'mal_result')}
+        existing.delete()
+        bulk_update = EventDailyStat.objects.bulk_update
+
+        def insert_meanwhile(*args, **kwargs):
+            # 另一次刷新在锁定已有行之后提交了同一键的新行
+            result = bulk_update(*args, **kwargs)
+            EventDailyStat.objects.create(count=999, **key)
+            return result
+
+        with mock.patch.object(EventDailyStat.objects, 'bulk_update', side_effect=insert_meanwhile):
+            rebuild_daily_stats(day, day)
+        self.assertEqual(sum(EventDailyStat.objects.filter(day=day).values_list('count', flat=True)),
+                         Event.objects.filter(start_time__gte=day_start_ts(day),
+                                              start_time__lt=day_start_ts(day) + 86400).count())
+
+
+class FaissStoreMixin:
+    """向量库文件放到临时目录；向量按故障 id 固定生成，不依赖 embedding 模型"""
+
+    DIM = 384
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        snapshot_dir = os.path.join(directory.name, "snapshots")
+        os.makedirs(snapshot_dir)
+        for name, value in {
+            "FAISS_INDEX_PATH": os.path.join(directory.name, "faiss_index.bin"),
+            "FAISS_META_PATH": os.path.join(directory.name, "faiss_meta.pkl"),
+            "FAISS_WAL_PATH": os.path.join(directory.name, "faiss_wal.bin"),
+            "FAISS_SNAPSHOT_DIR": snapshot_dir,
+            "CURRENT_PATH": os.path.join(snapshot_dir, "CURRENT"),
+        }.items():
+            patcher = mock.patch.object(faiss_store, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("apps.faults.ai.vectors.get_or_embed_many", side_effect=self.embed_many)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @classmethod
+    def vector(cls, pk):
+        return np.random.default_rng(pk).standard_normal(cls.DIM).astype("float32")
+
+    @classmethod
+    def embed_many(cls, events):
+        return np.vstack([cls.vector(e.pk) for e in events])
+
+    @staticmethod
+    def event(pk, root_cause=None):
+        return SimpleNamespace(pk=pk, mal_id=f"M{pk}", ai_root_cause=root_cause or f"根因{pk}", ai_suggestion=f"建议{pk}")
+
+    def snapshot(self, store):
+        """可比较的向量库状态：收录的故障 + 每个故障按自身向量检索的首个结果"""
+        ids = sorted(store._ids.values())
+        hits = store.search(np.vstack([self.vector(pk) for pk in ids]), top_k=1, min_score=0.99) if ids else []
+        return dict(store._ids), [store.lookup(pk) for pk in ids], [[h["id"] for h in row] for row in hits]
+
+
+class FaissWalTests(FaissStoreMixin, SimpleTestCase):
+    """快照 + WAL：写入后、压缩前崩溃，重启后重放 WAL 得到相同结果"""
+
+    def setUp(self):
+        super().setUp()
+        self.store = faiss_store.FaissStore()
+        self.store.add_events([self.event(pk) for pk in range(1, 21)])
+        self.store.compact()
+        self.store.add_events([self.event(pk) for pk in range(21, 31)])
+        self.store.add_events([self.event(5, "新根因"), self.event(25, "新根因")], replace=True)
+        self.store.remove([7, 22])
+
+    def test_replay_after_crash_between_append_and_snapshot(self):
+        restarted = faiss_store.FaissStore()
+        self.assertEqual(restarted._seq, self.store._seq)
+        self.assertEqual(self.snapshot(restarted), self.snapshot(self.store))
+        self.assertEqual(restarted.lookup(5)[1], "新根因")
+        self.assertIsNone(restarted.lookup(7))
+        self.assertFalse(restarted.contains("M22"))
+
+    def test_torn_record_at_wal_tail_is_ignored(self):
+        expected = self.snapshot(self.store)
+        with open(faiss_store.FAISS_WAL_PATH, "ab") as f:
+            f.write(faiss_store.WAL_HEADER.pack(self.store._seq + 1, 40, self.DIM) + b'{"op": "add", "id"')
+        restarted = faiss_store.FaissStore()
+        self.assertEqual(self.snapshot(restarted), expected)
+        # 下一次写入先截掉不完整的记录
+        restarted.add_events([self.event(40)])
+        self.assertEqual(faiss_store.FaissStore().lookup(40), ("M40", "根因40", "建议40"))
+
+    def test_crash_after_snapshot_before_wal_truncate(self):
+        expected = self.snapshot(self.store)
+        with mock.patch.object(faiss_store, "_truncate_wal"):
+            self.store.compact()
+        self.assertGreater(os.path.getsize(faiss_store.FAISS_WAL_PATH), 0)
+        restarted = faiss_store.FaissStore()
+        self.assertEqual(restarted._snapshot_seq, self.store._seq)
+        self.assertEqual(self.snapshot(restarted), expected)
+
+    def test_other_process_writes_are_picked_up_by_refresh(self):
+        other = faiss_store.FaissStore()
+        other.add_events([self.event(50)])
+        self.assertFalse(self.store.contains("M50"))
+        self.store.refresh()
+        self.assertTrue(self.store.contains("M50"))
+
+
+def linear_match(rules, data):
+    """规则编译前的逐条线性扫描（对照实现）"""
+    for rule in rules:
+        matched = True
+        for key, expected in rule["condition"].items():
+            if "__" in key:
+                field, op = key.split("__", 1)
+                value = data.get(field)
+                if value is None:
+                    matched = False
+                elif op == "gt" and not (isinstance(value, (int, float)) and value > expected):
+                    matched = False
+                elif op == "lt" and not (isinstance(value, (int, float)) and value < expected):
+                    matched = False
+                elif op == "contains" and not (isinstance(value, str) and expected in value):
+                    matched = False
+                elif op == "in" and value not in expected:
+                    matched = False
+            elif data.get(key) != expected:
+                matched = False
+            if not matched:
+                break
+        if matched:
+            return rule
+    return None
+
+
+class CompiledRuleSetTests(TestCase):
+    """编译分桶后的规则集与逐条线性扫描命中同一条规则"""
+
+    FIRST_LEVELS = ["网络", "服务器", "存储", ""]
+    THIRD_LEVELS = ["通信中断", "硬盘故障", "电源故障", ""]
+    MODELS = ["X200", "X300", None]
+    TEXTS = ["电源告警", "E101 报错", "风扇异常", "", "电源 E101"]
+
+    def random_rules(self, rng, n):
+        clauses = [
+            lambda: ("first_level", rng.choice(self.FIRST_LEVELS)),
+            lambda: ("third_level", rng.choice(self.THIRD_LEVELS)),
+            lambda: ("category", rng.choice([1, 2, 3])),
+            lambda: ("device_model", rng.choice(self.MODELS)),
+            lambda: ("description__contains", rng.choice(["电源", "风扇", "E1"])),
+            lambda: ("mal_reason__contains", rng.choice(["E101", "电源"])),
+            lambda: ("level__gt", rng.choice([1, 2, 3])),
+            lambda: ("level__lt", rng.choice([2, 3, 4])),
+            lambda: ("first_level__in", rng.sample(self.FIRST_LEVELS, 2)),
+            lambda: ("category__in", [rng.choice([1, 2, 3])]),
+            # 不可哈希的等值条件不参与分桶
+            lambda: ("third_level", [rng.choice(self.THIRD_LEVELS)]),
+            lambda: ("slot__unknown", 1),
+        ]
+        rules = []
+        for i in range(n):
+            condition = dict(rng.choice(clauses)() for _ in range(rng.randrange(4)))
+            rules.append({"id": f"r{i}", "condition": condition})
+        return rules
+
+    def random_context(self, rng):
+        data = {
+            "first_level": rng.choice(self.FIRST_LEVELS),
+            "third_level": rng.choice(self.THIRD_LEVELS),
+            "category": rng.choice([1, 2, 3]),
+            "level": rng.choice([1, 2, 3, 4, 5]),
+            "description": rng.choice(self.TEXTS),
+            "mal_reason": rng.choice(self.TEXTS),
+        }
+        if rng.random() < 0.7:
+            data.update(device_model=rng.choice(self.MODELS), slot=rng.choice(["1", None]))
+        return data
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(4)
+        for n in (1, 5, 30, 120):
+            rules = self.random_rules(rng, n)
+            rule_set = CompiledRuleSet(rules)
+            for _ in range(300):
+                data = self.random_context(rng)
+                self.assertIs(rule_set.match(data), linear_match(rules, data), (rules, data))
+
+    def test_shipped_rules_match_linear_scan(self):
+        rng = random.Random(5)
+        rules = load_rules()
+        rule_set = CompiledRuleSet(rules)
+        hits = 0
+        for _ in range(500):
+            data = self.random_context(rng)
+            expected = linear_match(rules, data)
+            self.assertIs(rule_set.match(data), expected, data)
+            hits += expected is not None
+        self.assertGreater(hits, 0)
+
+    def test_batch_matches_single_event(self):
+        events = Event.objects.bulk_create([
+            Event(mal_id=f"R{i}", start_time=i, first_level=first, third_level=third, description=text, mal_reason=text)
+            for i, (first, third, text) in enumerate([
+                ("网络", "通信中断", ""), ("服务器", "电源故障", "电源告警"), ("存储", "", "E101 报错"), ("", "", ""),
+            ])
+        ])
+        device = dict(equipment_ip="10.0.0.1", equipment_sn="SN", machine_info="", rack_location="", brand="",
+                      device_location="", device_name="", component_name="", component_brand="",
+                      component_specification="", slot="")
+        EventDeviceInfo.objects.bulk_create([
+            EventDeviceInfo(event=events[1], device_model="X200", **device),
+            EventDeviceInfo(event=events[1], device_model="X300", **device),
+            EventDeviceInfo(event=events[3], device_model="X200", **device),
+        ])
+        expected = [apply_rules_to_event(event) for event in Event.objects.filter(mal_id__startswith="R").order_by("pk")]
+        with self.assertNumQueries(2):
+            results = apply_rules_to_events(Event.objects.filter(mal_id__startswith="R").order_by("pk"))
+        self.assertEqual(results, expected)
+        self.assertEqual([r and r["rule_id"] for r in results],
+                         ["rule_temp_comm_fail", "rule_power_x200", "rule_alarm_e101", None])
+
+
+class DashboardConsistencyTests(TestCase):
+    """看板各组件与对应的单个统计接口结果一致（默认类别、时间边界、上一周期口径）"""
+
+    # 组件 → (单个接口, 接口支持的公共参数)
+    VIEWS = {
+        'statistics': (views.fault_statistics_data, ('category', 'first_level')),
+        'device': (views.fault_statistics_device_data, ('category', 'first_level')),
+        'maintenance': (views.fault_statistics_maintenance_data, ('first_level',)),
+        'level': (views.fault_statistics_level_data, ('category', 'first_level')),
+        'impact_project': (views.fault_statistics_impact_project_data, ('category', 'first_level')),
+        'device_unit': (views.fault_statistics_device_unit_data, ('category', 'first_level')),
+        'maintenance_statistics': (views.maintenance_statistics_data, ('category',)),
+        'maintenance_score_table': (views.maintenance_statistics_score_table_data, ('category',)),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(6)
+        today = datetime.date.today()
+        cls.end_ts = day_start_ts(today - datetime.timedelta(days=1))
+        cls.start_ts = cls.end_ts - 7 * 86400
+        # 覆盖上一周期、当前窗口，以及恰好位于两端边界的故障
+        times = [cls.start_ts - 7 * 86400 + rng.randrange(14 * 86400) for _ in range(120)]
+        times += [cls.start_ts, cls.end_ts, cls.end_ts, cls.start_ts - 7 * 86400]
+        events = []
+        for i, start_time in enumerate(times):
+            events.append(Event(
+                mal_id=f"D{i:04d}",
+                category=rng.choice([1, 1, 2]),
+                level=rng.choice([1, 2, 3, 5]),
+                mal_result=rng.choice([1, 3, 3, 4]),
+                first_level=rng.choice(['网络', '服务器']),
+                third_level=rng.choice(['交换机', '硬盘']),
+                start_time=start_time,
+                end_time=start_time + rng.randrange(7200),
+                duration=rng.randrange(120),
+                impact_pro=rng.choice([None, ['项目A'], ['项目A', '项目B']]),
+                solution_type=rng.choice([1, 2, 2]),
+                maintenance=rng.choice([None, '厂商甲', '厂商乙']),
+                score=rng.choice([None, 50, 85, 95]),
+                maintenance_duration=rng.randrange(600),
+                maintenance_status=rng.choice([0, 1, 2]),
+                # 存量数据的备注多为 JSON 字符串
+                maintenance_remarks=rng.choice([None, {'score_further_deal': False}, {'score_further_deal': True},
+                                                json.dumps({'score_further_deal': False}),
+                                                json.dumps({'score_further_deal': True}), "not json"]),
+            ))
+        events = Event.objects.bulk_create(events)
+        device = dict(equipment_sn="SN", machine_info="", rack_location="", device_location="", device_name="",
+                      component_brand="", component_specification="", slot="")
+        EventDeviceInfo.objects.bulk_create([
+            EventDeviceInfo(event=event, equipment_ip=f"10.0.0.{i % 250}", brand=rng.choice(['华为', '']),
+                            device_model=rng.choice(['X200', 'X300']), component_name=rng.choice(['硬盘', '电源']),
+                            **device)
+            for i, event in enumerate(events) if i % 3
+        ])
+        rebuild_daily_stats(day_of(min(times)), day_of(max(times)))
+
+    @classmethod
+    def canonical(cls, value):
+        """饼图、表格行的顺序随查询方式不同，按内容排序后比较"""
+        if isinstance(value, dict):
+            return {k: cls.canonical(v) for k, v in value.items()}
+        if isinstance(value, list):
+            items = [cls.canonical(v) for v in value]
+            if all(isinstance(v, dict) for v in items):
+                items.sort(key=lambda v: json.dumps(v, sort_keys=True, ensure_ascii=False))
+            return items
+        return value
+
+    def view_result(self, view, params):
+        request = RequestFactory().get('/', params)
+        with cache_bypassed():
+            return json.loads(view(request).content)
+
+    def assertWidgetsMatchViews(self, **params):
+        params.update(time_range=f"{self.start_ts},{self.end_ts}", query_type='week')
+        dashboard = FaultDashboard(params).build()
+        for name, (view, supported) in self.VIEWS.items():
+            if any(key in params for key in ('category', 'first_level') if key not in supported):
+                continue
+            expected = self.canonical(self.view_result(view, params))
+            actual = self.canonical(json.loads(json.dumps(dashboard[name], cls=DjangoJSONEncoder)))
+            self.assertEqual(actual, expected, (name, params))
+
+    def test_without_category(self):
+        self.assertWidgetsMatchViews()
+
+    def test_score_table_parses_string_remarks(self):
+        params = {'time_range': f"{self.start_ts},{self.end_ts}"}
+        rows = self.view_result(views.maintenance_statistics_score_table_data, params)
+        events = views._maintenance_queryset(RequestFactory().get('/', params), (self.start_ts, self.end_ts))
+        expected = {}
+        for maintenance, remarks in events.values_list('maintenance', 'maintenance_remarks'):
+            if remarks in ({'score_further_deal': False}, json.dumps({'score_further_deal': False})):
+                expected[maintenance] = expected.get(maintenance, 0) + 1
+        self.assertTrue(any(isinstance(r, str) for r in events.values_list('maintenance_remarks', flat=True)))
+        self.assertEqual({row['maintenance']: row['无需处理'] for row in rows if row['无需处理']}, expected)
+
+    def test_with_category(self):
+        self.assertWidgetsMatchViews(category='2')
+
+    def test_with_first_level(self):
+        self.assertWidgetsMatchViews(first_level='网络')
+
+    def test_previous_period_uses_dashboard_filters(self):
+        params = {'time_range': f"{self.start_ts},{self.end_ts}", 'query_type': 'week', 'first_level': '网络'}
+        dashboard = FaultDashboard(params)
+        last_q = dashboard.event_q(inclusive=True, time_range=dashboard.last_time_range())
+        last = Event.objects.filter(last_q, solution_type=2, maintenance__isnull=False)
+        self.assertEqual(dashboard.widget_maintenance_statistics()['last_count'], last.count())
+        self.assertTrue(all(e.first_level == '网络' for e in last))
+
+
+class FaissHnswStaleTests(FaissStoreMixin, SimpleTestCase):
+    """HNSW 不支持删除：更新后的故障不会重复出现在检索结果中，残留过多时压缩重建"""
+
+    def setUp(self):
+        super().setUp()
+        self.store = faiss_store.FaissStore()
+        pks = list(range(1, 41))
+        self.store.rebuild(
+            [{"id": pk, "mal_id": f"M{pk}", "root_cause": f"根因{pk}", "suggestion": f"建议{pk}"} for pk in pks],
+            np.vstack([self.vector(pk) for pk in pks]), index_type="hnsw",
+        )
+
+    def search_ids(self, store, pk, top_k=5):
+        return [hit["id"] for hit in store.search(self.vector(pk).reshape(1, -1), top_k=top_k, min_score=-1)[0]]
+
+    def test_updated_vector_is_returned_once(self):
+        for _ in range(3):
+            self.store.add_events([self.event(7, "新根因")], replace=True)
+        self.store.remove([9])
+        self.assertEqual(self.store._stale, 4)
+        ids = self.search_ids(self.store, 7)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids[0], 7)
+        self.assertNotIn(9, self.search_ids(self.store, 9, top_k=40))
+        self.assertEqual(len(self.search_ids(self.store, 1, top_k=40)), 39)
+
+    def test_compact_purges_stale_vectors(self):
+        with mock.patch.object(faiss_store, "STALE_COMPACT_EVERY", 3):
+            self.store.add_events([self.event(7, "新根因")], replace=True)
+            self.store.remove([9])
+            self.assertEqual(self.store._stale, 2)
+            self.store.add_events([self.event(8, "新根因")], replace=True)
+        self.assertEqual(self.store._stale, 0)
+        self.assertEqual(self.store.index.ntotal, 39)
+        self.assertIsInstance(faiss_store.faiss.downcast_index(self.store.index.index), faiss_store.faiss.IndexHNSW)
+        restarted = faiss_store.FaissStore()
+        self.assertEqual(restarted.index.ntotal, 39)
+        self.assertEqual(restarted._stale, 0)
+        self.assertEqual(self.search_ids(restarted, 7)[0], 7)
+        self.assertEqual(restarted.lookup(7)[1], "新根因")
+
+
+class HybridBatchTests(FaissStoreMixin, TestCase):
+    """批量混合推荐与逐条 rank_root_causes 结果一致，analyze_batch 按推荐写回"""
+
+    GROUPS = [
+        ('网络', '交换机', '端口 down 链路中断', '光模块老化'),
+        ('服务器', '硬盘', '硬盘 SMART 告警 坏道', '硬盘介质损坏'),
+        ('服务器', '电源', '电源 模块 告警 E101', '电源模块故障'),
+    ]
+
+    @classmethod
+    def vector(cls, pk):
+        # 同组故障向量相近：组中心 + 少量噪声
+        center = np.random.default_rng(1000 + pk % len(cls.GROUPS)).standard_normal(cls.DIM)
+        return (center + 0.2 * np.random.default_rng(pk).standard_normal(cls.DIM)).astype("float32")
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].delete(keyword_index.STATS_CACHE_KEY)
+        self.addCleanup(caches['default'].delete, keyword_index.STATS_CACHE_KEY)
+        events = []
+        for i in range(1, 31):
+            first, third, text, cause = self.GROUPS[i % len(self.GROUPS)]
+            labelled = i <= 20
+            events.append(Event(
+                id=i, mal_id=f"H{i:03d}", start_time=i, first_level=first, third_level=third,
+                description=f"{text} 第{i}次", mal_reason=text, mal_result=3 if labelled else 1,
+                ai_root_cause=cause if labelled else None, ai_suggestion=f"处理{cause}" if labelled else None,
+            ))
+        Event.objects.bulk_create(events)
+        save_embeddings((event.pk, self.vector(event.pk)) for event in events)
+        keyword_index.index_events(Event.objects.values('id', *keyword_index.KEYWORD_SOURCE_FIELDS))
+
+        self.store = faiss_store.FaissStore()
+        self.store.add_events(events[:20])
+        patcher = mock.patch.object(faiss_store, "get_faiss_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_matches_single(self):
+        events = list(Event.objects.with_embedding().order_by('id'))
+        batch = rank_root_causes_batch(events, top_k=3)
+        single = [rank_root_causes(event, top_k=3)['suggestions'] for event in events]
+        self.assertEqual(batch, single)
+        # 三路都有召回
+        channels = {channel for suggestions in batch for s in suggestions for channel in s['scores']}
+        self.assertEqual(channels, {'rule', 'vector', 'keyword'})
+
+    def test_analyze_batch_writes_top_suggestion(self):
+        events = list(Event.objects.with_embedding().filter(id__gt=20).order_by('id'))
+        results = analyze_batch(events)
+        for event, result, suggestions in zip(events, results, rank_root_causes_batch(events, top_k=1)):
+            self.assertEqual(result['root_cause'], suggestions[0]['root_cause'])
+            event.refresh_from_db()
+            self.assertEqual(event.ai_root_cause, result['root_cause'])
+            self.assertEqual(event.ai_confidence, result['confidence'])
+
+
+class DirtyEventsTests(TestCase):
+    """保存信号：旧值取自加载时的值，一个事务的登记合并为一次处理，新建故障按批分析"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Event.objects.bulk_create([
+            Event(mal_id=f"D{i}", start_time=1700000000 + i * 86400, description=f"故障{i}") for i in range(3)
+        ])
+
+    def setUp(self):
+        # 其他用例的事务被 TestCase 回滚，登记的批次未处理，不能并入本用例
+        setattr(transaction.get_connection(), dirty_events._ATTR, None)
+        for target in ('apps.faults.tasks.process_dirty_events.delay', 'apps.faults.dirty_events.invalidate_timestamps'):
+            patcher = mock.patch(target)
+            setattr(self, target.rsplit('.', 1)[-1], patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_loaded_instance_saves_without_select(self):
+        event = Event.objects.get(mal_id="D0")
+        event.description = "已修改"
+        with self.assertNumQueries(1):
+            event.save()
+        self.assertEqual(event._dirty_old_values['description'], "故障0")
+        # 再次保存与上次保存的值比较
+        event.description = "再次修改"
+        with self.assertNumQueries(1):
+            event.save()
+        self.assertEqual(event._dirty_old_values['description'], "已修改")
+        with self.assertNumQueries(1):
+            EventDeviceInfo.objects.create(event_id=event.pk, equipment_ip="10.0.0.1")
+
+    def test_unloaded_instance_reads_old_values(self):
+        pk = Event.objects.get(mal_id="D1").pk
+        event = Event.objects.only('id', 'description').get(pk=pk)
+        event.description = "已修改"
+        # 加载时没有 start_time：一次查询补齐 + UPDATE
+        with self.assertNumQueries(2):
+            event.save(update_fields=['description'])
+        self.assertEqual(event._dirty_old_values, {'description': "故障1", 'start_time': 1700086400})
+
+    def test_transaction_flushes_once(self):
+        events = list(Event.objects.order_by('mal_id'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                events[0].description = "已修改"
+                events[0].save()
+                try:
+                    with transaction.atomic():
+                        events[1].mal_reason = "已回滚"
+                        events[1].save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                Event.objects.create(mal_id="D9", start_time=1700000000)
+                EventDeviceInfo.objects.create(event=events[2], equipment_ip="10.0.0.1")
+                EventDeviceInfo.objects.create(event_id=events[0].pk, equipment_ip="10.0.0.2")
+        self.delay.assert_called_once()
+        self.assertEqual(self.delay.call_args.kwargs['analyze'], ["D9"])
+        self.assertIn(events[0].pk, self.delay.call_args.kwargs['keywords'])
+        self.invalidate_timestamps.assert_called_once()
+        self.assertTrue({events[0].start_time, events[2].start_time} <= self.invalidate_timestamps.call_args.args[0])
+
+        # 处理后的下一个事务新建批次
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(mal_id="D10", start_time=1700000000)
+        self.assertEqual(self.delay.call_args.kwargs['analyze'], ["D10"])
+
+    def test_process_dirty_events_analyzes_in_one_batch(self):
+        mal_ids = ["D0", "D1", "D2"]
+        result = {"source": "fallback", "root_cause": "未知原因", "suggestion": "人工排查", "confidence": 0.5}
+        store = mock.Mock()
+        with mock.patch('apps.faults.ai.reanalysis.analyze_batch', return_value=[result] * 3) as analyze, \
+                mock.patch('apps.faults.ai.faiss_store.get_faiss_store', return_value=store), \
+                mock.patch('apps.faults.tasks.send_fault_analysis_digest') as digest:
+            process_dirty_events(analyze=mal_ids)
+        analyze.assert_called_once()
+        self.assertEqual(sorted(event.mal_id for event in analyze.call_args.args[0]), mal_ids)
+        digest.assert_called_once()
+        # 分析结果由 bulk_update 写回（不触发信号），FAISS 同步按分析过的故障执行
+        store.remove.assert_called_once()
+        self.assertEqual(set(store.remove.call_args.args[0]), set(Event.objects.values_list('pk', flat=True)))
+
+
+class SeedEventsTests(TestCase):
+    """同一 seed、同一参考时间生成相同的故障；追加生成的数据不重复已有数据"""
+
+    NOW = datetime.datetime(2024, 3, 1, 12, tzinfo=datetime.timezone.utc)
+    OPTIONS = {'batch_size': 7, 'chunk_size': 10, 'workers': 1, 'seed': 7, 'method': 'orm'}
+
+    def generate(self, start=0):
+        seed_events(25, self.OPTIONS, ['一级'], ['二级'], start=start, now=self.NOW, log=lambda *args: None)
+        rows = list(Event.objects.order_by('mal_id').values_list('mal_id', 'start_time', 'description', 'level'))
+        Event.objects.all().delete()
+        return rows
+
+    def test_same_seed_same_data(self):
+        rows = self.generate()
+        self.assertEqual(self.generate(), rows)
+        self.assertEqual(rows[0][0], "MAL-20240301-0001")
+        self.assertTrue(all(row[1] < self.NOW.timestamp() for row in rows))
+
+    def test_appended_chunks_differ(self):
+        first = [row[1:] for row in self.generate()]
+        appended = [row[1:] for row in self.generate(start=25)]
+        self.assertNotEqual(first[:10], appended[:10])
+
+
+class TimeBucketTests(SimpleTestCase):
+    """自然日按 settings.TIME_ZONE 划分，与进程 TZ 环境变量无关"""
+
+    def test_days_follow_settings_time_zone(self):
+        import time
+        original = os.environ.get('TZ')
+
+        def restore():
+            if original is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = original
+            time.tzset()
+
+        self.addCleanup(restore)
+        with self.settings(TIME_ZONE='Asia/Shanghai'):
+            for process_tz in ('UTC', 'America/New_York', 'Asia/Shanghai'):
+                os.environ['TZ'] = process_tz
+                time.tzset()
+                # 北京时间 2024-03-01 00:00 = UTC 2024-02-29 16:00
+                self.assertEqual(day_start_ts(datetime.date(2024, 3, 1)), 1709222400, process_tz)
+                self.assertEqual(day_of(1709222400), datetime.date(2024, 3, 1))
+                self.assertEqual(day_of(1709222399), datetime.date(2024, 2, 29))
+        with self.settings(TIME_ZONE='America/New_York'):
+            # 夏令时开始当天只有 23 小时
+            self.assertEqual(day_start_ts(datetime.date(2024, 3, 11)) - day_start_ts(datetime.date(2024, 3, 10)), 23 * 3600)
+            self.assertEqual(time_bucket.today(), datetime.datetime.now(time_bucket.timezone.get_default_timezone()).date())
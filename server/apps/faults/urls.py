@@ -19,6 +19,8 @@ urlpatterns = [
     path('fault_statistics_category_trend_data/', views.fault_statistics_category_trend_data),     # 故障分类趋势统计
     path('fault_statistics_device_unit_data/', views.fault_statistics_device_unit_data),           # 故障设备单元统计
     path('fault_statistics_annual_data/', views.fault_statistics_annual_data),                     # 故障年度统计
+    path('dashboard/', views.fault_dashboard),                                                     # 故障统计看板（聚合接口）
+    path('fault_statistics_cache_data/', views.fault_statistics_cache_data),                       # 统计接口缓存命中情况
     path('maintenance_statistics_data/', views.maintenance_statistics_data),                       # 维护商统计
     path('maintenance_statistics_score_data/', views.maintenance_statistics_score_data),           # 维护商评分统计
     path('maintenance_statistics_score_table_data/', views.maintenance_statistics_score_table_data),  # 维护商评分表格统计
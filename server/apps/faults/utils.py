@@ -1,5 +1,6 @@
 import datetime
 from apps.faults.models import Event
+from apps.faults.intervals import to_arrays, union_length
 
 
 def build_fault_context(event: Event) -> dict:
@@ -20,8 +21,11 @@ def build_fault_context(event: Event) -> dict:
         "category": event.category,
     }
 
-    # 尝试获取第一个设备信息（多设备可取主设备或拼接）
-    device_info = event.device_info.first()
+    # 尝试获取第一个设备信息（多设备可取主设备或拼接）；已预取时不再查询
+    if 'device_info' in getattr(event, '_prefetched_objects_cache', {}):
+        device_info = min(event.device_info.all(), key=lambda d: d.pk, default=None)
+    else:
+        device_info = event.device_info.first()
     if device_info:
         data.update({
             "equipment_ip": device_info.equipment_ip,
@@ -38,15 +42,11 @@ def build_fault_context(event: Event) -> dict:
 
 
 def get_error_time(error_time_list):
-    for i in error_time_list:
-        for j in error_time_list:
-            if i['start_time'] < j['start_time'] < i['end_time']:
-                i['end_time'] = j['end_time']
-                j['start_time'], j['end_time'] = 0, 0
-    all_start_time = sum([i['start_time'] for i in error_time_list])
-    all_end_time = sum([i['end_time'] for i in error_time_list])
-    all_error_time = all_end_time - all_start_time
-    return all_error_time
+    """
+    总故障时长（秒）：已结束故障区间的并集长度，重叠部分只计一次
+    :param error_time_list: [{'start_time':..., 'end_time':...}, ...]
+    """
+    return union_length(*to_arrays(error_time_list))
 
 
 def get_last_time(query_type, time_range):
@@ -5,15 +5,93 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from apps.idc.models import DataCenter, Rack, Device, IPAddress, WorkOrder
+from utils.seeding import add_seed_arguments, seed_in_chunks
 
 User = get_user_model()
 
+VENDORS = ["华为", "戴尔", "HPE", "联想", "Cisco"]
+MODELS = ["RH2288", "PowerEdge R750", "ProLiant DL380", "ThinkSystem SR650", "Nexus 9300"]
+
+
+def device_ip(pk):
+    """按设备主键分配管理 IP（172.16.0.0/12 内不重复，支持约 100 万台）"""
+    return f"172.{16 + (pk >> 16) % 16}.{(pk >> 8) & 255}.{pk & 255}"
+
+
+def build_device_chunk(chunk):
+    """
+    seed_in_chunks 的生成函数：设备，一半设备分配管理 IP，前 work_orders 台设备各一张工单
+    chunk.params 含 rack_ids、user_ids、admin_id、work_orders
+    """
+    rng, params, writer = chunk.rng, chunk.params, chunk.writer
+    device_types = [t[0] for t in Device.DEVICE_TYPES]
+    statuses = [s[0] for s in Device.STATUS_CHOICES]
+    order_types = [t[0] for t in WorkOrder.ORDER_TYPES]
+    statuses_wo = [s[0] for s in WorkOrder.STATUS_CHOICES]
+    today, now = date.today(), timezone.now()
+
+    for index in range(chunk.start, chunk.start + chunk.count):
+        pk = chunk.pk(Device, index)
+        device_type = rng.choice(device_types)
+        ip = device_ip(pk)
+        device = writer.add(Device(
+            id=pk,
+            asset_tag=f"ASSET-{pk:06d}",
+            name=f"{device_type.upper()}-{pk}",
+            device_type=device_type,
+            model=rng.choice(MODELS),
+            vendor=rng.choice(VENDORS),
+            serial_number=f"SN{rng.randint(100000, 999999)}-{pk}",
+            rack_id=rng.choice(params['rack_ids']) if params['rack_ids'] else None,
+            position_u=rng.randint(1, 38),
+            height_u=1 if device_type == 'switch' else 2,
+            ip_address=ip,
+            status=rng.choice(statuses),
+            owner_id=rng.choice(params['user_ids']),
+            purchase_date=today - timedelta(days=rng.randint(30, 1800)),
+            warranty_expire=today + timedelta(days=rng.randint(30, 730))
+        ))
+
+        if index % 2 == 0:  # 一半设备分配IP
+            writer.add(IPAddress(
+                ip=ip,
+                vlan=str(rng.randint(10, 100)),
+                gateway=".".join(ip.split(".")[:3]) + ".1",
+                is_used=True,
+                device_id=pk,
+                description=f"管理IP for {device.name}"
+            ))
+
+        if index < params['work_orders']:
+            status = rng.choice(statuses_wo)
+            created_at = now - timedelta(hours=rng.randint(1, 100))
+            writer.add(WorkOrder(
+                title=f"{rng.choice(['紧急', '常规'])}{rng.choice(order_types)}任务",
+                order_type=rng.choice(order_types),
+                device_id=pk,
+                requester_id=params['admin_id'],
+                assignee_id=rng.choice(params['user_ids']),
+                status=status,
+                description=f"自动创建的测试工单 for {device.name}",
+                created_at=created_at,
+                completed_at=created_at + timedelta(hours=rng.randint(2, 48)) if status == 'completed' else None
+            ))
+
 
 class Command(BaseCommand):
-    help = "生成 IDC 测试数据"
+    help = "生成 IDC 测试数据（设备、IP、工单批量写入）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=45, help='生成的设备数量（默认: 45）')
+        parser.add_argument('--work-orders', type=int, default=10, help='生成工单的设备数量（默认: 10）')
+        add_seed_arguments(parser)
 
     def handle(self, *args, **options):
         self.stdout.write("开始生成测试数据...")
+        if options['seed'] is None:
+            options['seed'] = random.SystemRandom().randrange(2 ** 31)
+            self.stdout.write(f"随机种子: {options['seed']}（--seed {options['seed']} 可复现本次数据）")
+        rng = random.Random(options['seed'])
 
         # 1. 创建用户（如果不存在）
         admin_user, _ = User.objects.get_or_create(
@@ -49,7 +127,7 @@ class Command(BaseCommand):
                     "address": f"北京市朝阳区XX路{i}号",
                     "contact": f"联系人{i}",
                     "phone": f"1380013800{i}",
-                    "level": random.choice(levels),
+                    "level": rng.choice(levels),
                     "is_active": True
                 }
             )
@@ -66,7 +144,7 @@ class Command(BaseCommand):
                     name=f"RACK-{j:02d}",
                     defaults={
                         "height": 42,
-                        "power_load": round(random.uniform(3.0, 10.0), 1),
+                        "power_load": round(rng.uniform(3.0, 10.0), 1),
                         "location": f"第{j}排第{chr(64 + j)}列"
                     }
                 )
@@ -74,89 +152,24 @@ class Command(BaseCommand):
                     self.stdout.write(f"✅ 创建机柜: {rack}")
                 racks.append(rack)
 
-        # 4. 创建设备
-        device_types = [t[0] for t in Device.DEVICE_TYPES]
-        statuses = [s[0] for s in Device.STATUS_CHOICES]
-        devices = []
-        vendors = ["华为", "戴尔", "HPE", "联想", "Cisco"]
-        models_list = ["RH2288", "PowerEdge R750", "ProLiant DL380", "ThinkSystem SR650", "Nexus 9300"]
-
-        for idx, rack in enumerate(racks[:20]):  # 最多20个机柜放设备
-            for k in range(1, random.randint(2, 5)):  # 每机柜2-4台设备
-                device_type = random.choice(device_types)
-                device = Device.objects.create(
-                    asset_tag=f"ASSET-{idx*10 + k:04d}",
-                    name=f"{device_type.upper()}-{idx*10 + k}",
-                    device_type=device_type,
-                    model=random.choice(models_list),
-                    vendor=random.choice(vendors),
-                    serial_number=f"SN{random.randint(100000, 999999)}",
-                    rack=rack,
-                    position_u=random.randint(1, 38),
-                    height_u=1 if device_type == 'switch' else 2,
-                    ip_address=f"192.168.{random.randint(10, 30)}.{random.randint(10, 200)}",
-                    status=random.choice(statuses),
-                    owner=random.choice(users),
-                    purchase_date=date.today() - timedelta(days=random.randint(30, 1800)),
-                    warranty_expire=date.today() + timedelta(days=random.randint(30, 730))
-                )
-                devices.append(device)
-                self.stdout.write(f"✅ 创建设备: {device.name}")
-
-        # 5. 创建 IP 地址（绑定部分设备）
-        used_ips = set()
-        for device in devices[:len(devices)//2]:  # 一半设备分配IP
-            base_ip = device.ip_address or f"10.0.{random.randint(1, 20)}"
-            if not base_ip:
-                continue
-            try:
-                ip_obj = IPAddress.objects.create(
-                    ip=base_ip,
-                    vlan=str(random.randint(10, 100)),
-                    gateway=".".join(base_ip.split(".")[:3]) + ".1",
-                    is_used=True,
-                    device=device,
-                    description=f"管理IP for {device.name}"
-                )
-                used_ips.add(base_ip)
-                self.stdout.write(f"✅ 分配IP: {ip_obj.ip} → {device.name}")
-            except Exception as e:
-                self.stdout.write(self.style.WARNING(f"⚠️ IP冲突或无效: {base_ip} ({e})"))
-
-        # 补充一些未绑定的IP
-        for i in range(10):
-            ip_str = f"10.10.{random.randint(1, 50)}.{random.randint(1, 254)}"
-            if ip_str in used_ips:
-                continue
-            try:
-                IPAddress.objects.create(
-                    ip=ip_str,
-                    vlan="100",
-                    is_used=False,
-                    description="预留IP"
-                )
-                self.stdout.write(f"✅ 创建空闲IP: {ip_str}")
-            except:
-                pass  # 忽略重复
-
-        # 6. 创建工单
-        order_types = [t[0] for t in WorkOrder.ORDER_TYPES]
-        statuses_wo = [s[0] for s in WorkOrder.STATUS_CHOICES]
-        for device in devices[:10]:  # 前10台设备创建工单
-            wo = WorkOrder.objects.create(
-                title=f"{random.choice(['紧急', '常规'])}{random.choice(order_types)}任务",
-                order_type=random.choice(order_types),
-                device=device,
-                requester=admin_user,
-                assignee=random.choice(users),
-                status=random.choice(statuses_wo),
-                description=f"自动创建的测试工单 for {device.name}",
-                created_at=timezone.now() - timedelta(hours=random.randint(1, 100))
-            )
-            if wo.status == 'completed':
-                wo.completed_at = wo.created_at + timedelta(hours=random.randint(2, 48))
-                wo.save()
-            self.stdout.write(f"✅ 创建工单: {wo.title}")
+        # 4. 创建设备、管理 IP、工单（批量写入）
+        seed_in_chunks(
+            build_device_chunk, options['devices'], options, reserve=(Device,), log=self.stdout.write,
+            params={
+                'rack_ids': [rack.id for rack in racks[:20]],  # 最多20个机柜放设备
+                'user_ids': [user.id for user in users],
+                'admin_id': admin_user.id,
+                'work_orders': options['work_orders'],
+            },
+        )
+
+        # 5. 补充一些未绑定的IP
+        reserved = {f"10.10.{rng.randint(1, 50)}.{rng.randint(1, 254)}" for _ in range(10)}
+        IPAddress.objects.bulk_create([
+            IPAddress(ip=ip_str, vlan="100", is_used=False, description="预留IP")
+            for ip_str in sorted(reserved)
+        ], ignore_conflicts=True)  # 忽略重复
+        self.stdout.write(f"✅ 创建空闲IP: {len(reserved)} 个")
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -0,0 +1,38 @@
+"""
+人员进出记录导出
+
+全部为本表字段，按 values_list 分块读取，不实例化模型；
+电话号码、证件号码由 EncryptedCharField.from_db_value 解密（相同密文只解密一次）
+"""
+from utils.export import Column, ExportSpec, yes_no
+
+from .models import ProcessRecord
+
+PROCESS_RECORD_EXPORT = ExportSpec(ProcessRecord, [
+    Column("申请人", 'applicant'),
+    Column("人员姓名", 'person_name'),
+    Column("电话号码", 'phone_number'),
+    Column("人员类型", 'person_type', display=True),
+    Column("证件类型", 'id_type', display=True),
+    Column("证件号码", 'id_number', width=22),
+    Column("人员单位", 'unit'),
+    Column("人员部门", 'department'),
+    Column("登记状态", 'registration_status', display=True),
+    Column("申请进入时间", 'apply_enter_time', width=20),
+    Column("申请离开时间", 'apply_leave_time', width=20),
+    Column("实际进入时间", 'entered_time', width=20),
+    Column("实际离开时间", 'exited_time', width=20),
+    Column("进出次数", 'enter_count'),
+    Column("陪同人", 'companion'),
+    Column("进入原因", 'reason', width=30),
+    Column("携带物品", 'carried_items', width=30),
+    Column("门禁卡状态", 'card_status', display=True),
+    Column("门禁卡类型", 'card_type', display=True),
+    Column("证件质押状态", 'pledged_status', display=True),
+    Column("备注", 'remarks', width=30),
+    Column("关联OA流程", 'oa_link', width=30),
+    Column("是否紧急", 'is_emergency', convert=yes_no),
+    Column("是否正常", 'is_normal', convert=yes_no),
+    Column("是否关联OA", 'is_linked', convert=yes_no),
+    Column("创建时间", 'create_time', width=20),
+], sheet_title='人员进出记录', filename='process_records_export')
@@ -1,4 +1,5 @@
 import django_filters
+from utils.encrypted_field import blind_index_q
 from .models import ProcessRecord, OAInfo, OAPerson
 
 
@@ -9,7 +10,7 @@ class ProcessRecordFilter(django_filters.FilterSet):
     department = django_filters.CharFilter(lookup_expr='icontains')
     oa_link_info = django_filters.CharFilter(lookup_expr='icontains')
 
-    # 加密字段：仅支持精确匹配（无法模糊）
+    # 加密字段：按盲索引匹配完整号码、后4位或前缀（电话前7位、证件前6位）
     phone_number = django_filters.CharFilter(method='filter_phone_number')
     id_number = django_filters.CharFilter(method='filter_id_number')
 
@@ -49,16 +50,12 @@ class ProcessRecordFilter(django_filters.FilterSet):
         fields = []  # 所有字段通过显式定义控制
 
     def filter_phone_number(self, queryset, name, value):
-        try:
-            return queryset.filter(phone_number=value)
-        except Exception:
-            return queryset.none()
+        q = blind_index_q(queryset.model, 'phone_number', value)
+        return queryset.filter(q) if q is not None else queryset.none()
 
     def filter_id_number(self, queryset, name, value):
-        try:
-            return queryset.filter(id_number=value)
-        except Exception:
-            return queryset.none()
+        q = blind_index_q(queryset.model, 'id_number', value)
+        return queryset.filter(q) if q is not None else queryset.none()
 
     def filter_is_emergency(self, queryset, name, value):
         if value == '1':
@@ -82,7 +79,7 @@ class OAPersonFilter(django_filters.FilterSet):
     person_type = django_filters.ChoiceFilter(choices=OAPerson._meta.get_field('person_type').choices)
     id_type = django_filters.ChoiceFilter(choices=OAPerson._meta.get_field('id_type').choices)
 
-    # 加密字段精确匹配（不支持模糊）
+    # 加密字段：按盲索引匹配完整号码、后4位或前缀（电话前7位、证件前6位）
     phone_number = django_filters.CharFilter(method='filter_phone_number')
     id_number = django_filters.CharFilter(method='filter_id_number')
 
@@ -91,16 +88,12 @@ class OAPersonFilter(django_filters.FilterSet):
         fields = []
 
     def filter_phone_number(self, queryset, name, value):
-        try:
-            return queryset.filter(phone_number=value)
-        except Exception:
-            return queryset.none()
+        q = blind_index_q(queryset.model, 'phone_number', value)
+        return queryset.filter(q) if q is not None else queryset.none()
 
     def filter_id_number(self, queryset, name, value):
-        try:
-            return queryset.filter(id_number=value)
-        except Exception:
-            return queryset.none()
+        q = blind_index_q(queryset.model, 'id_number', value)
+        return queryset.filter(q) if q is not None else queryset.none()
 
 
 class OAInfoFilter(django_filters.FilterSet):
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.record.models import OAPerson, ProcessRecord
+from utils.encrypted_field import blind_index_fields
+
+MODELS = {
+    'process_record': ProcessRecord,
+    'oa_person': OAPerson,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        '重建电话、证件号码的盲索引列：新增盲索引后回填存量数据，'
+        '更换 BLIND_INDEX_KEY 或 queryset.update() 修改了加密字段后也需执行'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', choices=sorted(MODELS), default=sorted(MODELS))
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for name in options['models']:
+            model = MODELS[name]
+            fields = blind_index_fields(model)
+            sources = sorted({field.source for field in fields})
+            updated = 0
+            batch = []
+            for obj in model.objects.only('pk', *sources).order_by('pk').iterator(chunk_size=batch_size):
+                for field in fields:
+                    field.pre_save(obj, add=False)
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    updated += self._flush(model, batch, fields)
+                    batch = []
+            if batch:
+                updated += self._flush(model, batch, fields)
+            self.stdout.write(self.style.SUCCESS(f"✅ {model._meta.verbose_name}：重建 {updated} 条盲索引"))
+
+    @staticmethod
+    def _flush(model, batch, fields):
+        with transaction.atomic():
+            model.objects.bulk_update(batch, [field.name for field in fields])
+        return len(batch)
@@ -1,6 +1,6 @@
 from django.db import models
 from common.base_model import BaseModel
-from utils.encrypted_field import EncryptedCharField
+from utils.encrypted_field import EncryptedCharField, BlindIndexField
 
 
 class OAInfo(models.Model):
@@ -25,6 +25,9 @@ class OAInfo(models.Model):
         verbose_name_plural = "OA信息"
         ordering = ['-id']
         db_table = 'idc_oa_info'
+        indexes = [
+            models.Index(fields=['oa_link']),   # OA 推送按 processId 去重
+        ]
 
 
 class OAPerson(models.Model):
@@ -45,6 +48,14 @@ class OAPerson(models.Model):
                                   help_text="来自OA申请部门，支持选择内部部门或手动输入外部部门")
     is_linked = models.BooleanField(verbose_name="是否关联星辰", default=False, help_text="需要用户手动关联星辰")
 
+    # 电话、证件号码的盲索引（见 utils.encrypted_field.BlindIndexField）：完整值、后 4 位、前缀（号段+地区 / 行政区划）
+    phone_number_bidx = BlindIndexField('phone_number')
+    phone_number_last4_bidx = BlindIndexField('phone_number', 'suffix', 4)
+    phone_number_prefix7_bidx = BlindIndexField('phone_number', 'prefix', 7)
+    id_number_bidx = BlindIndexField('id_number')
+    id_number_last4_bidx = BlindIndexField('id_number', 'suffix', 4)
+    id_number_prefix6_bidx = BlindIndexField('id_number', 'prefix', 6)
+
     oa_info = models.ForeignKey(
         OAInfo,
         on_delete=models.CASCADE,    # 级联删除：删除 OAInfo 时，其所有关联的 OAPerson 也会被删除
@@ -59,6 +70,21 @@ class OAPerson(models.Model):
         db_table = 'idc_oa_person'
 
 
+class OAPush(models.Model):
+    """
+    已入库的 OA 推送（按 processId 幂等，人员明细为空的申请也能去重）
+    """
+    process_id = models.CharField(verbose_name="OA流程ID", max_length=128, unique=True)
+    is_post_entry = models.BooleanField(verbose_name="是否为后补流程", default=False)
+    person_count = models.PositiveIntegerField(verbose_name="人员数", default=0)
+    create_time = models.DateTimeField(auto_now_add=True, verbose_name="入库时间")
+
+    class Meta:
+        verbose_name = "OA推送记录"
+        verbose_name_plural = "OA推送记录"
+        db_table = 'idc_oa_push'
+
+
 class ProcessRecord(BaseModel):
     """
     机房人员进出登记记录模型
@@ -104,6 +130,14 @@ class ProcessRecord(BaseModel):
     oa_link_info = models.CharField(verbose_name="关联OA流程显示信息", max_length=256, blank=True, null=True)
     applicant_time = models.DateTimeField(verbose_name="OA申请时间", null=True, blank=True, help_text="由OA自动带出")
 
+    # 电话、证件号码的盲索引（见 utils.encrypted_field.BlindIndexField）：完整值、后 4 位、前缀（号段+地区 / 行政区划）
+    phone_number_bidx = BlindIndexField('phone_number')
+    phone_number_last4_bidx = BlindIndexField('phone_number', 'suffix', 4)
+    phone_number_prefix7_bidx = BlindIndexField('phone_number', 'prefix', 7)
+    id_number_bidx = BlindIndexField('id_number')
+    id_number_last4_bidx = BlindIndexField('id_number', 'suffix', 4)
+    id_number_prefix6_bidx = BlindIndexField('id_number', 'prefix', 6)
+
     class Meta:
         verbose_name = "人员进出记录"
         verbose_name_plural = "人员进出记录"
@@ -112,6 +146,7 @@ class ProcessRecord(BaseModel):
         indexes = [
             models.Index(fields=['entered_time', 'registration_status']),
             models.Index(fields=['unit']),
+            models.Index(fields=['oa_link']),   # OA 推送按 processId 去重
         ]
 
 
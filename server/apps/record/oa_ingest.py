@@ -0,0 +1,185 @@
+"""
+OA 机房进出申请推送入库（SubmitEntryApplicationView、ingest_oa_application_task 共用）
+
+  - 解密后的表单先解析为 OAApplication（申请信息 + 人员明细），字段映射只在这里维护；
+    解析失败（格式错误、缺少 processId）直接抛出，由接口返回失败
+  - 同一申请的全部人员在一个事务内 bulk_create，中途失败整单回滚
+  - 按 processId 幂等：入库时在同一事务内写 OAPush（processId 唯一），已入库的申请重复推送直接跳过；
+    OAPush 之前入库的申请按 oa_link 判断。同一 processId 并发推送时用缓存锁串行，拿不到锁的返回失败由 OA 重试
+  - 异步入库时队列中只放加密的原始数据，worker 调用 decrypt_payload 解密
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.record.models import OAInfo, OAPerson, OAPush, ProcessRecord
+from apps.record.utils import timestamp_ms_to_datetime
+from utils.cipher import AESCipher
+
+LOCK_ALIAS = 'temp'
+LOCK_TIMEOUT = 60
+
+# 证件类型映射
+ID_TYPE_MAP = {"工牌": 1, "身份证": 2, "驾驶证": 3, "护照": 4}
+
+# 表单字段
+FIELD_IS_POST_ENTRY = "fd_3e52febf30855e"    # 是否后补（"0" 为后补）
+FIELD_APPLICANT_NAME = "fd_3492b1ce199d78"
+FIELD_APPLICANT_CODE = "fd_3492b1bc24dec8"
+FIELD_APPLICANT_UNIT = "fd_34a3f0e5cb22b6"
+FIELD_APPLICANT_TIME = "fd_3492b1dca12354"
+FIELD_ENTER_TIME = "fd_3b8333606a75b2"
+FIELD_LEAVE_TIME = "fd_3b83336261114c"
+FIELD_APPLY_COUNT = "fd_3b8333adc9bac8"      # 供应商人数
+FIELD_REASON = "fd_3b8333af8ffb8a"
+FIELD_CARRIED_ITEMS = "fd_3b8333b5b1c66c"
+FIELD_PERSONS = "fd_3586e01ffb8ada"          # 明细表1：人员信息
+
+# 人员明细字段
+PERSON_NAME = "fd_3b833bb44fff40"
+PERSON_PHONE = "fd_3b833bb7abbb8c"
+PERSON_ID_TYPE = "fd_3e5302cbb15384"
+PERSON_JOB_NUMBER = "fd_3b833bb674cdae"
+PERSON_ID_NUMBER = "fd_3e5338ea59258c"
+PERSON_UNIT = "fd_3e53011e4a1d6a"
+PERSON_DEPARTMENT = "fd_3e53011edca3fe"
+
+
+def decrypt_payload(ciphertext):
+    """OA 推送的 data 字段（AES 加密 + base64）→ 推送数据 {'processId': ..., 'form': {...}}"""
+    return AESCipher(settings.OA_SECRET_KEY).decrypt_base64(ciphertext)
+
+
+def _value(form, field, default=None):
+    return (form.get(field) or {}).get("value", default)
+
+
+def parse_person(p):
+    """人员明细 → 两种流程共用的人员字段"""
+    id_type = ID_TYPE_MAP.get(_value(p, PERSON_ID_TYPE, "工牌"), 1)
+    return {
+        'person_name': (_value(p, PERSON_NAME) or "")[:50],
+        'phone_number': _value(p, PERSON_PHONE, ""),
+        # 人员类型根据工牌判断
+        'person_type': 1 if id_type == 1 else 2,
+        'id_type': id_type,
+        # 工号优先，非工号备用
+        'id_number': _value(p, PERSON_JOB_NUMBER) or _value(p, PERSON_ID_NUMBER, ""),
+        'unit': _value(p, PERSON_UNIT, ""),
+        'department': _value(p, PERSON_DEPARTMENT, ""),
+    }
+
+
+class OAApplication:
+    """解析后的 OA 申请"""
+
+    def __init__(self, data):
+        form = data.get('form') or {}
+        self.process_id = str(data.get('processId') or '')
+        if not self.process_id:
+            raise ValueError("OA推送缺少 processId")
+        self.is_post_entry = _value(form, FIELD_IS_POST_ENTRY, "0") == "0"
+        applicant_name = _value(form, FIELD_APPLICANT_NAME, "")
+        applicant_unit = _value(form, FIELD_APPLICANT_UNIT, "")
+        self.applicant = f'{applicant_name}({_value(form, FIELD_APPLICANT_CODE, "")})'
+        self.applicant_time = timestamp_ms_to_datetime(_value(form, FIELD_APPLICANT_TIME))
+        self.oa_link = f'{settings.OA_BASE_URL}{self.process_id}'
+        self.oa_link_info = f'{applicant_unit}{applicant_name}的人员或设备进出圆通数据中心机房申请'
+        self.apply_enter_time = timestamp_ms_to_datetime(_value(form, FIELD_ENTER_TIME))
+        self.apply_leave_time = timestamp_ms_to_datetime(_value(form, FIELD_LEAVE_TIME))
+        self.apply_count = int(_value(form, FIELD_APPLY_COUNT, 1))
+        self.reason = _value(form, FIELD_REASON, "")
+        self.carried_items = _value(form, FIELD_CARRIED_ITEMS, "")
+        self.persons = [parse_person(p) for p in _value(form, FIELD_PERSONS) or []]
+
+    def exists(self):
+        if OAPush.objects.filter(process_id=self.process_id).exists():
+            return True
+        # OAPush 之前入库的申请
+        model = OAInfo if self.is_post_entry else ProcessRecord
+        return model.objects.filter(oa_link=self.oa_link).exists()
+
+    def mark_saved(self):
+        """写入处理标记（与明细同一事务），并发重复入库时唯一约束冲突"""
+        OAPush.objects.create(process_id=self.process_id, is_post_entry=self.is_post_entry,
+                              person_count=len(self.persons))
+
+    def save_post_entry(self):
+        """后补流程：OAInfo + OAPerson"""
+        oa_info = OAInfo.objects.create(
+            applicant=self.applicant,
+            apply_enter_time=self.apply_enter_time,
+            apply_leave_time=self.apply_leave_time,
+            apply_count=self.apply_count,
+            connected_count=0,
+            is_post_entry=True,
+            oa_link=self.oa_link,
+            create_time=timezone.now(),
+            oa_link_info=self.oa_link_info,
+            applicant_time=self.applicant_time
+        )
+        OAPerson.objects.bulk_create([OAPerson(oa_info=oa_info, **person) for person in self.persons])
+        return len(self.persons)
+
+    def save_process_records(self):
+        """正常流程：ProcessRecord（每人一条记录）"""
+        now = timezone.now()
+        ProcessRecord.objects.bulk_create([
+            ProcessRecord(
+                applicant=self.applicant,
+                registration_status=1,  # 未入场
+                apply_enter_time=self.apply_enter_time,
+                apply_leave_time=self.apply_leave_time,
+                entered_time=None,
+                exited_time=None,
+                enter_count=0,
+                companion="无",
+                reason=self.reason,
+                carried_items=self.carried_items,
+                card_status=1,  # 无需发卡
+                card_type=0,
+                pledged_status=1,  # 未质押
+                remarks="",
+                oa_link=self.oa_link,
+                is_emergency=False,
+                is_normal=True,
+                create_time=now,
+                update_time=now,
+                oa_link_info=self.oa_link_info,
+                applicant_time=self.applicant_time,
+                **person
+            )
+            for person in self.persons
+        ])
+        return len(self.persons)
+
+
+def ingest_application(application):
+    """
+    保存一条已解析的 OA 推送
+    :param application: OAApplication
+    :return: 'created'（已入库）、'duplicate'（重复推送，已跳过）、'locked'（同一申请正在入库）
+    """
+    lock_key = f'record:oa_push:{application.process_id}'
+    if not caches[LOCK_ALIAS].add(lock_key, 1, LOCK_TIMEOUT):
+        return 'locked'
+    try:
+        with transaction.atomic():
+            if application.exists():
+                return 'duplicate'
+            application.mark_saved()
+            if application.is_post_entry:
+                count = application.save_post_entry()
+                print(f"保存OAInfo成功，人员 {count} 人")
+            else:
+                count = application.save_process_records()
+                print(f"保存ProcessRecord成功，共 {count} 条")
+        return 'created'
+    except IntegrityError:
+        # 缓存锁过期后并发入库：另一次推送已写入 OAPush
+        if OAPush.objects.filter(process_id=application.process_id).exists():
+            return 'duplicate'
+        raise
+    finally:
+        caches[LOCK_ALIAS].delete(lock_key)
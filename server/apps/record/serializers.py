@@ -4,8 +4,12 @@ from .models import ProcessRecord, EntryLog, OAInfo, OAPerson
 from django.utils import timezone
 from django.db import transaction
 
+from utils.encrypted_field import blind_index_fields
 from .utils import mask_id_number, mask_phone_number
 
+# 盲索引列只用于检索，不对外输出
+BLIND_INDEX_FIELDS = [field.name for field in blind_index_fields(ProcessRecord)]
+
 
 class EntryLogSerializer(serializers.ModelSerializer):
     card_status_display = serializers.CharField(
@@ -60,7 +64,7 @@ class ProcessRecordSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ProcessRecord
-        fields = '__all__'
+        exclude = BLIND_INDEX_FIELDS
         read_only_fields = ['create_time', 'update_time']
 
     def get_id_number(self, obj):
@@ -248,7 +252,7 @@ class ProcessRecordDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ProcessRecord
-        fields = '__all__'
+        exclude = BLIND_INDEX_FIELDS
 
     def get_id_number(self, obj):
         raw = obj.id_number
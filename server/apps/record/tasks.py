@@ -0,0 +1,20 @@
+from celery import shared_task
+
+from .oa_ingest import OAApplication, decrypt_payload, ingest_application
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def ingest_oa_application_task(self, ciphertext):
+    """
+    OA 推送异步入库（OA_INGEST_ASYNC=True 时由 SubmitEntryApplicationView 提交），失败或被锁时稍后重试
+    :param ciphertext: 推送中加密的 data 字段（接口已校验可解析），队列中不出现明文个人信息
+    """
+    application = OAApplication(decrypt_payload(ciphertext))
+    try:
+        outcome = ingest_application(application)
+    except Exception as e:
+        print(f"OA数据入库失败（processId={application.process_id}）: {e}")
+        raise self.retry(exc=e)
+    if outcome == 'locked':
+        raise self.retry()
+    return outcome
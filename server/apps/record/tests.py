@@ -1,3 +1,175 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from utils.cipher import AESCipher
+from utils.encrypted_field import blind_index_fields, blind_index_q
+from . import oa_ingest
+from .exports import PROCESS_RECORD_EXPORT
+from .filters import OAPersonFilter, ProcessRecordFilter
+from .models import OAInfo, OAPerson, OAPush, ProcessRecord
+
+
+class BlindIndexTests(TestCase):
+    """电话、证件号码盲索引：写入时生成，过滤器按完整值 / 后 4 位 / 前缀检索"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ProcessRecord.objects.bulk_create([
+            ProcessRecord(person_name='甲', phone_number='13800138000', id_number='11010119900101123x'),
+            ProcessRecord(person_name='乙', phone_number='138 0013 9999', id_number='110101199202025678'),
+            ProcessRecord(person_name='丙', phone_number='13912348000', id_number='320102198803031234'),
+            ProcessRecord(person_name='丁', phone_number=None, id_number=None),
+        ])
+        cls.records = {r.person_name: r for r in ProcessRecord.objects.all()}
+
+    def search(self, **params):
+        qs = ProcessRecordFilter(params, queryset=ProcessRecord.objects.all()).qs
+        return sorted(qs.values_list('person_name', flat=True))
+
+    def test_bulk_create_fills_columns(self):
+        record = self.records['甲']
+        for field in blind_index_fields(ProcessRecord):
+            self.assertIsNotNone(getattr(record, field.attname), field.name)
+            self.assertEqual(len(getattr(record, field.attname)), 16)
+        empty = self.records['丁']
+        self.assertTrue(all(getattr(empty, f.attname) is None for f in blind_index_fields(ProcessRecord)))
+
+    def test_full_value(self):
+        self.assertEqual(self.search(phone_number='13800138000'), ['甲'])
+        self.assertEqual(self.search(id_number='320102198803031234'), ['丙'])
+        self.assertEqual(self.search(phone_number='13800138001'), [])
+
+    def test_last4(self):
+        self.assertEqual(self.search(phone_number='8000'), ['丙', '甲'])
+        self.assertEqual(self.search(id_number='5678'), ['乙'])
+
+    def test_prefix(self):
+        self.assertEqual(self.search(phone_number='1380013'), ['乙', '甲'])
+        self.assertEqual(self.search(id_number='110101'), ['乙', '甲'])
+        # 没有对应长度的盲索引列时不返回数据
+        self.assertEqual(self.search(phone_number='138'), [])
+
+    def test_normalization(self):
+        self.assertEqual(self.search(id_number='11010119900101123X'), ['甲'])
+        self.assertEqual(self.search(id_number='123x'), ['甲'])
+        self.assertEqual(self.search(phone_number='138-0013-9999'), ['乙'])
+        self.assertEqual(self.search(phone_number=' 13800139999 '), ['乙'])
+
+    def test_empty_input_matches_nothing(self):
+        # 纯空白由 CharFilter 视为未填写；规范化后为空的输入不能匹配盲索引为空的记录
+        for value in ('-', '--', ' - '):
+            self.assertIsNone(blind_index_q(ProcessRecord, 'phone_number', value))
+            self.assertEqual(self.search(phone_number=value), [])
+            self.assertEqual(self.search(id_number=value), [])
+
+    def test_save_updates_columns(self):
+        record = self.records['丙']
+        record.phone_number = '13700000000'
+        record.save()
+        self.assertEqual(self.search(phone_number='13700000000'), ['丙'])
+        self.assertEqual(self.search(phone_number='13912348000'), [])
+
+    def test_oa_person_filter(self):
+        oa_info = OAInfo.objects.create(applicant='张三')
+        OAPerson.objects.bulk_create([
+            OAPerson(oa_info=oa_info, person_name='戊', phone_number='13600001111', id_number='440300199001011111'),
+        ])
+        qs = OAPersonFilter({'id_number': '1111'}, queryset=OAPerson.objects.all()).qs
+        self.assertEqual(list(qs.values_list('person_name', flat=True)), ['戊'])
+
+
+@override_settings(ROOT_URLCONF='apps.record.urls')
+class PersonLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ProcessRecord.objects.create(person_name='甲', phone_number='13800138000', id_number='11010119900101123X')
+        # 盲索引为空的存量记录（未执行 rebuild_blind_index）
+        ProcessRecord.objects.create(person_name='乙', unit='外部单位')
+        ProcessRecord.objects.filter(person_name='乙').update(phone_number_bidx=None, id_number_bidx=None)
+        cls.user = User.objects.create(username='lookup')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('processrecord-person-lookup')
+
+    def test_lookup_by_full_value(self):
+        response = self.client.get(self.url, {'phone_number': '138-0013-8000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['person_name'], '甲')
+        self.assertEqual(response.data['data']['phone_number'], '138****8000')
+
+    def test_empty_input_is_rejected(self):
+        for params in ({}, {'id_number': '-'}, {'phone_number': ' '}, {'id_number': '', 'phone_number': '--'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ProcessRecordExportTests(TestCase):
+    """人员进出记录导出全部为本表字段：values_list 一条查询，电话、证件号码导出明文"""
+
+    def test_values_mode_single_query(self):
+        ProcessRecord.objects.bulk_create([
+            ProcessRecord(person_name=f"人员{i}", phone_number=f"1380000000{i}", person_type=1) for i in range(5)
+        ])
+        self.assertTrue(PROCESS_RECORD_EXPORT.values_mode)
+        with self.assertNumQueries(1):
+            rows = list(PROCESS_RECORD_EXPORT.iter_rows(ProcessRecord.objects.order_by('id')))
+        headers = PROCESS_RECORD_EXPORT.headers
+        self.assertEqual([row[headers.index("电话号码")] for row in rows], [f"1380000000{i}" for i in range(5)])
+        self.assertEqual(rows[0][headers.index("人员类型")], dict(ProcessRecord._meta.get_field('person_type').flatchoices)[1])
+
+
+@override_settings(ROOT_URLCONF='apps.record.urls',
+                   OA_SECRET_KEY='0123456789abcdef', OA_BASE_URL='https://oa.example.com/')
+class SubmitEntryApplicationTests(TestCase):
+    """OA 推送：接口内同步校验，队列只放密文，按 processId 幂等"""
+
+    def push(self, payload=None, ciphertext=None):
+        if ciphertext is None:
+            ciphertext = AESCipher(settings.OA_SECRET_KEY).encrypt(payload)
+        response = self.client.post(reverse('submit_entry'), data=json.dumps({'data': ciphertext}),
+                                    content_type='application/json')
+        return response.content.decode()
+
+    def payload(self, process_id='P1', post_entry=False, persons=1):
+        person = {oa_ingest.PERSON_NAME: {'value': '甲'}, oa_ingest.PERSON_PHONE: {'value': '13800138000'}}
+        return {'processId': process_id, 'form': {
+            oa_ingest.FIELD_IS_POST_ENTRY: {'value': '0' if post_entry else '1'},
+            oa_ingest.FIELD_PERSONS: {'value': [person] * persons},
+        }}
+
+    def test_malformed_payload_fails(self):
+        self.assertEqual(self.push(ciphertext='not-base64!'), 'fail')
+        self.assertEqual(self.push({'form': {}}), 'fail')
+        self.assertEqual(self.push({'processId': 'P1', 'form': {oa_ingest.FIELD_APPLY_COUNT: {'value': 'x'}}}), 'fail')
+        self.assertFalse(OAPush.objects.exists())
+
+    def test_duplicate_push_creates_nothing(self):
+        self.assertEqual(self.push(self.payload(persons=2)), 'ok')
+        self.assertEqual(self.push(self.payload(persons=2)), 'ok')
+        self.assertEqual(ProcessRecord.objects.count(), 2)
+        self.assertEqual(OAPush.objects.get().person_count, 2)
+
+    def test_empty_person_list_is_deduplicated(self):
+        # 正常流程没有人员时不写 ProcessRecord，去重只能依靠 OAPush
+        outcomes = [oa_ingest.ingest_application(oa_ingest.OAApplication(self.payload(persons=0))) for _ in range(2)]
+        self.assertEqual(outcomes, ['created', 'duplicate'])
+        self.assertFalse(ProcessRecord.objects.exists())
+        self.assertEqual(OAPush.objects.count(), 1)
+
+    @override_settings(OA_INGEST_ASYNC=True)
+    def test_async_enqueues_ciphertext(self):
+        ciphertext = AESCipher(settings.OA_SECRET_KEY).encrypt(self.payload())
+        with mock.patch('apps.record.views.ingest_oa_application_task.delay') as delay:
+            self.assertEqual(self.push(ciphertext=ciphertext), 'ok')
+            self.assertEqual(self.push({'form': {}}), 'fail')
+        delay.assert_called_once_with(ciphertext)
+        self.assertFalse(ProcessRecord.objects.exists())
@@ -1,41 +1,78 @@
 import json
-import datetime
-import pandas as pd
+import operator
+import functools
 from django.views import View
 from django.conf import settings
 from django.http import HttpResponse
 from rest_framework import viewsets
 
 from common.pagination import StandardResultsSetPagination
-from utils.cipher import AESCipher
 from apps.record.models import ProcessRecord, EntryLog, OAInfo, OAPerson
 from apps.record.serializers import ProcessRecordSerializer, EntryLogSerializer, OAInfoSerializer, OAPersonSerializer, \
     ProcessRecordBatchRegisterSerializer, ProcessRecordDetailSerializer
 from apps.record.filters import ProcessRecordFilter, OAInfoFilter, OAPersonFilter
+from apps.record.exports import PROCESS_RECORD_EXPORT
+from apps.record.oa_ingest import OAApplication, decrypt_payload, ingest_application
+from apps.record.tasks import ingest_oa_application_task
+from apps.record.utils import mask_id_number, mask_phone_number
+from utils.export import ExportMixin
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Case, When, Value, CharField
+from django.db.models.functions import Concat
 from utils.date_transform import get_date_range
+from utils.redis_client import cache
 from django.db import transaction
 
 
-class ProcessRecordViewSet(viewsets.ModelViewSet):
+class ProcessRecordViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = ProcessRecord.objects.all()
     serializer_class = ProcessRecordSerializer
     filterset_class = ProcessRecordFilter
     pagination_class = StandardResultsSetPagination
     ordering_fields = ['create_time', 'entered_time', 'exited_time']
     search_fields = ['person_name', 'unit', 'department', 'reason']
+    export_spec = PROCESS_RECORD_EXPORT
 
     def get_serializer_class(self):
         if self.action == 'register':
             return ProcessRecordBatchRegisterSerializer
         return super().get_serializer_class()
 
+    @action(detail=False, methods=['get'], url_path='person-lookup')
+    def person_lookup(self, request):
+        """
+        登记时按完整电话或证件号码查找最近一次登记的人员信息（盲索引等值查询，用于自动填充）
+        """
+        q = None
+        for name in ('id_number', 'phone_number'):
+            # 规范化后为空（如 "-"、空格）时 token 为 None，不能按 IS NULL 查询
+            token = ProcessRecord._meta.get_field(f"{name}_bidx").token(request.GET.get(name))
+            if token is not None:
+                q = Q(**{f"{name}_bidx": token})
+                break
+        if q is None:
+            return Response({"error": "phone_number 或 id_number 必填其一"}, status=status.HTTP_400_BAD_REQUEST)
+
+        record = ProcessRecord.objects.filter(q).order_by('-create_time').first()
+        if record is None:
+            return Response({"data": None}, status=status.HTTP_200_OK)
+        return Response({
+            "data": {
+                "person_name": record.person_name,
+                "phone_number": mask_phone_number(record.phone_number),
+                "person_type": record.person_type,
+                "id_type": record.id_type,
+                "id_number": mask_id_number(record.id_number),
+                "unit": record.unit,
+                "department": record.department,
+            }
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['post'], url_path='register')
     def register(self, request):
         """
@@ -55,56 +92,6 @@ class ProcessRecordViewSet(viewsets.ModelViewSet):
             "details": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['get'])
-    def export(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-
-        data = []
-        for record in queryset:
-            data.append({
-                "申请人": record.applicant,
-                "人员姓名": record.person_name,
-                "电话号码": record.phone_number,
-                "人员类型": dict(ProcessRecord.PERSON_TYPE_CHOICES).get(record.person_type, record.person_type),
-                "证件类型": dict(ProcessRecord.ID_TYPE_CHOICES).get(record.id_type, record.id_type),
-                "证件号码": record.id_number,
-                "人员单位": record.unit,
-                "人员部门": record.department,
-                "登记状态": dict(ProcessRecord.STATUS_CHOICES).get(record.registration_status, record.registration_status),
-                "申请进入时间": record.apply_enter_time,
-                "申请离开时间": record.apply_leave_time,
-                "实际进入时间": record.entered_time,
-                "实际离开时间": record.exited_time,
-                "进出次数": record.enter_count,
-                "陪同人": record.companion,
-                "进入原因": record.reason,
-                "携带物品": record.carried_items,
-                "门禁卡状态": dict(ProcessRecord.CARD_STATUS_CHOICES).get(record.card_status, record.card_status),
-                "门禁卡类型": dict(ProcessRecord.CARD_TYPE_CHOICES).get(record.card_type, record.card_type),
-                "证件质押状态": dict(ProcessRecord.PLEDGED_STATUS_CHOICES).get(record.pledged_status, record.pledged_status),
-                "备注": record.remarks,
-                "关联OA流程": record.oa_link,
-                "是否紧急": "是" if record.is_emergency else "否",
-                "是否正常": "是" if record.is_normal else "否",
-                "是否关联OA": "是" if record.is_linked else "否",
-                "创建时间": record.create_time,
-            })
-
-        df = pd.DataFrame(data)
-
-        today = datetime.datetime.now().strftime("%Y%m%d")
-        filename = f"process_records_export_{today}.xlsx"
-
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='人员进出记录')
-
-        return response
-
     @action(detail=True, methods=['post'], url_path='enter')
     def enter(self, request, pk=None):
         """
@@ -306,6 +293,25 @@ class ProcessRecordViewSet(viewsets.ModelViewSet):
             "msg": "关联OA成功",
         }, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], url_path='oa-candidates')
+    def oa_candidates(self, request, pk=None):
+        """
+        关联 OA 时的候选人员：未关联的 OA 人员中证件号码或电话与该记录相同的（按盲索引列等值匹配，不解密）
+        """
+        record = get_object_or_404(ProcessRecord, pk=pk)
+        q = Q()
+        for name in ('id_number_bidx', 'phone_number_bidx'):
+            token = getattr(record, name)
+            if token:
+                q |= Q(**{name: token})
+        if not q:
+            return Response({"data": []}, status=status.HTTP_200_OK)
+
+        persons = OAPerson.objects.select_related('oa_info').filter(q, is_linked=False).order_by('-oa_info__apply_enter_time')
+        return Response({
+            "data": OAPersonSerializer(persons, many=True).data
+        }, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'], url_path='details')
     def details(self, request, pk=None):
         record = get_object_or_404(ProcessRecord, pk=pk)
@@ -313,13 +319,6 @@ class ProcessRecordViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-def timestamp_ms_to_datetime(ts_ms):
-    """将毫秒级时间戳转为无时区的 naive datetime（USE_TZ=False 时使用）"""
-    if not ts_ms:
-        return None
-    return datetime.datetime.fromtimestamp(ts_ms / 1000)
-
-
 class EntryLogViewSet(viewsets.ModelViewSet):
     queryset = EntryLog.objects.all()
     serializer_class = EntryLogSerializer
@@ -352,144 +351,113 @@ class SubmitEntryApplicationView(View):
     """
 
     def post(self, request):
+        # 解密、解析在接口内同步完成，格式错误的推送返回失败，不会被当作成功确认
         try:
-            result = json.loads(request.body)
-            plain_text = result.get('data')
-            oa_secret = settings.OA_SECRET_KEY
-            aes = AESCipher(oa_secret)
-            data = aes.decrypt_base64(plain_text)
+            ciphertext = json.loads(request.body).get('data')
+            data = decrypt_payload(ciphertext)
+            application = OAApplication(data)
         except Exception as e:
             print(f"OA推送数据解析失败：{e}")
             return HttpResponse('fail')
         print(f'OA推送数据：{data}')
         try:
-            # 从顶层取 form 字段（数据结构是 {'number': ..., 'form': {...}}）
-            form_data = data.get('form', {})
-            process_id = data.get('processId', '')
-            # 获取是否后补字段（在 form 内）
-            is_post_entry_str = form_data.get("fd_3e52febf30855e", {}).get("value", "0")
-            is_post_entry = is_post_entry_str == "0"
-            applicant_name = form_data.get("fd_3492b1ce199d78", {}).get("value", "")
-            applicant_code = form_data.get("fd_3492b1bc24dec8", {}).get("value", "")
-            applicant_unit = form_data.get("fd_34a3f0e5cb22b6", {}).get("value", "")
-            applicant = f'{applicant_name}({applicant_code})'
-            applicant_time = timestamp_ms_to_datetime(form_data.get("fd_3492b1dca12354", {}).get("value"))
-            oa_link = f'{settings.OA_BASE_URL}{process_id}'
-            oa_link_info = f'{applicant_unit}{applicant_name}的人员或设备进出圆通数据中心机房申请'
-            if is_post_entry:
-                # ========== 后补流程：存入 OAInfo + OAPerson ==========
-                oa_info = OAInfo.objects.create(
-                    applicant=applicant[0] if isinstance(applicant, tuple) else applicant,
-                    apply_enter_time=timestamp_ms_to_datetime(form_data.get("fd_3b8333606a75b2", {}).get("value")),
-                    apply_leave_time=timestamp_ms_to_datetime(form_data.get("fd_3b83336261114c", {}).get("value")),
-                    apply_count=int(form_data.get("fd_3b8333adc9bac8", {}).get("value", 1)),  # 供应商人数
-                    connected_count=0,
-                    is_post_entry=True,
-                    oa_link=oa_link,
-                    create_time=timezone.now(),
-                    oa_link_info=oa_link_info,
-                    applicant_time=applicant_time
-                )
-
-                # 处理明细表1：人员信息
-                person_list = form_data.get("fd_3586e01ffb8ada", {}).get("value", [])
-                for p in person_list:
-
-                    id_type_map = {"工牌": 1, "身份证": 2, "驾驶证": 3, "护照": 4}
-                    id_type_str = p.get("fd_3e5302cbb15384", {}).get("value", "工牌")
-                    id_type = id_type_map.get(id_type_str, 1)
-
-                    unit = p.get("fd_3e53011e4a1d6a", {}).get("value", "")
-                    # 人员类型根据工牌判断
-                    person_type = 1 if id_type == 1 else 2
-
-                    # 工号优先，非工号备用
-                    id_number = p.get("fd_3b833bb674cdae", {}).get("value") or p.get("fd_3e5338ea59258c", {}).get("value", "")
-
-                    OAPerson.objects.create(
-                        oa_info=oa_info,
-                        person_name=p.get("fd_3b833bb44fff40", {}).get("value", "")[:50],
-                        phone_number=p.get("fd_3b833bb7abbb8c", {}).get("value", ""),
-                        person_type=person_type,
-                        id_type=id_type,
-                        id_number=id_number,
-                        unit=unit,
-                        department=p.get("fd_3e53011edca3fe", {}).get("value", "")
-                    )
-
-                print("保存OAInfo成功")
-                return HttpResponse("ok")
-
-            else:
-                # ========== 正常流程：存入 ProcessRecord（每人一条记录） ==========
-                enter_time = timestamp_ms_to_datetime(form_data.get("fd_3b8333606a75b2", {}).get("value"))
-                leave_time = timestamp_ms_to_datetime(form_data.get("fd_3b83336261114c", {}).get("value"))
-                reason = form_data.get("fd_3b8333af8ffb8a", {}).get("value", "")
-                carried_items = form_data.get("fd_3b8333b5b1c66c", {}).get("value", "")
-                companion = "无"
-
-                person_list = form_data.get("fd_3586e01ffb8ada", {}).get("value", [])
-                created_records = []
-
-                for p in person_list:
-                    # 证件类型映射
-                    id_type_map = {"工牌": 1, "身份证": 2, "驾驶证": 3, "护照": 4}
-                    id_type_str = p.get("fd_3e5302cbb15384", {}).get("value", "工牌")
-                    id_type = id_type_map.get(id_type_str, 1)
-
-                    unit = p.get("fd_3e53011e4a1d6a", {}).get("value", "")
-                    # 人员类型根据工牌判断
-                    person_type = 1 if id_type == 1 else 2
-
-                    # 工号优先，非工号备用
-                    id_number = p.get("fd_3b833bb674cdae", {}).get("value") or p.get("fd_3e5338ea59258c", {}).get("value", "")
-
-                    record = ProcessRecord.objects.create(
-                        applicant=applicant[0] if isinstance(applicant, tuple) else applicant,
-                        person_name=p.get("fd_3b833bb44fff40", {}).get("value", "")[:50],
-                        phone_number=p.get("fd_3b833bb7abbb8c", {}).get("value", ""),
-                        person_type=person_type,
-                        id_type=id_type,
-                        id_number=id_number,
-                        unit=unit,
-                        department=p.get("fd_3e53011edca3fe", {}).get("value", ""),
-                        registration_status=1,  # 未入场
-                        apply_enter_time=enter_time,
-                        apply_leave_time=leave_time,
-                        entered_time=None,
-                        exited_time=None,
-                        enter_count=0,
-                        companion=companion,
-                        reason=reason,
-                        carried_items=carried_items,
-                        card_status=1,  # 无需发卡
-                        card_type=0,
-                        pledged_status=1,  # 未质押
-                        remarks="",
-                        oa_link=oa_link,
-                        is_emergency=False,
-                        is_normal=True,
-                        create_time=timezone.now(),
-                        update_time=timezone.now(),
-                        oa_link_info=oa_link_info,
-                        applicant_time=applicant_time
-                    )
-                    created_records.append(record.id)
-
-                print("保存ProcessRecord成功")
+            if getattr(settings, 'OA_INGEST_ASYNC', False):
+                # 队列中只放加密的原始数据，worker 重新解密解析
+                ingest_oa_application_task.delay(ciphertext)
                 return HttpResponse("ok")
-
+            outcome = ingest_application(application)
         except Exception as e:
             import traceback
             traceback.print_exc()
             print(f"OA数据解析失败: {str(e)}")
             return HttpResponse("fail")
+        if outcome == 'locked':
+            # 同一申请正在入库，返回失败由 OA 重试（届时按 processId 去重）
+            return HttpResponse("fail")
+        if outcome == 'duplicate':
+            print(f"OA流程 {application.process_id} 已入库，忽略重复推送")
+        return HttpResponse("ok")
+
+
+SUMMARY_CARDS_TTL = 60          # 看板定时刷新在 TTL 内直接读缓存
+ENTERED_STATUSES = [2, 3]       # 已入场、已离场
+
+# 环比周期映射
+PERIOD_TO_LAST = {
+    'this_week': 'last_week',
+    'last_week': 'week_before_last',
+    'this_month': 'last_month',
+    'last_month': 'month_before_last',
+    'this_year': 'last_year',
+    'custom': 'custom_last',
+}
+
+
+def _in_windows(field, windows):
+    """entered_time 落在任一窗口内（各窗口并集）"""
+    return functools.reduce(operator.or_, (Q(**{f"{field}__range": window}) for window in windows.values()))
+
+
+def _window_case(field, windows):
+    """按 entered_time 所属窗口标记名称"""
+    return Case(
+        *(When(**{f"{field}__range": window}, then=Value(name)) for name, window in windows.items()),
+        default=Value(''),
+        output_field=CharField()
+    )
+
+
+def summary_metrics(windows):
+    """
+    一次扫描算出各时间窗口的卡片指标（ProcessRecord、EntryLog 各一条聚合查询）
+    人数按姓名+电话去重，单位数不含空单位
+    :param windows: {名称: (start, end)}
+    :return: {名称: {'people', 'records', 'normal', 'units', 'entries'}}
+    """
+    # Concat 会把 NULL 当作空串
+    person = Concat('person_name', Value('|'), 'phone_number', output_field=CharField())
+    records = ProcessRecord.objects.filter(
+        _in_windows('entered_time', windows),
+        registration_status__in=ENTERED_STATUSES
+    ).annotate(window=_window_case('entered_time', windows))
+    aggregates = {}
+    for name in windows:
+        in_window = Q(window=name)
+        aggregates.update({
+            f"{name}__people": Count(person, distinct=True, filter=in_window),
+            f"{name}__records": Count('id', filter=in_window),
+            f"{name}__normal": Count('id', filter=in_window & Q(is_normal=True)),
+            f"{name}__units": Count('unit', distinct=True, filter=in_window & ~Q(unit='')),
+        })
+    result = records.aggregate(**aggregates)
+
+    entries = EntryLog.objects.filter(
+        _in_windows('process_record__entered_time', windows),
+        process_record__registration_status__in=ENTERED_STATUSES,
+        entered_time__isnull=False
+    ).annotate(window=_window_case('process_record__entered_time', windows))
+    result.update(entries.aggregate(**{f"{name}__entries": Count('id', filter=Q(window=name)) for name in windows}))
+
+    metrics = {name: {} for name in windows}
+    for key, value in result.items():
+        name, metric = key.rsplit('__', 1)
+        metrics[name][metric] = value or 0
+    return metrics
+
+
+def _percent(part, total):
+    return round(part / total * 100, 2) if total > 0 else 0
+
+
+def _ring(current, last):
+    return round((current - last) / last * 100, 2) if last > 0 else 0
 
 
 class SummaryCardsView(APIView):
     """
     获取汇总卡片数据：总人数、总次数（基于EntryLog）、单位正常占比、环比
     支持 this_week / last_week / this_month / last_month / this_year / custom 的环比
+    结果按解析后的时间窗口缓存 SUMMARY_CARDS_TTL 秒
     """
     def get(self, request):
         period = request.GET.get('period', 'this_month')
@@ -497,78 +465,51 @@ class SummaryCardsView(APIView):
         end_date = request.GET.get('end_date')
 
         start, end = get_date_range(period, start_date, end_date)
-
-        # 当前周期数据
-        current_process_records = ProcessRecord.objects.filter(
-            entered_time__gte=start,
-            entered_time__lte=end,
-            registration_status__in=[2, 3]  # 已入场、已离场
+        windows = {'current': (start, end)}
+        if period == 'custom':
+            # custom_last 需要原始 start_date/end_date，缺少时无法计算环比
+            if start_date and end_date:
+                windows['last'] = get_date_range('custom_last', start_date, end_date)
+        elif period in PERIOD_TO_LAST:
+            windows['last'] = get_date_range(PERIOD_TO_LAST[period])
+
+        cache_key = 'record:summary_cards:' + '|'.join(
+            f"{s:%Y%m%d%H%M%S}-{e:%Y%m%d%H%M%S}" for s, e in windows.values()
         )
-
-        total_people = current_process_records.values('id').count()
-        total_entries = EntryLog.objects.filter(
-            process_record__in=current_process_records,
-            entered_time__isnull=False
-        ).count()
-        normal_count = current_process_records.filter(is_normal=True).count()
-        total_process_count = current_process_records.count()
-        normal_ratio = round((normal_count / total_process_count * 100), 2) if total_process_count > 0 else 0
-        total_unit = current_process_records.values('unit').distinct().count()
-
-        # === 环比周期映射 ===
-        period_to_last = {
-            'this_week': 'last_week',
-            'last_week': 'week_before_last',
-            'this_month': 'last_month',
-            'last_month': 'month_before_last',
-            'this_year': 'last_year',
-            'custom': 'custom_last',
-        }
-
-        last_start, last_end = None, None
-        if period in period_to_last:
-            # custom 和 custom_last 需要传入原始 start_date/end_date
-            if period == 'custom':
-                if not (start_date and end_date):
-                    # 无法计算环比
-                    pass
-                else:
-                    last_start, last_end = get_date_range('custom_last', start_date, end_date)
-            else:
-                last_start, last_end = get_date_range(period_to_last[period])
-
-        # 默认环比结构
-        ring_ratio = {"people": 0, "entries": 0, "unit": 0, "ratio": 0}
-
-        if last_start and last_end:
-            last_process_records = ProcessRecord.objects.filter(
-                entered_time__gte=last_start,
-                entered_time__lte=last_end,
-                registration_status__in=[2, 3]
-            )
-
-            last_people = last_process_records.values('person_name', 'phone_number').distinct().count()
-            last_entries = EntryLog.objects.filter(
-                process_record__in=last_process_records,
-                entered_time__isnull=False
-            ).count()
-            last_unit = last_process_records.values('unit').distinct().count()
-
-            last_normal = last_process_records.filter(is_normal=True).count()
-            last_total_process = last_process_records.count()
-            last_ratio = round((last_normal / last_total_process * 100), 2) if last_total_process > 0 else 0
-
-            ring_ratio["people"] = round(((total_people - last_people) / last_people * 100), 2) if last_people > 0 else 0
-            ring_ratio["entries"] = round(((total_entries - last_entries) / last_entries * 100), 2) if last_entries > 0 else 0
-            ring_ratio["unit"] = round(((total_unit - last_unit) / last_unit * 100), 2) if last_unit > 0 else 0
-            ring_ratio["ratio"] = round(normal_ratio - last_ratio, 2)
+        try:
+            cards = cache.get(cache_key)
+        except Exception as e:
+            print(f"[汇总卡片] 读取缓存失败: {e}")
+            cards = None
+
+        if cards is None:
+            metrics = summary_metrics(windows)
+            current = metrics['current']
+            normal_ratio = _percent(current['normal'], current['records'])
+            # 默认环比结构
+            ring_ratio = {"people": 0, "entries": 0, "unit": 0, "ratio": 0}
+            if 'last' in metrics:
+                last = metrics['last']
+                ring_ratio = {
+                    "people": _ring(current['people'], last['people']),
+                    "entries": _ring(current['entries'], last['entries']),
+                    "unit": _ring(current['units'], last['units']),
+                    "ratio": round(normal_ratio - _percent(last['normal'], last['records']), 2),
+                }
+            cards = {
+                "total_people": current['people'],
+                "total_entries": current['entries'],
+                "total_unit": current['units'],
+                "normal_ratio_percent": normal_ratio,
+                "ring_ratio": ring_ratio,
+            }
+            try:
+                cache.set(cache_key, cards, SUMMARY_CARDS_TTL)
+            except Exception as e:
+                print(f"[汇总卡片] 写入缓存失败: {e}")
 
         return Response({
-            "total_people": total_people,
-            "total_entries": total_entries,
-            "total_unit": total_unit,
-            "normal_ratio_percent": normal_ratio,
-            "ring_ratio": ring_ratio,
+            **cards,
             "period": period,
             "date_range": {
                 "start": start.strftime("%Y-%m-%d"),
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+from utils.export import FILE_TYPES, rebuild_queryset, write_export
+
+EXPORTS = {
+    'process_records': 'apps.record.views.ProcessRecordViewSet',
+    'users': 'apps.users.views.UserViewSet',
+    'roles': 'apps.users.views.RoleViewSet',
+    'incidents': 'apps.events.views.IncidentViewSet',
+}
+
+
+def run_export(spec, queryset, file_type, directory):
+    path = os.path.join(directory, f"benchmark.{file_type}")
+    try:
+        return write_export(path, file_type, spec, spec.iter_rows(queryset)), os.path.getsize(path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class Command(BaseCommand):
+    help = (
+        '导出吞吐基准：对当前数据库中的数据按 export_spec 写 XLSX / CSV，'
+        '记录行数、耗时、rows/s、SQL 条数和内存峰值（数据可先用 generate_*_data 生成）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=sorted(EXPORTS), help='只测指定导出')
+        parser.add_argument('--file-types', nargs='+', choices=FILE_TYPES, default=list(FILE_TYPES))
+        parser.add_argument('--limit', type=int, default=None, help='每个导出最多导出的条数')
+        parser.add_argument('--query', default='', help='导出接口的查询参数，如 "status=1&ordering=-create_time"')
+        parser.add_argument('--skip-memory', action='store_true', help='不统计内存峰值（tracemalloc 会拖慢一遍执行）')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--output', default=None, help='结果 JSON 文件路径')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['only'] or EXPORTS:
+                viewset_class = import_string(EXPORTS[name])
+                spec = viewset_class.export_spec
+                queryset = rebuild_queryset(viewset_class, options['query'])
+                if options['limit']:
+                    queryset = queryset[:options['limit']]
+                self.stdout.write(
+                    f"{name}: {'values_list' if spec.values_mode else '实例'}模式  "
+                    f"select_related={spec.select_related}  prefetch={[getattr(p, 'prefetch_to', p) for p in spec.prefetch_related]}"
+                )
+                for file_type in options['file_types']:
+                    result = {'export': name, 'file_type': file_type}
+                    if not options['skip_memory']:
+                        tracemalloc.start()
+                        run_export(spec, queryset, file_type, directory)
+                        result['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+                        tracemalloc.stop()
+                    # DEBUG 下查询日志已满时新查询不增加长度，先清空
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as queries:
+                        t0 = time.perf_counter()
+                        rows, size = run_export(spec, queryset, file_type, directory)
+                        seconds = time.perf_counter() - t0
+                    result.update(rows=rows, seconds=round(seconds, 3), rows_per_second=round(rows / max(seconds, 1e-9)),
+                                  queries=len(queries), file_kb=round(size / 1024, 1))
+                    results.append(result)
+                    self.stdout.write(
+                        f"  {file_type:<5} {rows:>9} 行  {seconds:8.2f}s  {result['rows_per_second']:>9,} rows/s  "
+                        f"{len(queries):>4} 条 SQL  {result['file_kb']:>10} KB"
+                        + (f"  峰值 {result['peak_memory_mb']} MB" if 'peak_memory_mb' in result else '')
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'revision': self._revision(),
+                    'python': platform.python_version(),
+                    'database': connection.vendor,
+                    'query': options['query'],
+                    'results': results,
+                }, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"结果已写入 {options['output']}"))
+
+    @staticmethod
+    def _revision():
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,38 @@
+"""
+用户、角色导出
+
+角色、权限名称来自按批预取的关联（一批一次查询），不再逐个用户 / 角色查询
+"""
+from django.db.models import Prefetch
+
+from utils.export import Column, ExportSpec, enabled
+
+from .models import CustomPermission, Role, User
+
+USER_EXPORT = ExportSpec(User, [
+    Column("ID", 'id', width=10),
+    Column("用户名", 'username'),
+    Column("邮箱", 'email', width=25),
+    Column("手机号", 'phone'),
+    Column("部门", 'department'),
+    Column("职位", 'position'),
+    Column("状态", 'status', convert=enabled, width=10),
+    Column("重要程度", 'importance', width=10),
+    Column("角色列表", 'roles__name', width=30),
+    Column("权限列表", 'roles__permissions__codename', distinct=True, width=50),
+    Column("创建时间", 'create_time', width=20),
+    Column("更新时间", 'update_time', width=20),
+], sheet_title='用户数据', filename='用户数据')
+
+ROLE_EXPORT = ExportSpec(Role, [
+    Column("ID", 'id', width=10),
+    Column("角色名称", 'name'),
+    Column("描述", 'description', width=30),
+    Column("状态", 'status', convert=enabled, width=10),
+    Column("重要程度", 'importance', width=10),
+    Column("权限列表", 'permissions__name', width=50, prefetch=Prefetch(
+        'permissions', queryset=CustomPermission.objects.only('id', 'name').order_by('name')
+    )),
+    Column("创建时间", 'create_time', width=20),
+    Column("更新时间", 'update_time', width=20),
+], sheet_title='角色数据', filename='角色列表')
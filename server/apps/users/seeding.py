@@ -0,0 +1,50 @@
+"""
+用户测试数据生成（generate_users_data、generate_events_data 共用）
+
+  - 用户按 utils.seeding 分块批量写入，主键预分配；用户名、手机号带主键，重复执行不冲突
+  - 密码哈希只计算一次（create_user 逐个哈希是生成用户的主要耗时），所有用户共用
+  - 用户-角色关联直接写中间表
+"""
+from django.contrib.auth.hashers import make_password
+
+from utils.seeding import seed_in_chunks
+
+from .models import User
+
+
+def build_user_chunk(chunk):
+    """seed_in_chunks 的生成函数，chunk.params 含 password（已哈希）、role_ids"""
+    rng, fake, writer = chunk.rng, chunk.faker('zh_CN'), chunk.writer
+    role_ids = chunk.params['role_ids']
+    through = User.roles.through
+    for index in range(chunk.start, chunk.start + chunk.count):
+        pk = chunk.pk(User, index)
+        username = f"{fake.user_name()}{pk}"
+        writer.add(User(
+            id=pk,
+            username=username,
+            email=f"{username}@{fake.free_email_domain()}",
+            password=chunk.params['password'],
+            phone=f"1{rng.choice('3578')}{pk:09d}",
+            department=fake.company()[:50],
+            position=fake.job()[:50],
+            status=True,
+            importance=rng.randint(1, 5),
+        ))
+        # 随机分配角色（2/3 概率）
+        if role_ids and rng.choice([True, True, False]):
+            for role_id in rng.sample(role_ids, k=min(rng.randint(1, 2), len(role_ids))):
+                writer.add(through(user_id=pk, role_id=role_id))
+
+
+def seed_users(count, options, password='123456', role_ids=(), log=print):
+    """
+    批量生成用户（见 utils.seeding.seed_in_chunks）
+    :param role_ids: 随机分配的角色 id
+    :return: seed_in_chunks 的结果，另含 ids（新用户 id）
+    """
+    result = seed_in_chunks(build_user_chunk, count, options, reserve=(User,), log=log,
+                            params={'password': make_password(password), 'role_ids': list(role_ids)})
+    base = result['bases'][User._meta.label]
+    result['ids'] = list(range(base, base + count))
+    return result
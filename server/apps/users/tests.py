@@ -1,3 +1,65 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from utils import export
+from .exports import ROLE_EXPORT, USER_EXPORT
+from .models import CustomPermission, Role, User
+from .views import RoleViewSet, UserViewSet
+
+
+class ExportSpecQueryTests(TestCase):
+    """用户、角色导出：多值关联每块预取一次，SQL 条数与数据条数无关"""
+
+    @classmethod
+    def setUpTestData(cls):
+        permissions = CustomPermission.objects.bulk_create([
+            CustomPermission(codename=f"perm_{i}", name=f"权限{i}", category="system") for i in range(4)
+        ])
+        cls.roles = Role.objects.bulk_create([Role(name=f"角色{i}") for i in range(3)])
+        cls.roles[0].permissions.set(permissions[:2])
+        cls.roles[1].permissions.set(permissions[1:3])
+        for i in range(7):
+            user = User.objects.create(username=f"user{i}", phone=f"1380000000{i}")
+            user.roles.set(cls.roles[:(i + 2) % 3])
+
+    def export(self, spec, queryset):
+        return list(spec.iter_rows(queryset))
+
+    def test_user_export_queries_per_chunk(self):
+        queryset = UserViewSet.queryset.order_by('id')
+        # 1 条主查询 + 每块 2 条预取（roles、roles__permissions）
+        with mock.patch.object(USER_EXPORT, 'batch_size', 3), self.assertNumQueries(1 + 3 * 2):
+            rows = self.export(USER_EXPORT, queryset)
+        with mock.patch.object(USER_EXPORT, 'batch_size', 100), self.assertNumQueries(1 + 2):
+            self.assertEqual(self.export(USER_EXPORT, queryset), rows)
+
+        self.assertEqual(len(rows), 7)
+        by_name = {row[1]: row for row in rows}
+        roles_column = USER_EXPORT.headers.index("角色列表")
+        permissions_column = USER_EXPORT.headers.index("权限列表")
+        self.assertEqual(by_name['user1'][roles_column], "")
+        self.assertEqual(by_name['user0'][roles_column], "角色0, 角色1")
+        # 两个角色共有的权限只出现一次
+        self.assertEqual(sorted(by_name['user0'][permissions_column].split(", ")), ["perm_0", "perm_1", "perm_2"])
+
+    def test_role_export_uses_custom_prefetch(self):
+        with mock.patch.object(ROLE_EXPORT, 'batch_size', 2), self.assertNumQueries(1 + 2):
+            rows = self.export(ROLE_EXPORT, RoleViewSet.queryset.order_by('id'))
+        permissions_column = ROLE_EXPORT.headers.index("权限列表")
+        self.assertEqual([row[permissions_column] for row in rows], ["权限0, 权限1", "权限1, 权限2", ""])
+
+    def test_on_batch_reports_progress(self):
+        progress = []
+        with mock.patch.object(USER_EXPORT, 'batch_size', 3):
+            list(USER_EXPORT.iter_rows(User.objects.order_by('id'), on_batch=progress.append))
+        self.assertEqual(progress, [3, 6, 7])
+
+    def test_export_task_marks_setup_failure(self):
+        # 查询集重建失败也要标记 failed，前端不会一直停在 pending
+        export.update_export_job('job-1', status='pending')
+        with mock.patch.object(export, 'rebuild_queryset', side_effect=ValueError("bad query")):
+            with self.assertRaises(ValueError):
+                export.export_task('job-1', 'apps.users.views.UserViewSet', '', 'csv')
+        job = export.get_export_job('job-1')
+        self.assertEqual((job['status'], job['error']), ('failed', "bad query"))
@@ -2,13 +2,9 @@ import io
 import qrcode
 import os
 import logging
-import pandas as pd
 from django.http import HttpResponse
-from django.utils import timezone
-from openpyxl.styles import Font, Alignment, PatternFill
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from openpyxl.utils import get_column_letter
 from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema
 from django.db.models import Prefetch
@@ -19,11 +15,13 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from .exports import ROLE_EXPORT, USER_EXPORT
 from .filters import RoleFilter, UserFilter
 from .models import User, Role, CustomPermission
 from .serializers import UserSerializer, RoleSerializer, CustomPermissionSerializer, RegisterSerializer, \
     CustomTokenObtainPairSerializer
 from utils import StandardResponse
+from utils.export import ExportMixin
 from urllib.parse import urlparse
 
 
@@ -61,7 +59,7 @@ class CustomPermissionViewSet(viewsets.ReadOnlyModelViewSet):
         return StandardResponse(data=list(queryset))
 
 
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(ExportMixin, viewsets.ModelViewSet):
 
     queryset = Role.objects.prefetch_related(
         Prefetch(
@@ -74,36 +72,7 @@ class RoleViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['id', 'name', 'importance', 'create_time']
     ordering = ['id']  # 默认排序
-
-    @action(detail=False, methods=['get'])
-    def export(self, request):
-        """
-        导出角色数据为 Excel
-        支持按当前筛选条件导出（过滤、搜索、排序）
-        """
-        queryset = self.filter_queryset(self.get_queryset())
-
-        data = []
-        for role in queryset:
-            permission_names = ', '.join([p.name for p in role.permissions.all()])
-            data.append({
-                'ID': role.id,
-                '角色名称': role.name,
-                '描述': role.description or '',
-                '状态': '启用' if role.status else '禁用',
-                '重要程度': role.importance,
-                '权限列表': permission_names,
-                '创建时间': role.create_time.strftime('%Y-%m-%d %H:%M:%S') if role.create_time else '',
-                '更新时间': role.update_time.strftime('%Y-%m-%d %H:%M:%S') if role.update_time else '',
-            })
-        df = pd.DataFrame(data)
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="角色列表.xlsx"'
-
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='角色数据')
-
-        return response
+    export_spec = ROLE_EXPORT
 
     @action(detail=False, methods=['get'])
     def all(self, request):
@@ -114,13 +83,15 @@ class RoleViewSet(viewsets.ModelViewSet):
         return StandardResponse(data=list(queryset))
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = User.objects.prefetch_related('roles__permissions').all().order_by('-create_time')
     serializer_class = UserSerializer
     filterset_class = UserFilter
     search_fields = ['username', 'phone']
     ordering_fields = ['id', 'username', 'importance', 'create_time']
     ordering = ['id']  # 默认排序
+    export_spec = USER_EXPORT
+    export_allow_empty = False
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -191,70 +162,6 @@ class UserViewSet(viewsets.ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
 
-    @action(detail=False, methods=['get'], url_path='export')
-    def export(self, request):
-        """
-        使用 pandas + openpyxl 导出用户数据为 Excel
-        支持过滤参数：?department=技术部&status=true
-        """
-        queryset = self.filter_queryset(self.get_queryset())
-
-        data = []
-        for user in queryset:
-            role_names = ", ".join(user.roles.values_list('name', flat=True)) if user.roles.exists() else ""
-            permissions = ", ".join(user.all_permissions) if hasattr(user, 'all_permissions') else ""
-
-            data.append({
-                "ID": user.id,
-                "用户名": user.username,
-                "邮箱": user.email or "",
-                "手机号": user.phone or "",
-                "部门": user.department or "",
-                "职位": user.position or "",
-                "状态": "启用" if user.status else "禁用",
-                "重要程度": user.importance,
-                "角色列表": role_names,
-                "权限列表": permissions,
-                "创建时间": user.create_time.strftime("%Y-%m-%d %H:%M:%S") if user.create_time else "",
-                "更新时间": user.update_time.strftime("%Y-%m-%d %H:%M:%S") if user.update_time else "",
-            })
-
-        df = pd.DataFrame(data)
-
-        if df.empty:
-            return Response({"error": "无符合条件的数据"}, status=404)
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        filename = f"用户数据_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='用户数据', index=False, startrow=0, startcol=0)
-
-            workbook = writer.book
-            worksheet = writer.sheets['用户数据']
-
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            header_font = Font(color="FFFFFF", bold=True)
-
-            for col_num, column_title in enumerate(df.columns, 1):
-                cell = worksheet.cell(row=1, column=col_num)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal="center")
-
-            for col_num, column_title in enumerate(df.columns, 1):
-                column_letter = get_column_letter(col_num)
-                max_length = max(
-                    len(str(column_title)),
-                    df[column_title].astype(str).map(len).max() if not df[column_title].empty else 0,
-                    10  # 最小宽度
-                )
-                adjusted_width = min(max_length + 2, 50)  # 最大宽度 50
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        return response
-
 
 class RegisterView(APIView):
     """
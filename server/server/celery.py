@@ -6,6 +6,7 @@
 
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 # 设置 Django 的 settings 模块
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
@@ -19,9 +20,24 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # 自动从所有已注册的 Django app 中加载任务模块
 app.autodiscover_tasks()
+# 通用导出任务（utils.export）
+app.autodiscover_tasks(['utils'], related_name='export')
 
 
 # 可选: 定义一个测试任务
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
+
+
+# AI 模型生命周期：主进程预加载（fork 后写时复制共享），子进程预热，见 apps.faults.ai.lifecycle
+@worker_init.connect
+def preload_ai_models(**kwargs):
+    from apps.faults.ai.lifecycle import preload
+    preload()
+
+
+@worker_process_init.connect
+def warm_up_ai_models(**kwargs):
+    from apps.faults.ai.lifecycle import warm_up
+    warm_up()
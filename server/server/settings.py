@@ -110,6 +110,34 @@ CELERY_RESULT_SERIALIZER = env_config['celery']['result_serializer']
 CELERY_ACCEPT_CONTENT = env_config['celery']['accept_content']
 CELERY_TIMEZONE = env_config['celery']['timezone']
 CELERY_ENABLE_UTC = env_config['celery']['enable_utc']
+CELERY_BEAT_SCHEDULE = {
+    # 故障日汇总对账（Event 增删改已通过信号增量刷新，此处兜底）
+    'faults-reconcile-daily-stats': {
+        'task': 'apps.faults.tasks.reconcile_event_daily_stats',
+        'schedule': timedelta(hours=1),
+        'kwargs': {'days': 7},
+    },
+    # FAISS 预写日志合并进快照
+    'faults-compact-faiss-store': {
+        'task': 'apps.faults.tasks.compact_faiss_store',
+        'schedule': timedelta(hours=6),
+    },
+    # 钉钉发件箱兜底发送（入队时已按需提交发送任务）
+    'dingtalk-flush-outbox': {
+        'task': 'thirds.dingtalk_outbox.flush_dingtalk_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    # 钉钉发送失败的消息放回发件箱重试（超过重试次数的不再重试）
+    'dingtalk-retry-failed': {
+        'task': 'thirds.dingtalk_outbox.retry_dingtalk_failed',
+        'schedule': timedelta(minutes=10),
+    },
+    # 清理过期的后台导出文件
+    'remove-expired-exports': {
+        'task': 'utils.export.remove_expired_exports_task',
+        'schedule': timedelta(hours=6),
+    },
+}
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '[::1]']
 
@@ -184,6 +212,12 @@ os.makedirs(MEDIA_ROOT, exist_ok=True)
 os.makedirs(DB_BACKUP_PATH, exist_ok=True)
 os.makedirs(LOG_PATH, exist_ok=True)
 
+# 导出超过该条数时转为后台任务，文件写到 MEDIA_ROOT/exports/
+EXPORT_ASYNC_THRESHOLD = 20000
+
+# OA 推送是否交给 Celery 入库（回调只做解密和提交任务）
+OA_INGEST_ASYNC = False
+
 # JWT 配置（可选自定义）
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60*72),  # 访问 Token 有效期
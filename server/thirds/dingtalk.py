@@ -1,9 +1,73 @@
-import requests
+import random
+import threading
 import time
 from functools import wraps
+
+import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 
-__all__ = ['ding', 'DingTalkAPI']
+from utils.lock import RedisDistributedLock
+from utils.redis_client import cache
+
+__all__ = ['ding', 'DingTalkAPI', 'DingTalkError', 'session']
+
+# 进程内共享的连接池，所有钉钉请求复用 TCP/TLS 连接
+POOL_SIZE = getattr(settings, 'DING_POOL_SIZE', 20)
+REQUEST_TIMEOUT = (3.05, 10)
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+# 限流/系统繁忙：退避后重试
+RATE_LIMIT_ERRCODES = {-1, 88, 90002, 90018, 130101}
+# access_token 无效或过期：刷新后重试
+TOKEN_ERRCODES = {40001, 40014, 42001}
+
+
+class DingTalkError(Exception):
+    def __init__(self, message, errcode=None):
+        super().__init__(message)
+        self.errcode = errcode
+
+
+def backoff_delay(attempt, retry_after=None):
+    """第 attempt 次重试前的等待秒数：优先服务端 Retry-After，否则指数退避 + 随机抖动"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * (0.5 + random.random() / 2)
+
+
+def request_json(method, url, **kwargs):
+    """
+    带限流重试的请求：HTTP 429/5xx、网络错误和限流错误码退避后重试，
+    其他业务错误码原样返回给调用方处理
+    """
+    kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            if last_attempt:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        if (response.status_code == 429 or response.status_code >= 500) and not last_attempt:
+            time.sleep(backoff_delay(attempt, response.headers.get('Retry-After')))
+            continue
+        response.raise_for_status()
+        data = response.json()
+        if data.get('errcode') in RATE_LIMIT_ERRCODES and not last_attempt:
+            time.sleep(backoff_delay(attempt))
+            continue
+        return data
 
 
 class DingTalkAPI:
@@ -13,24 +77,49 @@ class DingTalkAPI:
         self.app_secret = app_secret
         self.access_token = None
         self.token_expiry = 0
+        self._token_lock = threading.Lock()
 
-    def get_access_token(self):
-        if self.access_token is None or time.time() > self.token_expiry:
-            url = f'{settings.DING_URL}/gettoken'
-            params = {
-                'appkey': self.app_key,
-                'appsecret': self.app_secret
-            }
-            response = requests.get(url, params=params)
-            data = response.json()
-            if data['errcode'] == 0:
+    @property
+    def token_cache_key(self):
+        return f'dingtalk:access_token:{self.app_key}'
+
+    def get_access_token(self, force=False):
+        """
+        access_token 三级缓存：进程内 → Redis（各 worker 共享）→ 钉钉接口
+        刷新在线程锁 + 跨进程锁内完成，同一时间只有一个进程请求 gettoken
+        :param force: 当前 token 被钉钉判定无效时强制刷新
+        """
+        stale = self.access_token if force else None
+        if not force and self.access_token and time.time() < self.token_expiry:
+            return self.access_token
+
+        with self._token_lock:
+            if self._load_cached_token(stale):
+                return self.access_token
+            with RedisDistributedLock(cache, f'{self.token_cache_key}:lock', expire_time=30, timeout=15):
+                # 等锁期间其他进程可能已刷新
+                if self._load_cached_token(stale):
+                    return self.access_token
+                data = request_json('GET', f'{settings.DING_URL}/gettoken',
+                                    params={'appkey': self.app_key, 'appsecret': self.app_secret})
+                if data['errcode'] != 0:
+                    raise DingTalkError(f'Failed to get access token: {data["errmsg"]}', data['errcode'])
+                ttl = max(data['expires_in'] - 60, 1)  # 提前60秒更新token
                 self.access_token = data['access_token']
-                self.token_expiry = time.time() + data['expires_in'] - 60  # 提前60秒更新token
-                print('self.access_token:', self.access_token)
-            else:
-                raise Exception(f'Failed to get access token: {data["errmsg"]}')
+                self.token_expiry = time.time() + ttl
+                cache.set(self.token_cache_key, (self.access_token, self.token_expiry), timeout=ttl)
         return self.access_token
 
+    def _load_cached_token(self, stale=None):
+        """从 Redis 取其他进程刷新的 token，stale 为已知失效的 token"""
+        if stale is None and self.access_token and time.time() < self.token_expiry:
+            return True
+        cached = cache.get(self.token_cache_key)
+        if cached and cached[0] != stale and time.time() < cached[1]:
+            self.access_token, self.token_expiry = cached
+            return True
+        return False
+
     def ensure_access_token(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
@@ -48,15 +137,23 @@ class DingTalkAPI:
         else:
             raise ValueError("Invalid recipient_type. Must be 'user' or 'group'.")
 
+    def send_corp_message(self, payload):
+        """工作通知 asyncsend_v2，token 失效时刷新后重发一次"""
+        for refreshed in (False, True):
+            url = f'{settings.DING_URL}/topapi/message/corpconversation/asyncsend_v2?access_token={self.access_token}'
+            data = request_json('POST', url, json=payload)
+            if data['errcode'] in TOKEN_ERRCODES and not refreshed:
+                self.get_access_token(force=True)
+                continue
+            if data['errcode'] != 0:
+                raise DingTalkError(f'Failed to send message: {data["errmsg"]}', data['errcode'])
+            return data
+
     @ensure_access_token
     def send_text_message(self, recipient_id, content, recipient_type='user'):
         """
         给用户或者群发送普通消息
         """
-        url = f'{settings.DING_URL}/topapi/message/corpconversation/asyncsend_v2?access_token={self.access_token}'
-        headers = {
-            'Content-Type': 'application/json'
-        }
         payload = {
             'agent_id': self.agent_id,
             'chatid': recipient_id,
@@ -68,22 +165,13 @@ class DingTalkAPI:
             }
         }
         self.user_or_group(recipient_type, recipient_id, payload)
-
-        response = requests.post(url, json=payload, headers=headers)
-        data = response.json()
-        if data['errcode'] != 0:
-            raise Exception(f'Failed to send message: {data["errmsg"]}')
-        return data
+        return self.send_corp_message(payload)
 
     @ensure_access_token
     def send_markdown_message(self, title, text, recipient_id, recipient_type='user'):
         """
         发送markdown格式普通消息(标题+内容)
         """
-        url = f'{settings.DING_URL}/topapi/message/corpconversation/asyncsend_v2?access_token={self.access_token}'
-        headers = {
-            'Content-Type': 'application/json'
-        }
         markdown = {
             'title': title,
             'text': text
@@ -93,12 +181,7 @@ class DingTalkAPI:
             'msg': {'msgtype': 'markdown', 'markdown': markdown},
         }
         self.user_or_group(recipient_type, recipient_id, payload)
-
-        response = requests.post(url, json=payload, headers=headers)
-        data = response.json()
-        if data['errcode'] != 0:
-            raise Exception(f'Failed to send message: {data["errmsg"]}')
-        return data
+        return self.send_corp_message(payload)
 
     @ensure_access_token
     def send_card_message(self, title, content, recipient_id, recipient_type='user', single_url=None,
@@ -106,10 +189,6 @@ class DingTalkAPI:
         """
         发送卡片消息给用户或者给群
         """
-        url = f'{settings.DING_URL}/topapi/message/corpconversation/asyncsend_v2?access_token={self.access_token}'
-        headers = {
-            'Content-Type': 'application/json'
-        }
         action_card = {
             'title': title,
             'markdown': content,
@@ -126,10 +205,14 @@ class DingTalkAPI:
             }
         }
         self.user_or_group(recipient_type, recipient_id, payload)
-        response = requests.post(url, json=payload, headers=headers)
-        data = response.json()
+        return self.send_corp_message(payload)
+
+    @staticmethod
+    def send_robot_message(webhook_url, payload):
+        """群机器人 webhook 发送（完整 webhook 地址）"""
+        data = request_json('POST', webhook_url, json=payload)
         if data['errcode'] != 0:
-            raise Exception(f'Failed to send message: {data["errmsg"]}')
+            raise DingTalkError(f'Failed to send message: {data["errmsg"]}', data['errcode'])
         return data
 
     @staticmethod
@@ -137,19 +220,12 @@ class DingTalkAPI:
         """
         通过机器人发送actionCard消息
         """
-        headers = {
-            'Content-Type': 'application/json'
-        }
         payload = {
             'msgtype': 'actionCard',
             "actionCard": action_card_template
         }
-        webhook_url = f'https://oapi.dingtalk.com/robot/send?access_token={webhook_access_token}'
-        response = requests.post(webhook_url, json=payload, headers=headers)
-        data = response.json()
-        if data['errcode'] != 0:
-            raise Exception(f'Failed to send message: {data["errmsg"]}')
-        return data
+        robot_url = getattr(settings, 'DING_ROBOT_URL', 'https://oapi.dingtalk.com/robot/send')
+        return DingTalkAPI.send_robot_message(f'{robot_url}?access_token={webhook_access_token}', payload)
 
 
 ding = DingTalkAPI(
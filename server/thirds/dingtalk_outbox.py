@@ -0,0 +1,215 @@
+"""
+钉钉消息发件箱：调用方入队后立即返回，由 Celery 任务批量发送
+
+  - 队列：Redis 列表 OUTBOX_KEY，每条消息为 JSON
+      {'channel': 'webhook' | 'corp', 'recipient', 'recipient_type', 'title', 'text'}
+      webhook 为群机器人（recipient 为 webhook 地址），corp 为工作通知（recipient 为用户/群 id）
+  - 调度：入队时若没有待执行的发送任务，延迟 FLUSH_DELAY 秒提交一个（SET NX 去抖），
+    期间入队的消息由同一次发送处理；定时任务兜底
+  - 合并：同一接收人的多条消息按顺序合并为一条（不超过 MAX_BATCH_CHARS），减少请求数和限流
+  - 发送：thirds.dingtalk 的连接池 + 限流退避重试；同一时间只有一个发送任务（FLUSH_LOCK_KEY）
+  - 确认：消息逐条 RPOPLPUSH 到 PROCESSING_KEY 后再发送，整批发送完才删除；发送任务中途退出时，
+    下一次发送先补发 PROCESSING_KEY 中遗留的消息（至少发送一次，崩溃时可能重复）
+  - 失败重试：失败的消息（attempts 加 1）进入 FAILED_KEY，定时任务 retry_dingtalk_failed 放回队列；
+    失败 RETRY_LIMIT 次后进入 DEAD_KEY（保留最近 FAILED_KEEP 条）留待排查
+  - 列表均为 LPUSH 入队、RPOP 出队（先进先出）
+  - Redis 不可用时退化为同步发送
+"""
+import json
+
+from celery import shared_task
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+from .dingtalk import ding, DingTalkAPI
+
+CACHE_ALIAS = 'default'
+OUTBOX_KEY = 'dingtalk:outbox'
+PROCESSING_KEY = 'dingtalk:outbox:processing'
+FAILED_KEY = 'dingtalk:outbox:failed'
+DEAD_KEY = 'dingtalk:outbox:dead'
+SCHEDULED_KEY = 'dingtalk:outbox:scheduled'
+FLUSH_LOCK_KEY = 'dingtalk:outbox:flushing'
+FLUSH_LOCK_TIMEOUT = 600
+FLUSH_DELAY = 2
+FLUSH_LIMIT = 1000
+MAX_BATCH_CHARS = 4000
+RETRY_LIMIT = 5
+FAILED_KEEP = 1000
+SEPARATOR = '\n\n---\n\n'
+
+
+def _redis():
+    return get_redis_connection(CACHE_ALIAS)
+
+
+def _raw_key(key):
+    return caches[CACHE_ALIAS].make_key(key)
+
+
+def enqueue(channel, recipient, text, title='', recipient_type='user'):
+    """
+    消息入队并确保有发送任务，立即返回
+    :param channel: webhook（群机器人）或 corp（工作通知）
+    """
+    message = {'channel': channel, 'recipient': recipient, 'recipient_type': recipient_type,
+               'title': title, 'text': text}
+    try:
+        _redis().lpush(_raw_key(OUTBOX_KEY), json.dumps(message, ensure_ascii=False))
+    except Exception as e:
+        print(f"[钉钉] 消息入队失败，改为同步发送: {e}")
+        _send([message])
+        return
+    schedule_flush()
+
+
+def enqueue_webhook_markdown(webhook, title, text):
+    enqueue('webhook', webhook, text, title=title, recipient_type='group')
+
+
+def enqueue_text(recipient_id, content, recipient_type='user'):
+    enqueue('corp', recipient_id, content, recipient_type=recipient_type)
+
+
+def schedule_flush(delay=FLUSH_DELAY):
+    """没有待执行的发送任务时提交一个；标记在任务开始取消息前清除"""
+    try:
+        if caches[CACHE_ALIAS].set(SCHEDULED_KEY, 1, timeout=max(delay * 30, 60), nx=True):
+            flush_dingtalk_outbox.apply_async(countdown=delay)
+    except Exception as e:
+        print(f"[钉钉] 提交发送任务失败，等待定时任务发送: {e}")
+
+
+def pop_messages(limit=FLUSH_LIMIT):
+    """
+    取出待发送的消息：先取上次发送中途退出时遗留在 PROCESSING_KEY 的，没有时把队首最多 limit 条
+    逐条移入 PROCESSING_KEY（一次往返）。消息在 ack_messages 之前不会丢失
+    """
+    processing = _raw_key(PROCESSING_KEY)
+    raw = _redis().lrange(processing, 0, -1)
+    if not raw:
+        pipe = _redis().pipeline(transaction=False)
+        for _ in range(limit):
+            pipe.rpoplpush(_raw_key(OUTBOX_KEY), processing)
+        raw = [item for item in pipe.execute() if item is not None]
+    else:
+        print(f"[钉钉] 补发上次未确认的 {len(raw)} 条消息")
+    # PROCESSING_KEY 队首是最后移入的消息
+    return [json.loads(item) for item in reversed(raw)]
+
+
+def ack_messages(failed):
+    """一批发送完成：清空 PROCESSING_KEY，失败的消息同时进入 FAILED_KEY（超过重试次数进入 DEAD_KEY）"""
+    retry, dead = [], []
+    for message in failed:
+        message = {**message, 'attempts': message.get('attempts', 0) + 1}
+        (dead if message['attempts'] >= RETRY_LIMIT else retry).append(json.dumps(message, ensure_ascii=False))
+    pipe = _redis().pipeline(transaction=True)
+    pipe.delete(_raw_key(PROCESSING_KEY))
+    if retry:
+        pipe.lpush(_raw_key(FAILED_KEY), *retry)
+    if dead:
+        pipe.lpush(_raw_key(DEAD_KEY), *dead)
+        pipe.ltrim(_raw_key(DEAD_KEY), 0, FAILED_KEEP - 1)
+    pipe.execute()
+
+
+def group_messages(messages):
+    """
+    按 (渠道, 接收人) 分组合并，组内保持入队顺序，超过 MAX_BATCH_CHARS 时拆成多条
+    :return: [(合并后的消息, 原始消息列表), ...]
+    """
+    groups = {}
+    for message in messages:
+        key = (message['channel'], message['recipient_type'], message['recipient'])
+        groups.setdefault(key, []).append(message)
+
+    batches = []
+    for items in groups.values():
+        batch, size = [], 0
+        for message in items:
+            if batch and size + len(SEPARATOR) + len(message['text']) > MAX_BATCH_CHARS:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(message)
+            size += len(message['text']) + (len(SEPARATOR) if size else 0)
+        batches.append(batch)
+    return [(merge_batch(batch), batch) for batch in batches]
+
+
+def merge_batch(batch):
+    merged = dict(batch[0])
+    if len(batch) > 1:
+        merged['text'] = SEPARATOR.join(message['text'] for message in batch)
+        merged['title'] = f"{batch[0]['title']}（共 {len(batch)} 条）" if batch[0]['title'] else ''
+    return merged
+
+
+def send_one(message):
+    if message['channel'] == 'webhook':
+        payload = {'msgtype': 'markdown', 'markdown': {'title': message['title'], 'text': message['text']}}
+        return DingTalkAPI.send_robot_message(message['recipient'], payload)
+    if message['title']:
+        return ding.send_markdown_message(message['title'], message['text'], message['recipient'],
+                                          message['recipient_type'])
+    return ding.send_text_message(message['recipient'], message['text'], message['recipient_type'])
+
+
+def _send(messages):
+    """合并后逐组发送，返回 (请求数, 失败的原始消息)"""
+    requests_sent, failed = 0, []
+    for merged, originals in group_messages(messages):
+        requests_sent += 1
+        try:
+            send_one(merged)
+        except Exception as e:
+            print(f"[钉钉] 发送给 {merged['recipient']} 失败（{len(originals)} 条）: {e}")
+            failed.extend(originals)
+    return requests_sent, failed
+
+
+def flush_outbox(limit=FLUSH_LIMIT):
+    """
+    发送队列中的消息；已有发送任务在执行时不重复发送，稍后再提交一次
+    :return: {'messages': 取出条数, 'requests': 实际请求数, 'failed': 失败条数}
+    """
+    stats = {'messages': 0, 'requests': 0, 'failed': 0}
+    if not caches[CACHE_ALIAS].add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_TIMEOUT):
+        schedule_flush()
+        return stats
+    try:
+        caches[CACHE_ALIAS].delete(SCHEDULED_KEY)
+        while True:
+            messages = pop_messages(limit)
+            if not messages:
+                break
+            requests_sent, failed = _send(messages)
+            ack_messages(failed)
+            stats['messages'] += len(messages)
+            stats['requests'] += requests_sent
+            stats['failed'] += len(failed)
+            if len(messages) < limit:
+                break
+    finally:
+        caches[CACHE_ALIAS].delete(FLUSH_LOCK_KEY)
+    return stats
+
+
+def retry_failed():
+    """FAILED_KEY 中的消息逐条放回发送队列（保持先后顺序），返回条数"""
+    redis, count = _redis(), 0
+    while redis.rpoplpush(_raw_key(FAILED_KEY), _raw_key(OUTBOX_KEY)) is not None:
+        count += 1
+    if count:
+        schedule_flush()
+    return count
+
+
+@shared_task
+def flush_dingtalk_outbox(limit=FLUSH_LIMIT):
+    return flush_outbox(limit)
+
+
+@shared_task
+def retry_dingtalk_failed():
+    return retry_failed()
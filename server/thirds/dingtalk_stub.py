@@ -0,0 +1,81 @@
+"""
+本地钉钉接口桩（压测发件箱用），模拟 gettoken、工作通知 asyncsend_v2 与群机器人 webhook
+
+    server = DingTalkStubServer(latency=0.01, rate_limit_every=50)
+    server.start()        # server.url 作为 DING_URL，f'{server.url}/robot/send' 作为 webhook
+    ...
+    server.stop()
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 保持长连接，才能观察到连接复用
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.record(self, 'gettoken')
+        self._reply({'errcode': 0, 'errmsg': 'ok', 'access_token': 'stub-token', 'expires_in': 7200})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        path = urlparse(self.path).path
+        kind = 'robot' if path.endswith('/robot/send') else 'corp'
+        n = self.server.record(self, kind, payload)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.rate_limit_every and n % self.server.rate_limit_every == 0:
+            self._reply({'errcode': 130101 if kind == 'robot' else 90018, 'errmsg': 'send too fast'})
+            return
+        self._reply({'errcode': 0, 'errmsg': 'ok', 'task_id': n})
+
+
+class DingTalkStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, rate_limit_every=0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.counts = {'gettoken': 0, 'corp': 0, 'robot': 0}
+        self.connections = set()
+        self.payloads = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def record(self, handler, kind, payload=None):
+        with self._lock:
+            self.counts[kind] += 1
+            self.connections.add(handler.client_address)
+            if payload is not None:
+                self.payloads.append(payload)
+            return self.counts[kind]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
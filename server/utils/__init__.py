@@ -8,4 +8,3 @@ from .lock import RedisDistributedLock
 from .redis_client import cache, session_cache, temp_cache
 from .cipher import AESCipher
 from .date_transform import get_date_range
-
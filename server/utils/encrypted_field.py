@@ -1,9 +1,11 @@
+import hmac
 import base64
 import hashlib
+import functools
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.fernet import Fernet
 
 
@@ -39,6 +41,35 @@ from cryptography.fernet import Fernet
 #         return str(value)
 
 
+@functools.lru_cache(maxsize=1)
+def _aesgcm(key_source):
+    return AESGCM(hashlib.sha256(key_source.encode()).digest()[:32])
+
+
+@functools.lru_cache(maxsize=65536)
+def _encrypt_text(key_source, plaintext):
+    """
+    确定性加密：同一明文结果相同，批量写入时重复的值只加密一次
+    存储结构: nonce (12) + tag (16) + ciphertext，base64 编码
+    """
+    # 使用明文的哈希作为 nonce（确保确定性）
+    nonce = hashlib.sha256(plaintext.encode()).digest()[:12]  # GCM 要求 12 字节
+    # AESGCM 输出为 ciphertext + tag（16 字节）
+    sealed = _aesgcm(key_source).encrypt(nonce, plaintext.encode(), None)
+    encrypted_data = nonce + sealed[-16:] + sealed[:-16]
+    return base64.urlsafe_b64encode(encrypted_data).decode()
+
+
+@functools.lru_cache(maxsize=8192)
+def _decrypt_text(key_source, ciphertext_b64):
+    """解密结果按密文缓存（加密是确定性的，同一人员的多条记录只解密一次）"""
+    data = base64.urlsafe_b64decode(ciphertext_b64.encode())
+    nonce = data[:12]
+    tag = data[12:28]          # 12 + 16 = 28
+    ciphertext = data[28:]
+    return _aesgcm(key_source).decrypt(nonce, ciphertext + tag, None).decode()
+
+
 class EncryptedCharField(models.CharField):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -49,28 +80,12 @@ class EncryptedCharField(models.CharField):
     def _encrypt(self, plaintext):
         if plaintext is None:
             return None
-        # 使用明文的哈希作为 nonce（确保确定性）
-        nonce = hashlib.sha256(plaintext.encode()).digest()[:12]  # GCM 要求 12 字节
-        cipher = Cipher(algorithms.AES(self.key), modes.GCM(nonce), backend=default_backend())
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(plaintext.encode()) + encryptor.finalize()
-        # GCM 会生成 16 字节的 tag
-        tag = encryptor.tag
-        # 存储结构: nonce (12) + tag (16) + ciphertext
-        encrypted_data = nonce + tag + ciphertext
-        return base64.urlsafe_b64encode(encrypted_data).decode()
+        return _encrypt_text(settings.ENCRYPTION_KEY, plaintext)
 
     def _decrypt(self, ciphertext_b64):
         if ciphertext_b64 is None:
             return None
-        data = base64.urlsafe_b64decode(ciphertext_b64.encode())
-        nonce = data[:12]
-        tag = data[12:28]          # 12 + 16 = 28
-        ciphertext = data[28:]
-        cipher = Cipher(algorithms.AES(self.key), modes.GCM(nonce, tag), backend=default_backend())
-        decryptor = cipher.decryptor()
-        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-        return plaintext.decode()
+        return _decrypt_text(settings.ENCRYPTION_KEY, ciphertext_b64)
 
     def from_db_value(self, value, expression, connection):
         return self._decrypt(value)
@@ -82,12 +97,99 @@ class EncryptedCharField(models.CharField):
     def encrypt_value(cls, plain_text):
         if plain_text is None:
             return None
-        key = hashlib.sha256(settings.ENCRYPTION_KEY.encode()).digest()[:32]
-        nonce = hashlib.sha256(plain_text.encode()).digest()[:12]
-        cipher = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend())
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(plain_text.encode()) + encryptor.finalize()
-        tag = encryptor.tag
-        encrypted_data = nonce + tag + ciphertext
-        return base64.urlsafe_b64encode(encrypted_data).decode()
+        return _encrypt_text(settings.ENCRYPTION_KEY, plain_text)
+
+
+# ========== 盲索引 ==========
+# 加密字段的密文无法模糊查询，另存明文片段的 HMAC（截断为 BLIND_INDEX_LENGTH 位十六进制）用于检索：
+# 完整值、后 n 位、前 n 位各一列，都建索引；密钥与 AES 密钥分离（BLIND_INDEX_KEY，缺省由 ENCRYPTION_KEY 派生）
+BLIND_INDEX_LENGTH = 16
+
+
+def normalize_plaintext(value):
+    """去掉空白和连字符、字母转大写（身份证末位 x/X 视为相同）"""
+    if value is None:
+        return ''
+    return ''.join(str(value).split()).replace('-', '').upper()
+
+
+@functools.lru_cache(maxsize=1)
+def _blind_index_key(key_source):
+    return hmac.new(key_source.encode(), b'blind-index', hashlib.sha256).digest()
+
+
+@functools.lru_cache(maxsize=65536)
+def _blind_index_token(key_source, tag, part):
+    digest = hmac.new(_blind_index_key(key_source), f"{tag}:{part}".encode(), hashlib.sha256).hexdigest()
+    return digest[:BLIND_INDEX_LENGTH]
+
+
+class BlindIndexField(models.CharField):
+    """
+    加密字段的盲索引列，写入时（save、bulk_create）由 source 字段的明文计算
+    kind: 'full' 完整值；'suffix' 后 length 位；'prefix' 前 length 位。明文不足 length 位时为空
+    注意：queryset.update() 或 save(update_fields=[source]) 不会更新盲索引，需用 rebuild_blind_index 重建
+    """
+
+    def __init__(self, source=None, kind='full', length=None, *args, **kwargs):
+        self.source = source
+        self.kind = kind
+        self.length = length
+        kwargs.setdefault('max_length', BLIND_INDEX_LENGTH)
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.update(source=self.source, kind=self.kind, length=self.length)
+        return name, path, args, kwargs
+
+    @property
+    def tag(self):
+        return self.kind if self.kind == 'full' else f"{self.kind}{self.length}"
+
+    def part(self, plaintext):
+        """规范化明文 → 参与 HMAC 的片段，不适用时返回 None"""
+        if not plaintext:
+            return None
+        if self.kind == 'full':
+            return plaintext
+        if len(plaintext) < self.length:
+            return None
+        return plaintext[-self.length:] if self.kind == 'suffix' else plaintext[:self.length]
+
+    def token(self, plaintext):
+        part = self.part(normalize_plaintext(plaintext))
+        if part is None:
+            return None
+        return _blind_index_token(getattr(settings, 'BLIND_INDEX_KEY', None) or settings.ENCRYPTION_KEY, self.tag, part)
+
+    def pre_save(self, model_instance, add):
+        value = self.token(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def blind_index_fields(model, source=None):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, BlindIndexField) and (source is None or field.source == source)
+    ]
+
 
+def blind_index_q(model, source, value):
+    """
+    按明文检索加密字段：输入与完整值相同，或长度等于某个后缀/前缀盲索引的长度时命中对应列（多列取 OR）
+    :return: Q，输入为空或没有可用的盲索引列时返回 None
+    """
+    plaintext = normalize_plaintext(value)
+    q = None
+    for field in blind_index_fields(model, source):
+        if not plaintext or (field.kind != 'full' and len(plaintext) != field.length):
+            continue
+        condition = Q(**{field.attname: field.token(plaintext)})
+        q = condition if q is None else q | condition
+    return q
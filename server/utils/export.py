@@ -0,0 +1,471 @@
+"""
+声明式流式导出（XLSX / CSV）
+
+  - ExportSpec 由 Column 列表描述导出内容，列的 source 为字段路径（跨关联用 __）或 callable；
+    按路径自动规划查询：
+      * 全部为普通字段路径时走 values_list（数据库 JOIN，不实例化模型）
+      * 否则实例化模型：外键路径 select_related，多对多 / 反向外键路径 prefetch_related
+        （Django 4.1+ 的 iterator(chunk_size=...) 每取一块执行一次预取，一块一次查询）
+  - 写入端逐行处理，内存占用与导出条数无关：XLSX 用 openpyxl write_only 写临时文件后
+    FileResponse 分块返回；CSV 用 StreamingHttpResponse 边查边发（带 BOM，Excel 直接打开不乱码）
+  - ExportMixin 给 ModelViewSet 增加 export、export/<job_id> 动作；超过 EXPORT_ASYNC_THRESHOLD 条
+    或 ?async=1 时转为后台任务 export_task，文件写到 MEDIA_ROOT/exports/，进度存 temp_cache（Redis）
+"""
+import os
+import csv
+import time
+import uuid
+import datetime
+import tempfile
+from urllib.parse import quote
+
+from celery import shared_task
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.http import FileResponse, HttpRequest, QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .redis_client import temp_cache
+
+FILE_TYPES = ('xlsx', 'csv')
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+}
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 超过该条数的导出转为后台任务
+EXPORT_ASYNC_THRESHOLD = getattr(settings, 'EXPORT_ASYNC_THRESHOLD', 20000)
+EXPORT_JOB_TIMEOUT = 24 * 3600
+EXPORT_DIR = 'exports'
+BATCH_SIZE = 2000
+
+
+# ========== 列定义与查询规划 ==========
+def yes_no(value):
+    return "是" if value else "否"
+
+
+def enabled(value):
+    return "启用" if value else "禁用"
+
+
+class Column:
+    """
+    导出列
+    :param header: 表头
+    :param source: 字段路径（如 'category__name'、'roles__permissions__codename'），或 callable(obj)
+    :param display: 取字段 choices 的显示值
+    :param convert: 值转换函数
+    :param related: source 为 callable 或模型属性时，声明其访问的关联路径，参与查询规划
+    :param prefetch: 自定义多值关联的 Prefetch（如需排序），替代自动生成的 lookup
+    :param distinct: 多值列去重
+    :param width: XLSX 列宽
+    """
+
+    def __init__(self, header, source, display=False, convert=None, related=(), prefetch=None,
+                 distinct=False, width=15):
+        self.header = header
+        self.source = source
+        self.display = display
+        self.convert = convert
+        self.related = tuple(related)
+        self.prefetch = prefetch
+        self.distinct = distinct
+        self.width = width
+        # 以下由 ExportSpec 按模型解析
+        self.steps = None       # [(属性名, 是否多值)]
+        self.choices = None
+        self.simple = False     # 可直接 values_list
+
+
+def _resolve(model, path):
+    """
+    解析字段路径
+    :return: (steps, select_related 路径, prefetch 路径, 末端字段 or None)
+    """
+    parts = path.split('__')
+    steps, names, select, prefetch, field = [], [], None, None, None
+    current = model
+    for i, part in enumerate(parts):
+        try:
+            field = current._meta.get_field(part)
+        except FieldDoesNotExist:
+            # 模型属性 / property，之后的路径按属性访问
+            steps.extend((name, False) for name in parts[i:])
+            return steps, select, prefetch, None
+        if not field.is_relation:
+            steps.append((field.attname, False))
+            continue
+        # 反向关联的查询名（related_query_name）与访问名（如 xxx_set）不同，预取用访问名
+        names.append(part if field.concrete else field.get_accessor_name())
+        many = field.many_to_many or field.one_to_many
+        steps.append((names[-1], many))
+        if many or prefetch:
+            prefetch = '__'.join(names)
+        else:
+            select = '__'.join(names)
+        current = field.related_model
+    return steps, select, prefetch, field
+
+
+def _walk(value, steps):
+    """按 steps 取值，多值关联展开为列表"""
+    values = [value]
+    many = False
+    for name, is_many in steps:
+        next_values = []
+        for item in values:
+            if item is None:
+                continue
+            attr = getattr(item, name)
+            if is_many:
+                next_values.extend(attr.all())
+                many = True
+            else:
+                next_values.append(attr)
+        values = next_values
+    if many:
+        return values
+    return values[0] if values else None
+
+
+class ExportSpec:
+    """
+    一个导出的定义
+    :param model: 导出的模型（解析字段路径用）
+    :param columns: Column 列表
+    :param sheet_title: XLSX 工作表名
+    :param filename: 文件名前缀（实际文件名追加时间戳）
+    """
+
+    def __init__(self, model, columns, sheet_title, filename, batch_size=BATCH_SIZE):
+        self.model = model
+        self.columns = list(columns)
+        self.sheet_title = sheet_title
+        self.filename = filename
+        self.batch_size = batch_size
+        self.select_related, self.prefetch_related = [], []
+        for column in self.columns:
+            self._plan(column)
+        # 全部为普通字段路径时不实例化模型
+        self.values_mode = all(column.simple for column in self.columns)
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    def _plan(self, column):
+        if not callable(column.source):
+            steps, field = self._add_path(column.source, column.prefetch)
+            column.steps = steps
+            column.simple = (field is not None and not field.is_relation
+                             and not any(many for _, many in steps) and not column.related)
+            if column.display and field is not None and field.choices:
+                column.choices = dict(field.flatchoices)
+        for path in column.related:
+            self._add_path(path, column.prefetch)
+
+    def _add_path(self, path, custom_prefetch=None):
+        steps, select, prefetch, field = _resolve(self.model, path)
+        if select and select not in self.select_related:
+            self.select_related.append(select)
+        if prefetch and custom_prefetch is not None:
+            prefetch = custom_prefetch
+        if prefetch and prefetch not in self.prefetch_related:
+            self.prefetch_related.append(prefetch)
+        return steps, field
+
+    def plan(self, queryset):
+        """按列规划查询（视图自带的 prefetch 换成导出列需要的）"""
+        queryset = queryset.prefetch_related(None)
+        if self.values_mode:
+            return queryset.values_list(*[column.source for column in self.columns])
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+    def _value(self, column, value):
+        if isinstance(value, list):
+            if column.choices is not None:
+                value = [column.choices.get(item, item) for item in value]
+            if column.distinct:
+                value = list(dict.fromkeys(value))
+            value = ", ".join(str(item) for item in value if item is not None)
+        elif column.choices is not None:
+            value = column.choices.get(value, value)
+        if column.convert is not None:
+            value = column.convert(value)
+        return value
+
+    def iter_rows(self, queryset, on_batch=None):
+        """
+        分批逐行生成导出数据
+        :param on_batch: fn(已处理条数)，每批调用一次（后台任务上报进度）
+        """
+        queryset = self.plan(queryset)
+        count = 0
+        for item in queryset.iterator(chunk_size=self.batch_size):
+            yield self._row(item)
+            count += 1
+            if on_batch and count % self.batch_size == 0:
+                on_batch(count)
+        if on_batch:
+            on_batch(count)
+
+    def _row(self, item):
+        if self.values_mode:
+            return [self._value(column, value) for column, value in zip(self.columns, item)]
+        return [
+            self._value(column, column.source(item) if callable(column.source) else _walk(item, column.steps))
+            for column in self.columns
+        ]
+
+
+# ========== 写入 ==========
+def excel_value(value):
+    """Excel 不支持带时区的时间，转为本地时间"""
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return excel_value(value).strftime(DATETIME_FORMAT)
+    return value
+
+
+def write_xlsx(file, spec, rows):
+    """
+    write_only 模式写入 XLSX，行写入后即落到临时 XML，不在内存中保留
+    :param file: 文件路径或二进制文件对象
+    :return: 写入的数据行数
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=spec.sheet_title)
+    for i, column in enumerate(spec.columns, 1):
+        ws.column_dimensions[get_column_letter(i)].width = column.width
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(color="FFFFFF", bold=True)
+    header = []
+    for title in spec.headers:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.fill, cell.font, cell.alignment = header_fill, header_font, Alignment(horizontal="center")
+        header.append(cell)
+    ws.append(header)
+    count = 0
+    for row in rows:
+        ws.append([excel_value(value) for value in row])
+        count += 1
+    wb.save(file)
+    return count
+
+
+class _Echo:
+    """csv.writer 的伪文件：writerow 直接返回写入的字符串"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(headers, rows):
+    """逐行生成 CSV 文本（首行带 BOM）"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(list(headers))
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def write_csv(file, headers, rows):
+    """
+    :param file: 文本文件对象（newline=''）
+    :return: 写入的数据行数
+    """
+    count = -1
+    for count, line in enumerate(iter_csv(headers, rows)):
+        file.write(line)
+    return max(count, 0)
+
+
+def write_export(file, file_type, spec, rows):
+    """
+    :param file: 文件路径或文件对象（CSV 为文本、XLSX 为二进制）
+    :return: 写入的数据行数
+    """
+    if file_type == 'csv':
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'w', encoding='utf-8', newline='') as f:
+                return write_csv(f, spec.headers, rows)
+        return write_csv(file, spec.headers, rows)
+    return write_xlsx(file, spec, rows)
+
+
+def _content_disposition(filename):
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def export_response(filename, file_type, spec, rows):
+    """
+    同步导出
+    :param filename: 不含扩展名的文件名
+    """
+    if file_type == 'csv':
+        response = StreamingHttpResponse(
+            (line.encode('utf-8') for line in iter_csv(spec.headers, rows)),
+            content_type=CONTENT_TYPES['csv'],
+        )
+        response['Content-Disposition'] = _content_disposition(f'{filename}.csv')
+        return response
+    # zip 格式无法边写边发：先写匿名临时文件（关闭即删除），再分块返回
+    tmp = tempfile.TemporaryFile()
+    write_xlsx(tmp, spec, rows)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=f'{filename}.xlsx', content_type=CONTENT_TYPES['xlsx'])
+
+
+# ========== 后台任务 ==========
+def _job_key(job_id):
+    return f"export:job:{job_id}"
+
+
+def export_file_path(job_id, file_type):
+    directory = os.path.join(settings.MEDIA_ROOT, EXPORT_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{job_id}.{file_type}")
+
+
+def get_export_job(job_id):
+    """任务状态：{'status': pending/running/done/failed, 'file_type', 'filename', 'rows', 'total', 'error'}"""
+    return temp_cache.get(_job_key(job_id))
+
+
+def update_export_job(job_id, **fields):
+    job = get_export_job(job_id) or {}
+    job.update(fields)
+    temp_cache.set(_job_key(job_id), job, EXPORT_JOB_TIMEOUT)
+    return job
+
+
+def rebuild_queryset(viewset_class, query_string, action='export'):
+    """
+    后台任务中按原请求的查询参数重建视图的过滤结果（filterset、搜索、排序与同步导出一致）
+    """
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(query_string)
+    view = viewset_class(request=Request(http_request), format_kwarg=None, action=action, args=(), kwargs={})
+    return view.filter_queryset(view.get_queryset())
+
+
+@shared_task
+def export_task(job_id, viewset_path, query_string, file_type):
+    """后台导出：按视图的 export_spec 写文件，每批更新一次进度"""
+    path = None
+    try:
+        # 视图加载、查询集重建失败也要把任务标记为 failed，否则前端一直轮询到超时
+        viewset_class = import_string(viewset_path)
+        spec = viewset_class.export_spec
+        queryset = rebuild_queryset(viewset_class, query_string)
+        update_export_job(job_id, status='running')
+        path = export_file_path(job_id, file_type)
+        count = write_export(path, file_type, spec,
+                             spec.iter_rows(queryset, on_batch=lambda rows: update_export_job(job_id, rows=rows)))
+    except Exception as e:
+        print(f"[导出] 任务 {job_id} 失败: {e}")
+        if path and os.path.exists(path):
+            os.remove(path)
+        update_export_job(job_id, status='failed', error=str(e))
+        raise
+    update_export_job(job_id, status='done', rows=count)
+    return count
+
+
+def remove_expired_exports(max_age=EXPORT_JOB_TIMEOUT):
+    """删除超过 max_age 秒的导出文件（任务状态过期后文件已无法下载）"""
+    directory = os.path.join(settings.MEDIA_ROOT, EXPORT_DIR)
+    if not os.path.isdir(directory):
+        return 0
+    deadline = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < deadline:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+@shared_task
+def remove_expired_exports_task():
+    """清理过期的导出文件"""
+    removed = remove_expired_exports()
+    if removed:
+        print(f"[导出] 清理过期文件 {removed} 个")
+    return removed
+
+
+# ========== 视图 ==========
+class ExportMixin:
+    """
+    给 ModelViewSet 增加导出动作，子类设置 export_spec
+      GET export/?file_type=xlsx|csv[&async=1]   按当前过滤、搜索、排序条件导出
+      GET export/<job_id>/[?download=1]          后台任务进度 / 下载
+    """
+    export_spec = None
+    export_allow_empty = True
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        spec = self.export_spec
+        file_type = request.query_params.get('file_type', 'xlsx')
+        if file_type not in FILE_TYPES:
+            return Response({"error": f"file_type 仅支持 {', '.join(FILE_TYPES)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        total = queryset.count()
+        if not total and not self.export_allow_empty:
+            return Response({"error": "无符合条件的数据"}, status=status.HTTP_404_NOT_FOUND)
+        filename = f"{spec.filename}_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}"
+
+        if request.query_params.get('async') in ('1', 'true') or total > EXPORT_ASYNC_THRESHOLD:
+            job_id = uuid.uuid4().hex
+            update_export_job(job_id, status='pending', file_type=file_type, filename=f"{filename}.{file_type}",
+                              rows=0, total=total, error=None, user_id=getattr(request.user, 'pk', None))
+            viewset_path = f"{type(self).__module__}.{type(self).__qualname__}"
+            export_task.delay(job_id, viewset_path, request.query_params.urlencode(), file_type)
+            return Response({"job_id": job_id, "status": "pending", "total": total}, status=status.HTTP_202_ACCEPTED)
+
+        return export_response(filename, file_type, spec, spec.iter_rows(queryset))
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<job_id>[0-9a-f]{32})')
+    def export_job(self, request, job_id=None):
+        """后台导出任务进度；完成后 ?download=1 下载文件"""
+        job = get_export_job(job_id)
+        if not job or job.get('user_id') != getattr(request.user, 'pk', None):
+            return Response({"error": "导出任务不存在或已过期"}, status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get('download') in ('1', 'true'):
+            if job['status'] != 'done':
+                return Response({"error": "导出尚未完成", "status": job['status']}, status=status.HTTP_409_CONFLICT)
+            path = export_file_path(job_id, job['file_type'])
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=job['filename'],
+                                content_type=CONTENT_TYPES[job['file_type']])
+        data = {key: job.get(key) for key in ('status', 'filename', 'rows', 'total', 'error')}
+        data['progress'] = round(job['rows'] * 100 / job['total'], 1) if job.get('total') else None
+        return Response(data)
@@ -8,7 +8,6 @@
 
 import time
 import uuid
-import json
 from typing import Optional
 
 
@@ -24,6 +23,8 @@ class RedisDistributedLock:
         timeout: Optional[int] = 60
     ):
         self.redis_cache = redis_cache
+        # 兼容 utils.redis_client.RedisClient 与 django_redis 缓存后端
+        self._backend = getattr(redis_cache, '_cache', redis_cache)
         self.lock_key = lock_key
         self.expire_time = expire_time
         self.max_retries = max_retries
@@ -44,10 +45,10 @@ class RedisDistributedLock:
             if self.timeout and (time.time() - start_time) >= self.timeout:
                 return False
 
-            result = self.redis_cache.set(
+            result = self._backend.set(
                 self.lock_key,
                 self.lock_value,
-                expire=self.expire_time,
+                timeout=self.expire_time,
                 nx=True  # only set if not exists
             )
 
@@ -75,8 +76,12 @@ class RedisDistributedLock:
         end
         """
         try:
-            serialized_value = json.dumps(self.lock_value)
-            result = self.redis_cache._cache.eval(lua_script, 1, self.lock_key, serialized_value)
+            # 与 set 写入时相同的键前缀和序列化方式
+            client = self._backend.client
+            serialized_value = client.encode(self.lock_value)
+            result = client.get_client(write=True).eval(
+                lua_script, 1, self._backend.make_key(self.lock_key), serialized_value
+            )
             if result == 1:
                 self.locked = False
                 return True
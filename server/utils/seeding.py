@@ -0,0 +1,234 @@
+"""
+批量生成测试数据（generate_*_data 命令共用）
+
+  - SeedWriter：按模型缓存行对象，满 batch_size 时 bulk_create；method='load' 时写 CSV，
+    MySQL 用 LOAD DATA LOCAL INFILE、PostgreSQL 用 COPY 导入（其他数据库仍用 bulk_create）。
+    CSV 中的值经 field.get_db_prep_save 转换，EncryptedCharField 等自定义字段与 ORM 写入一致
+  - 主键预分配：seed_in_chunks 的 reserve 模型从当前最大主键之后按序号计算主键（Chunk.pk），
+    父子表外键在写入前即可确定，不依赖数据库回填主键（MySQL bulk_create 不回填）
+  - 多进程：总量按 chunk_size 切块，每块的随机数由 (seed, 块的全局起始序号) 派生，生成结果与进程数无关，
+    追加数据（start > 0）时不会与已有数据重复；
+    fork 前关闭数据库连接，子进程各自连接、每块一个事务
+  - 结束时按模型输出写入条数和 rows/s
+"""
+import os
+import json
+import time
+import random
+import tempfile
+import multiprocessing
+from collections import Counter
+
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Max
+
+SEED_METHODS = ('orm', 'load')
+
+
+def add_seed_arguments(parser, batch_size=1000, chunk_size=10000, seed=None):
+    """generate_*_data 命令的公共参数"""
+    parser.add_argument('--batch-size', type=int, default=batch_size, help='每批写入的行数')
+    parser.add_argument('--chunk-size', type=int, default=chunk_size, help='每个生成块（一个事务）的条数')
+    parser.add_argument('--workers', type=int, default=1, help='生成进程数（SQLite 请保持 1）')
+    parser.add_argument('--seed', type=int, default=seed, help='随机种子，相同种子生成相同数据')
+    parser.add_argument('--method', choices=SEED_METHODS, default='orm',
+                        help='orm: bulk_create；load: 写 CSV 后 LOAD DATA / COPY 导入')
+
+
+# ========== 写入 ==========
+def _csv_value(field, obj, connection, null):
+    value = field.pre_save(obj, add=True)
+    if value is None:
+        return null
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, cls=field.encoder, ensure_ascii=False)
+    else:
+        value = field.get_db_prep_save(value, connection)
+        if value is None:
+            return null
+        if isinstance(value, bool):
+            value = int(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class SeedWriter:
+    """按模型缓存待写入的行，满一批写入一次"""
+
+    def __init__(self, batch_size=1000, method='orm', using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.using = using
+        self.method = method
+        vendor = connections[using].vendor
+        if method == 'load' and vendor not in ('mysql', 'postgresql'):
+            print(f"[数据生成] {vendor} 不支持 LOAD DATA / COPY，改用 bulk_create")
+            self.method = 'orm'
+        self.pending = {}
+        self.counts = Counter()
+
+    def add(self, obj):
+        rows = self.pending.setdefault(type(obj), [])
+        rows.append(obj)
+        if len(rows) >= self.batch_size:
+            # 连同其他模型一起按加入顺序写入，子表的行不会先于其引用的父表行写入
+            self.flush()
+        return obj
+
+    def add_many(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def flush(self):
+        """按模型首次加入的顺序写入全部缓存的行（父表先于子表）"""
+        for current in list(self.pending):
+            rows = self.pending.pop(current)
+            if not rows:
+                continue
+            if self.method == 'load':
+                self._load(current, rows)
+            else:
+                current.objects.using(self.using).bulk_create(rows, batch_size=self.batch_size)
+            self.counts[current._meta.label] += len(rows)
+
+    def _load(self, model, rows):
+        connection = connections[self.using]
+        with_pk = getattr(rows[0], model._meta.pk.attname) is not None
+        fields = [f for f in model._meta.concrete_fields if with_pk or not f.primary_key]
+        null = 'NULL' if connection.vendor == 'mysql' else ''
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='', delete=False) as f:
+            for obj in rows:
+                f.write(','.join(_csv_value(field, obj, connection, null) for field in fields) + '\n')
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'mysql':
+                    # 需要 DATABASES OPTIONS 中 local_infile=1、服务端 local_infile=ON
+                    cursor.execute(
+                        f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                        f"FIELDS TERMINATED BY ',' ENCLOSED BY '\"' ESCAPED BY '' "
+                        f"LINES TERMINATED BY '\\n' ({columns})",
+                        [f.name],
+                    )
+                else:
+                    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+                    raw = cursor.cursor
+                    with open(f.name, encoding='utf-8') as data:
+                        if hasattr(raw, 'copy_expert'):  # psycopg2
+                            raw.copy_expert(sql, data)
+                        else:  # psycopg 3
+                            with raw.copy(sql) as copy:
+                                copy.write(data.read())
+        finally:
+            os.remove(f.name)
+
+
+# ========== 分块生成 ==========
+class Chunk:
+    """一个生成块：序号 start ~ start + count - 1，独立的随机数和写入器"""
+
+    def __init__(self, number, start, count, seed, bases, params, writer, origin=0):
+        self.number = number
+        self.start = start
+        self.count = count
+        self.rng = random.Random(f"{seed}-{start}")
+        self.seed = seed
+        self.bases = bases
+        self.params = params
+        self.writer = writer
+        self.origin = origin
+
+    def pk(self, model, index, per_item=1, offset=0):
+        """预分配的主键：第 index 条（全局序号）的第 offset 个 model 行"""
+        return self.bases[model._meta.label] + (index - self.origin) * per_item + offset
+
+    def faker(self, locale='zh_CN'):
+        from faker import Faker
+        fake = Faker(locale)
+        fake.seed_instance(f"{self.seed}-{self.start}")
+        return fake
+
+
+def _run_chunk(args):
+    build, number, start, count, seed, bases, params, options = args
+    writer = SeedWriter(options['batch_size'], options['method'])
+    with transaction.atomic():
+        build(Chunk(number, start, count, seed, bases, params, writer, origin=options['origin']))
+        writer.flush()
+    return writer.counts
+
+
+def reserve_bases(reserve):
+    """预分配主键的起点：当前最大主键 + 1"""
+    return {
+        model._meta.label: (model.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+        for model in reserve
+    }
+
+
+def reset_sequences(reserve, using=DEFAULT_DB_ALIAS):
+    """显式写入主键后同步自增序列（PostgreSQL；MySQL、SQLite 自动调整）"""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), list(reserve))
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def seed_in_chunks(build, total, options, params=None, reserve=(), start=0, log=print):
+    """
+    分块生成 total 条数据
+    :param build: fn(chunk)，模块级函数（多进程时按引用传给子进程），把第 chunk.start 起的
+                  chunk.count 条数据及其关联行加入 chunk.writer
+    :param options: 命令参数（batch_size、chunk_size、workers、seed、method）
+    :param params: 传给 build 的参数（需可 pickle）
+    :param reserve: 需要预分配主键的模型，build 中用 chunk.pk() 取主键
+    :param start: 全局起始序号（追加数据时避免编号冲突）
+    :return: {'counts': {模型: 条数}, 'seconds': 耗时, 'bases': 预分配主键起点}
+    """
+    seed = options.get('seed')
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 31)
+        log(f"随机种子: {seed}（--seed {seed} 可复现本次数据）")
+    bases = reserve_bases(reserve)
+    chunk_size = max(options.get('chunk_size') or 10000, 1)
+    tasks = [
+        (build, number, start + offset, min(chunk_size, total - offset), seed, bases, params or {},
+         {'batch_size': options['batch_size'], 'method': options['method'], 'origin': start})
+        for number, offset in enumerate(range(0, total, chunk_size))
+    ]
+
+    counts, started, done = Counter(), time.perf_counter(), 0
+    workers = max(options.get('workers') or 1, 1)
+    if workers > 1 and len(tasks) > 1:
+        # 子进程不能复用父进程的连接
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for chunk_counts in pool.imap_unordered(_run_chunk, tasks):
+                counts.update(chunk_counts)
+                done += 1
+                _progress(log, done, len(tasks), counts, started)
+    else:
+        for task in tasks:
+            counts.update(_run_chunk(task))
+            done += 1
+            _progress(log, done, len(tasks), counts, started)
+    reset_sequences(reserve)
+    seconds = time.perf_counter() - started
+    report_counts(counts, seconds, log)
+    return {'counts': dict(counts), 'seconds': seconds, 'bases': bases}
+
+
+def _progress(log, done, total, counts, started):
+    if total > 1:
+        rows = sum(counts.values())
+        log(f"  块 {done}/{total}  已写入 {rows} 行  {rows / max(time.perf_counter() - started, 1e-9):,.0f} rows/s")
+
+
+def report_counts(counts, seconds, log=print):
+    """按模型输出写入条数和速度"""
+    total = sum(counts.values())
+    for label, count in sorted(counts.items()):
+        log(f"  {label:<36} {count:>10} 行")
+    log(f"  合计 {total} 行，耗时 {seconds:.1f}s，{total / max(seconds, 1e-9):,.0f} rows/s")
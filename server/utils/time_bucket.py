@@ -0,0 +1,69 @@
+# encoding: utf-8
+# @File  : time_bucket.py
+# @Desc : 按自然日切分时间桶并计数（统计看板趋势图共用）
+#         自然日按 settings.TIME_ZONE 划分，与进程的 TZ 环境变量无关；
+#         不随请求中 timezone.activate 的时区变化，保证故障日汇总在各进程中一致
+
+import datetime
+
+import numpy as np
+from django.utils import timezone
+
+
+def today():
+    """settings.TIME_ZONE 中的今天"""
+    return timezone.localdate(timezone=timezone.get_default_timezone())
+
+
+def day_of(ts):
+    """时间戳所在的自然日"""
+    return datetime.datetime.fromtimestamp(ts, tz=timezone.get_default_timezone()).date()
+
+
+def day_start_ts(day):
+    """自然日 00:00 的时间戳（夏令时切换时按 zoneinfo 的规则换算）"""
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=timezone.get_default_timezone())
+    return int(start.timestamp())
+
+
+def align_day(day, interval_days):
+    """把日期向前对齐到 1970-01-01 起 interval_days 的整数倍"""
+    epoch = datetime.date(1970, 1, 1)
+    offset = (day - epoch).days
+    return epoch + datetime.timedelta(days=(offset // interval_days) * interval_days)
+
+
+def day_edges(start_day, end_day, interval_days=1):
+    """
+    从 start_day 起每 interval_days 天一个桶，直到覆盖 end_day
+    :return: (bucket_days, edges)，桶 i 为 [edges[i], edges[i + 1])，len(edges) == len(bucket_days) + 1
+    """
+    step = datetime.timedelta(days=interval_days)
+    bucket_days = []
+    current = start_day
+    while current <= end_day:
+        bucket_days.append(current)
+        current += step
+    edges = [day_start_ts(d) for d in bucket_days]
+    edges.append(day_start_ts(current))
+    return bucket_days, np.asarray(edges, dtype=np.int64)
+
+
+def bucket_counts(timestamps, edges, labels=None, n_labels=None):
+    """
+    统计各时间桶内的数量：np.searchsorted 定位桶 + np.bincount 计数，O(n log k)
+    落在 [edges[0], edges[-1]) 之外的时间戳被忽略
+    :param labels: 与 timestamps 等长的 0..n_labels-1 整数编码（如故障等级），
+                   传入时返回形如 (桶数, n_labels) 的二维计数
+    """
+    n_buckets = len(edges) - 1
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    idx = np.searchsorted(edges, timestamps, side='right') - 1
+    valid = (idx >= 0) & (idx < n_buckets)
+    if labels is None:
+        return np.bincount(idx[valid], minlength=n_buckets)[:n_buckets]
+
+    labels = np.asarray(labels, dtype=np.int64)
+    valid &= (labels >= 0) & (labels < n_labels)
+    flat = idx[valid] * n_labels + labels[valid]
+    return np.bincount(flat, minlength=n_buckets * n_labels)[:n_buckets * n_labels].reshape(n_buckets, n_labels)